@@ -0,0 +1,543 @@
+# Benchmarks for Invoice Generator Premium
+# Times PDF rendering, batch rendering, Excel/CSV export, totals and email delivery
+#
+# Usage:
+#   python benchmark.py                          # quick suite, prints a table
+#   python benchmark.py --suite full --output baseline.json
+#   python benchmark.py --compare baseline.json  # exit status 1 on a regression
+#   python benchmark.py --only render_items_100 export_xlsx_10000
+#   python benchmark.py --verify-fast 200          # canvas renderer vs platypus
+#
+# Every case runs in a fresh process so its peak RSS is its own. Invoices are
+# generated from a fixed seed, so runs on the same machine are comparable.
+# Email is delivered to a local SMTP sink started by the benchmark itself.
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import socketserver
+import multiprocessing
+from datetime import datetime
+
+COMPANY = {
+    "company_name": "Benchmark Supplies Ltd",
+    "address": "1 Test Street",
+    "city": "Springfield",
+    "country": "USA",
+    "phone": "555-0100",
+    "email": "billing@example.com",
+    "currency": "USD",
+}
+
+# A result counts as a regression when it is this much slower than the baseline
+DEFAULT_TOLERANCE = 0.20
+
+# ---------------------------- Synthetic Data ----------------------------
+_WORDS = ["Widget", "Gadget", "Consulting", "Support", "License", "Cable", "Adapter",
+          "Design", "Hosting", "Training", "Repair", "Shipping", "Bracket", "Sensor"]
+
+def make_items(count, rng):
+    """count line item dicts with repeating names, like a real catalogue"""
+    return [
+        {"name": f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} #{rng.randrange(500)}",
+         "quantity": rng.randint(1, 20),
+         "price": round(rng.uniform(0.5, 500), 2)}
+        for _ in range(count)
+    ]
+
+def make_invoice(number, item_count, rng):
+    return {
+        "invoice_number": f"BENCH-{number:06d}",
+        "date": f"2024-{number % 12 + 1:02d}-{number % 28 + 1:02d}",
+        "customer": f"Customer {number % 997}",
+        "tax_rate": rng.choice([0, 5, 10, 20]),
+        "items": make_items(item_count, rng),
+    }
+
+def make_invoices(count, item_count, seed=1):
+    """A stream of count invoices with item_count items each"""
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        yield make_invoice(number, item_count, rng)
+
+def count_pages(pdf_bytes):
+    return len(re.findall(rb"/Type\s*/Page(?!s)", pdf_bytes))
+
+# ---------------------------- Local SMTP Sink ----------------------------
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept and discard messages"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 benchmark sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.reply("250-benchmark sink")
+                self.reply("250 SIZE 104857600")
+            elif command == b"DATA":
+                self.reply("354 end with <CRLF>.<CRLF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.received += 1
+                self.reply("250 accepted")
+            elif command == b"QUIT":
+                self.reply("221 bye")
+                return
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply("250 ok")
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("localhost", 0), _SinkHandler)
+        self.received = 0
+        self.port = self.server_address[1]
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+# ---------------------------- Cases ----------------------------
+# Each case returns a dict of measurements; "seconds" is the wall time that
+# regressions are judged on. Cases import the modules they measure, so the
+# import cost is not part of the timing.
+def case_render(item_count, repeat, fast=False):
+    from invoice_render import render_invoice
+
+    invoice = make_invoice(1, item_count, random.Random(1))
+    render_invoice(invoice, COMPANY, io.BytesIO(), fast=fast)  # Warm the render context
+    started = time.perf_counter()
+    for _ in range(repeat):
+        out = io.BytesIO()
+        render_invoice(invoice, COMPANY, out, fast=fast)
+    seconds = time.perf_counter() - started
+    pages = count_pages(out.getvalue()) * repeat
+    return {"seconds": seconds, "invoices": repeat, "pages": pages, "bytes": len(out.getvalue()),
+            "invoices_per_sec": repeat / seconds, "pages_per_sec": pages / seconds}
+
+def case_batch(invoice_count, item_count, workers, fast=False):
+    from invoice_batch import run_batch
+
+    company = dict(COMPANY, fast_render=fast)
+    with tempfile.TemporaryDirectory() as out_dir:
+        started = time.perf_counter()
+        succeeded, failures = run_batch(make_invoices(invoice_count, item_count), company, out_dir,
+                                        workers=workers, chunk_size=20)
+        seconds = time.perf_counter() - started
+        pages = 0
+        for name in os.listdir(out_dir):
+            with open(os.path.join(out_dir, name), "rb") as f:
+                pages += count_pages(f.read())
+    if failures:
+        raise RuntimeError(f"{len(failures)} invoices failed, e.g. {failures[0]}")
+    return {"seconds": seconds, "invoices": succeeded, "pages": pages, "workers": workers,
+            "invoices_per_sec": succeeded / seconds, "pages_per_sec": pages / seconds}
+
+def case_merged(invoice_count, item_count, workers, per_file):
+    from invoice_batch import run_merged_batch
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        started = time.perf_counter()
+        succeeded, failures = run_merged_batch(make_invoices(invoice_count, item_count), COMPANY,
+                                               os.path.join(out_dir, "invoices.pdf"), per_file=per_file,
+                                               workers=workers)
+        seconds = time.perf_counter() - started
+        pages = files = size = 0
+        for name in os.listdir(out_dir):
+            if name.endswith(".pdf"):
+                with open(os.path.join(out_dir, name), "rb") as f:
+                    data = f.read()
+                pages += count_pages(data)
+                files += 1
+                size += len(data)
+    if failures:
+        raise RuntimeError(f"{len(failures)} invoices failed, e.g. {failures[0]}")
+    return {"seconds": seconds, "invoices": succeeded, "pages": pages, "files": files, "bytes": size,
+            "invoices_per_sec": succeeded / seconds, "pages_per_sec": pages / seconds}
+
+def case_export(item_count, extension):
+    from invoice_export import write_export
+
+    items = make_items(item_count, random.Random(1))
+    with tempfile.TemporaryDirectory() as out_dir:
+        path = os.path.join(out_dir, f"export.{extension}")
+        started = time.perf_counter()
+        written, excel_error = write_export(items, 10, path)
+        seconds = time.perf_counter() - started
+        size = os.path.getsize(written)
+    if excel_error is not None:
+        raise RuntimeError(f"Excel export fell back to CSV: {excel_error}")
+    return {"seconds": seconds, "items": item_count, "bytes": size, "items_per_sec": item_count / seconds}
+
+def case_totals(item_count, repeat):
+    from item_store import ItemStore
+
+    store = ItemStore.from_items(make_items(item_count, random.Random(1)))
+    started = time.perf_counter()
+    for _ in range(repeat):
+        store.totals(10)
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "items": item_count * repeat, "items_per_sec": item_count * repeat / seconds}
+
+def case_batch_totals(invoice_count, item_count):
+    from invoice_totals import batch_totals
+
+    numbers, quantities, prices, rates = [], [], [], []
+    for invoice in make_invoices(invoice_count, item_count):
+        for item in invoice["items"]:
+            numbers.append(invoice["invoice_number"])
+            quantities.append(item["quantity"])
+            prices.append(item["price"])
+            rates.append(invoice["tax_rate"])
+    started = time.perf_counter()
+    batch_totals(numbers, quantities, prices, rates)
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "invoices": invoice_count, "invoices_per_sec": invoice_count / seconds}
+
+def case_mail(message_count, connections):
+    from invoice_render import render_invoice
+    from invoice_mail import MailQueue, build_invoice_message
+
+    sink = SmtpSink()
+    with tempfile.TemporaryDirectory() as out_dir:
+        pdf_path = os.path.join(out_dir, "invoice.pdf")
+        render_invoice(make_invoice(1, 20, random.Random(1)), COMPANY, pdf_path)
+        messages = [build_invoice_message(COMPANY["email"], f"client{n}@example.com", f"BENCH-{n:06d}",
+                                          f"Customer {n}", COMPANY["company_name"], pdf_path)
+                    for n in range(message_count)]
+        settings = {"smtp_server": "localhost", "smtp_port": str(sink.port)}
+        started = time.perf_counter()
+        with MailQueue(settings, connections=connections, backoff=0.1) as mail:
+            for msg in messages:
+                mail.submit(msg)
+            results = mail.join()
+        seconds = time.perf_counter() - started
+    sink.shutdown()
+    failed = [error for _, error in results if error]
+    if failed:
+        raise RuntimeError(f"{len(failed)} messages failed, e.g. {failed[0]}")
+    return {"seconds": seconds, "messages": sink.received, "messages_per_sec": sink.received / seconds}
+
+def case_mail_outbox(invoice_count, in_flight, rate_per_minute=0, workers=1):
+    from mail_outbox import Outbox, MailDispatcher, TokenBucket
+
+    sink = SmtpSink()
+    settings = {"smtp_server": "localhost", "smtp_port": str(sink.port)}
+    with tempfile.TemporaryDirectory() as work_dir:
+        with Outbox(os.path.join(work_dir, "invoices.db")) as outbox:
+            outbox.add((invoice, f"client{n}@example.com")
+                       for n, invoice in enumerate(make_invoices(invoice_count, 10)))
+            started = time.perf_counter()
+            dispatcher = MailDispatcher(outbox, COMPANY, settings, COMPANY["email"], max_in_flight=in_flight,
+                                        limiter=TokenBucket.per_minute(rate_per_minute),
+                                        render_workers=workers, backoff=0.1)
+            sent, failed = dispatcher.run()
+            seconds = time.perf_counter() - started
+            counts = outbox.counts()
+    sink.shutdown()
+    if failed or counts["sent"] != invoice_count or sink.received != invoice_count:
+        raise RuntimeError(f"{failed} failed, {counts['sent']} marked sent, {sink.received} received")
+    return {"seconds": seconds, "messages": sink.received, "messages_per_sec": sink.received / seconds}
+
+SUITES = {
+    "quick": {
+        "render_items_1": (case_render, {"item_count": 1, "repeat": 20}),
+        "render_items_100": (case_render, {"item_count": 100, "repeat": 5}),
+        "render_items_10": (case_render, {"item_count": 10, "repeat": 50}),
+        "render_fast_items_10": (case_render, {"item_count": 10, "repeat": 50, "fast": True}),
+        "batch_invoices_100": (case_batch, {"invoice_count": 100, "item_count": 10, "workers": os.cpu_count() or 1}),
+        "merged_invoices_100": (case_merged, {"invoice_count": 100, "item_count": 10,
+                                              "workers": os.cpu_count() or 1, "per_file": 1000}),
+        "export_csv_10000": (case_export, {"item_count": 10000, "extension": "csv"}),
+        "export_xlsx_10000": (case_export, {"item_count": 10000, "extension": "xlsx"}),
+        "totals_items_10000": (case_totals, {"item_count": 10000, "repeat": 100}),
+        "batch_totals_10000": (case_batch_totals, {"invoice_count": 10000, "item_count": 3}),
+        "mail_100": (case_mail, {"message_count": 100, "connections": 2}),
+        "mail_outbox_100": (case_mail_outbox, {"invoice_count": 100, "in_flight": 4, "workers": os.cpu_count() or 1}),
+        "mail_outbox_rate_100": (case_mail_outbox, {"invoice_count": 100, "in_flight": 4, "rate_per_minute": 3000,
+                                                    "workers": os.cpu_count() or 1}),
+    },
+}
+SUITES["full"] = dict(SUITES["quick"], **{
+    "render_items_10000": (case_render, {"item_count": 10000, "repeat": 1}),
+    "batch_invoices_1": (case_batch, {"invoice_count": 1, "item_count": 10, "workers": 1}),
+    "batch_invoices_10000": (case_batch, {"invoice_count": 10000, "item_count": 10, "workers": os.cpu_count() or 1}),
+    "batch_fast_invoices_10000": (case_batch, {"invoice_count": 10000, "item_count": 10,
+                                               "workers": os.cpu_count() or 1, "fast": True}),
+    "merged_invoices_10000": (case_merged, {"invoice_count": 10000, "item_count": 10,
+                                            "workers": os.cpu_count() or 1, "per_file": 1000}),
+    "batch_totals_100000": (case_batch_totals, {"invoice_count": 100000, "item_count": 3}),
+    "export_xlsx_100000": (case_export, {"item_count": 100000, "extension": "xlsx"}),
+    "mail_1000": (case_mail, {"message_count": 1000, "connections": 4}),
+    "mail_outbox_1000": (case_mail_outbox, {"invoice_count": 1000, "in_flight": 4, "workers": os.cpu_count() or 1}),
+})
+
+# ---------------------------- Fast Renderer Check ----------------------------
+# The canvas renderer must put the same marks on the page as platypus. Both
+# PDFs are reduced to their text runs (font, size, position), filled
+# rectangles and stroked lines, page by page, and compared.
+_PDF_TOKEN = re.compile(rb"\((?:\\.|[^\\)])*\)|/[^\s/\[\]()<>]+|[-+]?(?:\d+\.?\d*|\.\d+)|[A-Za-z*'\"]+")
+
+def _pdf_streams(pdf_bytes):
+    """Decoded page content streams, in page order"""
+    import zlib
+    import base64
+
+    streams = []
+    for match in re.finditer(rb"obj\s*<<(.*?)>>\s*stream\r?\n", pdf_bytes, re.S):
+        header = match.group(1)
+        if b"/Subtype /Image" in header:
+            continue
+        length = int(re.search(rb"/Length (\d+)", header).group(1))
+        body = pdf_bytes[match.end():match.end() + length]
+        if b"/ASCII85Decode" in header:
+            body = body.strip()
+            body = base64.a85decode(body[:-2] if body.endswith(b"~>") else body)
+        if b"/FlateDecode" in header:
+            body = zlib.decompress(body)
+        streams.append(body)
+    return streams
+
+def pdf_page_marks(pdf_bytes):
+    """For each page, a sorted list of the text runs, filled rectangles and lines drawn on it"""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    fonts = {name.decode(): base.decode() for base, name in
+             re.findall(rb"/BaseFont /(\S+) .*?/Name /(\S+)", pdf_bytes)}
+    pages = []
+    for stream in _pdf_streams(pdf_bytes):
+        marks = []
+        stack, origin = [], (0.0, 0.0)
+        operands, path, segments = [], [], []
+        font = size = None
+        fill = (0.0, 0.0, 0.0)
+        line = run = None
+        for token in _PDF_TOKEN.findall(stream):
+            if token[:1] in b"(/" or re.match(rb"[-+.\d]", token):
+                operands.append(token)
+                continue
+            op = token.decode()
+            numbers = [float(value) for value in operands if not value[:1] in b"(/"]
+            if op == "q":  # Position, font and fill colour are all graphics state
+                stack.append((origin, font, size, fill))
+            elif op == "Q":
+                origin, font, size, fill = stack.pop()
+            elif op == "cm" and numbers[:4] == [1, 0, 0, 1]:
+                origin = (origin[0] + numbers[4], origin[1] + numbers[5])
+            elif op == "Do":
+                marks.append(("image", round(origin[0], 2), round(origin[1], 2)))
+            elif op == "cm":  # Image scaling: record where the image goes
+                origin = (origin[0] + numbers[4], origin[1] + numbers[5])
+            elif op == "BT":
+                line, run = [0.0, 0.0], None
+                leading = 0.0
+            elif op == "Tf":
+                font, size = fonts.get(operands[0][1:].decode()), numbers[0]
+            elif op == "TL":
+                leading = numbers[0]
+            elif op == "Tm":
+                line, run = [numbers[4], numbers[5]], None
+            elif op == "Td":
+                line, run = [line[0] + numbers[0], line[1] + numbers[1]], None
+            elif op == "T*":
+                line, run = [line[0], line[1] - leading], None
+            elif op == "Tj":
+                text = re.sub(rb"\\(.)", rb"\1", operands[0][1:-1]).decode("latin-1")
+                if run is None:
+                    run = ["text", font, size, origin[0] + line[0], origin[1] + line[1], ""]
+                    marks.append(run)
+                run[5] += text
+                line[0] += stringWidth(text, font, size)
+            elif op == "rg":
+                fill = tuple(round(value, 3) for value in numbers)
+            elif op == "re":
+                x, y, width, height = numbers
+                path.append((x + origin[0], min(y, y + height) + origin[1], width, abs(height)))
+            elif op in ("f", "f*"):
+                marks += [("rect", fill) + tuple(round(value, 2) for value in rect) for rect in path]
+                path = []
+            elif op == "m":
+                start = (numbers[0] + origin[0], numbers[1] + origin[1])
+            elif op == "l":
+                end = (numbers[0] + origin[0], numbers[1] + origin[1])
+                segments.append(tuple(round(value, 2) for value in min(start, end) + max(start, end)))
+                start = end
+            elif op == "S":
+                marks += [("line",) + segment for segment in segments]
+                segments = []
+            elif op == "n":
+                path = []
+            operands = []
+        marks = [tuple(round(value, 2) if isinstance(value, float) else value for value in mark)
+                 for mark in marks if mark[0] != "text" or mark[5].strip()]
+        pages.append(sorted(marks, key=repr))
+    return pages
+
+def verify_fast(count, seed=1):
+    """Render count varied invoices with both renderers; returns (checked, fallbacks, mismatches)"""
+    from PIL import Image as PILImage
+    from invoice_render import _render_canvas, _render_invoice
+    from item_store import ItemStore
+
+    rng = random.Random(seed)
+    checked = fallbacks = 0
+    mismatches = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        logos = [""]
+        for index, size in enumerate([(600, 200), (300, 300), (900, 150)]):
+            path = os.path.join(work_dir, f"logo{index}.png")
+            PILImage.new("RGBA", size, (200, 40, 40, 255)).save(path)
+            logos.append(path)
+        for number in range(1, count + 1):
+            company = dict(COMPANY, logo_path=rng.choice(logos),
+                           website=rng.choice(["", "example.com"]), tax_id=rng.choice(["", "TX-99"]),
+                           currency=rng.choice(["USD", "EUR", "GBP"]))
+            for field in ("address", "phone", "email"):
+                if rng.random() < 0.3:
+                    company[field] = ""
+            invoice = make_invoice(number, rng.choice([1, 2, 5, 10, 15, 20, 25, 30, 40, 50, 60]), rng)
+            invoice = dict(invoice, items=ItemStore.from_items(invoice["items"]))
+            fast = _render_canvas(invoice, company)
+            if fast is None:
+                fallbacks += 1
+                continue
+            checked += 1
+            expected = pdf_page_marks(_render_invoice(invoice, company))
+            actual = pdf_page_marks(fast)
+            if expected != actual:
+                mismatches.append((invoice["invoice_number"], len(invoice["items"]), expected, actual))
+    return checked, fallbacks, mismatches
+
+# ---------------------------- Harness ----------------------------
+def peak_rss_mb(children=False):
+    """Peak resident memory of this process (or its largest child) in MB, or None if unknown"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        if children:
+            return None
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    if not peak:
+        return None
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10  # Bytes on macOS, KB elsewhere
+
+def _run_case(suite, name, results):
+    function, kwargs = SUITES[suite][name]
+    try:
+        result = function(**kwargs)
+        result["peak_rss_mb"] = peak_rss_mb()
+        if peak_rss_mb(children=True):  # Batch rendering workers
+            result["peak_worker_rss_mb"] = peak_rss_mb(children=True)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    results.put(result)
+
+def run_case(suite, name):
+    """Run one case in a fresh process and return its measurements"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_case, args=(suite, name, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def compare(results, baseline, tolerance):
+    """Names of the cases that got slower than the baseline allows"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "seconds" not in old or "seconds" not in result:
+            continue
+        if result["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append(name)
+    return regressions
+
+def format_result(name, result, baseline=None):
+    if "error" in result:
+        return f"{name:<24} ERROR {result['error']}"
+    rates = ", ".join(f"{key[:-8]}/s {value:,.0f}" for key, value in result.items() if key.endswith("_per_sec"))
+    rss = f"{result['peak_rss_mb']:.0f} MB" if result.get("peak_rss_mb") is not None else "n/a"
+    line = f"{name:<24} {result['seconds']:9.3f} s  {rss:>8}  {rates}"
+    old = (baseline or {}).get("results", {}).get(name)
+    if old and "seconds" in old:
+        line += f"  ({(result['seconds'] / old['seconds'] - 1) * 100:+.0f}% vs baseline)"
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark rendering, export, totals and email")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick", help="Which set of cases to run")
+    parser.add_argument("--only", nargs="+", metavar="CASE", help="Run only these cases")
+    parser.add_argument("--output", help="Write the results to this JSON file (e.g. a new baseline)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with a JSON baseline; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown before a case counts as a regression (0.2 = 20%%)")
+    parser.add_argument("--verify-fast", type=int, metavar="N",
+                        help="Instead of timing, check the canvas renderer against platypus on N invoices")
+    args = parser.parse_args(argv)
+
+    if args.verify_fast:
+        checked, fallbacks, mismatches = verify_fast(args.verify_fast)
+        print(f"{checked} invoice(s) identical, {fallbacks} left to platypus, {len(mismatches)} different")
+        for number, item_count, expected, actual in mismatches:
+            pages = [index for index, (page, fast_page) in enumerate(zip(expected, actual), 1) if page != fast_page]
+            detail = f"page(s) {', '.join(map(str, pages))} differ" if pages else "page count differs"
+            print(f"  {number} ({item_count} items): {detail}")
+        return 1 if mismatches else 0
+
+    names = args.only or list(SUITES[args.suite])
+    unknown = [name for name in names if name not in SUITES[args.suite]]
+    if unknown:
+        parser.error(f"unknown case(s) for the {args.suite} suite: {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for name in names:
+        results[name] = run_case(args.suite, name)
+        print(format_result(name, results[name], baseline), flush=True)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "suite": args.suite,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": socket.gethostname(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results written to {args.output}")
+
+    failed = [name for name, result in results.items() if "error" in result]
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    if regressions:
+        print(f"Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+    return 1 if failed or regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
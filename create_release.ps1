@@ -24,6 +24,24 @@ try {
     $sourceFiles = @(
         "invoice.py",
         "mac_compatibility.py", 
+        "invoice_render.py",
+        "invoice_batch.py",
+        "invoice_import.py",
+        "invoice_totals.py",
+        "invoice_mail.py",
+        "item_grid.py",
+        "item_store.py",
+        "invoice_config.py",
+        "invoice_export.py",
+        "xlsx_writer.py",
+        "invoice_flow.py",
+        "invoice_store.py",
+        "customer_index.py",
+        "invoice_numbers.py",
+        "benchmark.py",
+        "invoice_profile.py",
+        "render_cache.py",
+        "mail_outbox.py",
         "requirements.txt",
         "LICENSE.txt",
         "README.md",
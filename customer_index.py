@@ -0,0 +1,61 @@
+# Customer name index for Invoice Generator Premium
+# Prefix search over customer names for as-you-type autocomplete
+
+import threading
+from bisect import bisect_left
+
+class CustomerIndex:
+    """Customers kept sorted by case-folded name, searched with bisect
+
+    A prefix lookup is two binary searches plus a slice, so it stays well
+    under a millisecond for 100k customers. Adding a customer is an insert
+    into the sorted lists. Safe to share between the Tk thread and jobs.
+    """
+
+    def __init__(self, customers=()):
+        """customers is an iterable of (name, email) pairs"""
+        self._lock = threading.Lock()
+        self._emails = {}  # Folded name -> (name, email)
+        for name, email in customers:
+            name = name.strip()
+            if name:
+                self._emails[name.casefold()] = (name, email or "")
+        self._keys = sorted(self._emails)
+        self._names = [self._emails[key][0] for key in self._keys]
+
+    @classmethod
+    def from_store(cls, store):
+        """Index every customer in an InvoiceStore"""
+        return cls(store.list_customers())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, name, email=""):
+        """Add a customer, or update the email of a known one (an empty email keeps the old one)"""
+        name = name.strip()
+        if not name:
+            return
+        key = name.casefold()
+        with self._lock:
+            known = self._emails.get(key)
+            if known is None:
+                position = bisect_left(self._keys, key)
+                self._keys.insert(position, key)
+                self._names.insert(position, name)
+            self._emails[key] = (name if known is None else known[0], email or (known[1] if known else ""))
+
+    def search(self, prefix, limit=10):
+        """Names starting with prefix (case-insensitive), in sorted order; limit=None for all"""
+        key = prefix.strip().casefold()
+        with self._lock:
+            start = bisect_left(self._keys, key)
+            end = bisect_left(self._keys, key + "\U0010ffff", start)
+            if limit is not None:
+                end = min(end, start + limit)
+            return self._names[start:end]
+
+    def email_for(self, name):
+        """The saved email for a customer, or "" if there is none"""
+        known = self._emails.get(name.strip().casefold())
+        return known[1] if known else ""
@@ -4,87 +4,93 @@
 # Licensed under the MIT License
 # Version 2.0 - Premium Edition
 
+import time
+STARTUP_STARTED = time.perf_counter()
+
+# Only what the window needs is imported here. PDF rendering (reportlab, PIL),
+# pandas/openpyxl and the email modules are imported where they are first
+# used, and pre-warmed in the background once the window is up.
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
+import sys
 import shutil
-from mac_compatibility import get_config_path, get_app_path, set_ui_style
+from mac_compatibility import get_app_path, set_ui_style
 from tkcalendar import DateEntry
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Image, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
-from reportlab.lib.units import inch
-import pandas as pd
+from invoice_config import load_config, ConfigSaver
+from invoice_profile import span
+import invoice_profile
+from invoice_totals import line_total, tax_amount, format_money
+from item_grid import VirtualItemGrid
+from item_store import ItemStore
 import os
-import json
-import smtplib
-import ssl
-from email import encoders
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email.mime.application import MIMEApplication
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from PIL import Image as PILImage
 
 # ---------------------------- Constants & Globals ----------------------------
 LANGUAGE = "English"
-items = []  # List to hold invoice items
+items = ItemStore()  # Invoice line items: (row id, name, quantity, price) rows
 theme = "light"
-DEFAULT_CONFIG = {
-    "company_name": "",
-    "address": "",
-    "city": "",
-    "country": "",
-    "phone": "",
-    "email": "",
-    "website": "",
-    "tax_id": "",
-    "currency": "USD",
-    "logo_path": ""
-}
 
-# ---------------------------- Helper Functions ----------------------------
-def load_config():
-    config_path = get_config_path()
-    # Ensure the parent directory exists
-    os.makedirs(os.path.dirname(config_path), exist_ok=True)
+# Modules loaded in the background after the window appears (see prewarm_modules)
+PREWARM_MODULES = ["invoice_render", "invoice_export", "openpyxl", "invoice_mail"]
+PREWARM_DELAY_MS = 300
+
+# ---------------------------- Startup Timing ----------------------------
+# Set INVOICE_STARTUP_REPORT=1 to print how long each startup stage took.
+startup_marks = []  # (label, seconds since STARTUP_STARTED)
 
-    if os.path.exists(config_path):
+def mark_startup(label):
+    startup_marks.append((label, time.perf_counter() - STARTUP_STARTED))
+
+def report_startup():
+    """Print the startup timeline to stderr when INVOICE_STARTUP_REPORT is set"""
+    if not os.environ.get("INVOICE_STARTUP_REPORT"):
+        return
+    previous = 0.0
+    print("Startup timing:", file=sys.stderr)
+    for label, elapsed in startup_marks:
+        print(f"  {elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:6.1f})  {label}", file=sys.stderr)
+        previous = elapsed
+
+def prewarm_modules():
+    """Import the heavy modules on a background thread so the first PDF/export/email is quick
+
+    Disabled with INVOICE_PREWARM=0.
+    """
+    if os.environ.get("INVOICE_PREWARM", "1") == "0":
+        return
+    
+    def warm():
+        started = time.perf_counter()
+        for name in PREWARM_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"Pre-warm of {name} failed: {e}")
         try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            # If file is corrupted or unreadable, it will be overwritten by a default one
-            pass
-
-    # Create and return a default config if it doesn't exist or was invalid
-    default_config = {
-        "company_name": "",
-        "address": "",
-        "city": "",
-        "country": "",
-        "phone": "",
-        "email": "",
-        "website": "",
-        "tax_id": "",
-        "currency": "USD",
-        "logo_path": "",
-        "smtp_server": "",
-        "smtp_port": "587",
-        "smtp_user": "",
-        "smtp_password": ""
-    }
-    with open(config_path, 'w') as f:
-        json.dump(default_config, f, indent=4)
-    return default_config
+            get_customer_index()
+        except Exception as e:
+            print(f"Pre-warm of the customer index failed: {e}")
+        if os.environ.get("INVOICE_STARTUP_REPORT"):
+            print(f"Pre-warmed {', '.join(PREWARM_MODULES)} in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    
+    threading.Thread(target=warm, name="prewarm", daemon=True).start()
 
+# ---------------------------- Helper Functions ----------------------------
 def save_config(show_message=True):
-    config_path = get_config_path()
+    """Save the Settings tab
+
+    The Save button writes at once and confirms; other callers pass
+    show_message=False and the write is debounced by config_saver.
+    """
     try:
+        from invoice_numbers import check_number_format
+        check_number_format(number_format_var.get() or "{prefix}{number:05d}")
+
         # Update the global config dictionary
-        config.update({
+        changes = {
             "company_name": company_name_var.get(),
             "address": address_var.get(),
             "city": city_var.get(),
@@ -94,16 +100,31 @@ def save_config(show_message=True):
             "website": website_var.get(),
             "tax_id": tax_id_var.get(),
             "currency": currency_var.get(),
-            "logo_path": logo_image_path,
+            "logo_path": config.get("logo_path", ""),
             "smtp_server": smtp_server_var.get(),
             "smtp_port": smtp_port_var.get(),
             "smtp_user": smtp_user_var.get(),
             "smtp_password": smtp_password_var.get(),
-        })
+            "invoice_number_prefix": number_prefix_var.get(),
+            "invoice_number_format": number_format_var.get() or "{prefix}{number:05d}",
+            "profiling": bool(profiling_var.get()),
+        }
+        config.update(changes)
 
         # Write the updated config to the file
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=4)
+        config_saver.save(changes)
+        if show_message:
+            config_saver.flush()
+
+        # New numbers follow the new prefix/format; rendering picks up the
+        # new settings (logo, styles) on the next PDF
+        if number_allocator is not None and (
+                number_allocator.prefix != config["invoice_number_prefix"]
+                or number_allocator.number_format != config["invoice_number_format"]):
+            reset_number_allocator()
+        if "invoice_render" in sys.modules:
+            sys.modules["invoice_render"].clear_render_cache()
+        apply_profiling()
 
         if show_message:
             messagebox.showinfo("Success", "Settings saved successfully!")
@@ -114,6 +135,331 @@ def save_config(show_message=True):
     except Exception as e:
         messagebox.showerror("Error", f"Failed to save settings: {e}")
 
+def apply_profiling():
+    """Record timing spans if enabled in Settings; INVOICE_PROFILE takes precedence"""
+    if not invoice_profile.configure_from_env():
+        invoice_profile.configure(config.get("profiling", False))
+
+def save_settings(changes):
+    """Update single settings (e.g. the logo) without saving the rest of the form"""
+    config.update(changes)
+    config_saver.save(changes)
+
+# ---------------------------- Background Jobs ----------------------------
+# Rendering, exporting and emailing run on a worker thread so the window stays
+# responsive. Dialogs are shown on the Tk thread before a job starts; the job
+# itself only touches plain data, and its result is handed back to the Tk
+# thread by polling with root.after().
+class JobCancelled(Exception):
+    """Raised inside a background job after the user pressed Cancel"""
+
+job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="invoice-job")
+current_job = None  # The running job, if any
+
+def check_cancelled(job, status=None):
+    """Stop a job between stages if it was cancelled, otherwise update its status text"""
+    if job["cancel"].is_set():
+        raise JobCancelled()
+    if status:
+        job["status"] = status
+
+def run_in_background(description, task, on_success, on_error=None):
+    """Run task(job) on the worker thread and call on_success(result) on the Tk thread"""
+    global current_job
+    if current_job is not None:
+        messagebox.showwarning("Busy", "Please wait for the current task to finish.")
+        return False
+    
+    job = {"status": description, "cancel": threading.Event(),
+           "on_success": on_success, "on_error": on_error}
+    job["future"] = job_executor.submit(task, job)
+    current_job = job
+    
+    # Show the progress indicator and lock the action buttons
+    for button in (generate_btn, export_btn, email_btn):
+        button.state(["disabled"])
+    cancel_btn.state(["!disabled"])
+    job_status_label.config(text=description)
+    job_frame.pack(side="left", padx=20)
+    job_progress.start(10)
+    root.after(100, poll_job)
+    return True
+
+def poll_job():
+    """Check the running job; deliver its result once it has finished"""
+    global current_job
+    job = current_job
+    if job is None:
+        return
+    if not job["future"].done():
+        job_status_label.config(text=job["status"])
+        root.after(100, poll_job)
+        return
+    
+    current_job = None
+    job_progress.stop()
+    job_frame.pack_forget()
+    for button in (generate_btn, export_btn, email_btn):
+        button.state(["!disabled"])
+    
+    if job["cancel"].is_set():
+        return
+    try:
+        result = job["future"].result()
+    except JobCancelled:
+        return
+    except Exception as e:
+        print(f"Background task error: {e}")
+        if job["on_error"]:
+            job["on_error"](e)
+        else:
+            messagebox.showerror("Error", str(e))
+        return
+    job["on_success"](result)
+
+def cancel_job():
+    """Ask the running job to stop; its result is discarded when it finishes"""
+    if current_job is not None:
+        current_job["cancel"].set()
+        current_job["status"] = "Cancelling..."
+        job_status_label.config(text="Cancelling...")
+        cancel_btn.state(["disabled"])
+
+# ---------------------------- Invoice History ----------------------------
+# Every generated or emailed invoice is recorded in the local invoice database
+# (invoices.db next to config.json). It is opened on first use, from a job.
+invoice_store = None
+invoice_store_lock = threading.Lock()
+
+def get_invoice_store():
+    global invoice_store
+    with invoice_store_lock:
+        if invoice_store is None:
+            from invoice_store import InvoiceStore
+            invoice_store = InvoiceStore()
+        return invoice_store
+
+def record_invoice(invoice, company, email=None):
+    """Save an invoice to the history; a failure here never fails the job"""
+    if not invoice.get("invoice_number"):
+        return
+    try:
+        get_invoice_store().save_invoice(dict(invoice, email=email), company.get("currency") or "USD")
+        if customer_index is not None:
+            customer_index.add(invoice.get("customer", ""), email or "")
+    except Exception as e:
+        print(f"Failed to record invoice {invoice['invoice_number']}: {e}")
+
+# ---------------------------- Render Cache ----------------------------
+# Rendered PDFs are kept in pdf_cache next to config.json, so generating and
+# then emailing the same invoice renders it only once.
+render_cache = None
+render_cache_loaded = False
+
+def get_render_cache():
+    """The shared RenderCache, or None if render_cache_mb is 0"""
+    global render_cache, render_cache_loaded
+    if not render_cache_loaded:
+        from render_cache import RenderCache
+        render_cache = RenderCache.from_config(config)
+        render_cache_loaded = True
+    return render_cache
+
+# ---------------------------- Invoice Numbers ----------------------------
+# New invoices get the next number from the sequence shared by every window and
+# batch run using this config directory. A number that was shown but never used
+# for an invoice goes back to the sequence when it is replaced or the app closes.
+number_allocator = None
+allocated_number = None  # Number put in the Invoice Number field by the allocator
+
+def get_number_allocator():
+    global number_allocator
+    if number_allocator is None:
+        from invoice_numbers import InvoiceNumberAllocator
+        number_allocator = InvoiceNumberAllocator.from_config(config)
+    return number_allocator
+
+def release_unused_number():
+    """Hand the allocated number back if no invoice was saved with it"""
+    global allocated_number
+    if allocated_number is None or number_allocator is None:
+        return
+    try:
+        if get_invoice_store().get_invoice(allocated_number) is None:
+            number_allocator.release([allocated_number])
+    except Exception as e:
+        print(f"Failed to release invoice number {allocated_number}: {e}")
+    allocated_number = None
+
+def new_invoice_number():
+    """Fill the Invoice Number field with the next number in the sequence"""
+    global allocated_number
+    release_unused_number()
+    try:
+        allocated_number = get_number_allocator().next_number()
+    except Exception as e:
+        messagebox.showerror("Invoice Number Error", f"Failed to allocate an invoice number: {e}")
+        return
+    entry_invoice_number.delete(0, "end")
+    entry_invoice_number.insert(0, allocated_number)
+
+def reset_number_allocator():
+    """Start using new numbering settings"""
+    global number_allocator
+    release_unused_number()
+    if number_allocator is not None:
+        number_allocator.close()
+        number_allocator = None
+
+def on_close():
+    release_unused_number()
+    if number_allocator is not None:
+        number_allocator.close()
+    try:
+        config_saver.flush()
+    except Exception as e:
+        messagebox.showerror("Error", f"Failed to save settings: {e}")
+    root.destroy()
+
+# ---------------------------- Contacts ----------------------------
+# Customer names are indexed in memory for autocomplete in the Customer field.
+# The index is loaded from the invoice database on first use (or by the
+# pre-warm thread) and kept up to date as invoices and contacts are saved.
+customer_index = None
+customer_index_lock = threading.Lock()
+CUSTOMER_SUGGESTIONS = 8
+
+def get_customer_index():
+    global customer_index
+    with customer_index_lock:
+        if customer_index is None:
+            from customer_index import CustomerIndex
+            customer_index = CustomerIndex.from_store(get_invoice_store())
+        return customer_index
+
+def show_customer_suggestions():
+    """List the customers whose name starts with what is typed in the Customer field"""
+    prefix = entry_customer.get()
+    try:
+        names = get_customer_index().search(prefix, CUSTOMER_SUGGESTIONS) if prefix.strip() else []
+    except Exception as e:
+        print(f"Customer lookup failed: {e}")
+        names = []
+    if not names or names == [prefix]:
+        hide_customer_suggestions()
+        return
+    customer_suggestions.delete(0, "end")
+    for name in names:
+        customer_suggestions.insert("end", name)
+    customer_suggestions.config(height=len(names))
+    customer_suggestions.place(in_=entry_customer, relx=0, rely=1, relwidth=1)
+    customer_suggestions.lift()
+
+def hide_customer_suggestions(event=None):
+    customer_suggestions.place_forget()
+
+def on_customer_key(event):
+    if event.keysym == "Down" and customer_suggestions.winfo_ismapped():
+        customer_suggestions.focus_set()
+        customer_suggestions.selection_clear(0, "end")
+        customer_suggestions.selection_set(0)
+        customer_suggestions.activate(0)
+    elif event.keysym == "Escape":
+        hide_customer_suggestions()
+    elif event.keysym not in ("Up", "Down", "Return", "Tab", "Shift_L", "Shift_R"):
+        show_customer_suggestions()
+
+def on_customer_focus_out(event):
+    # Clicking a suggestion moves focus to the list; let that click through first
+    root.after(150, lambda: root.focus_get() is not customer_suggestions and hide_customer_suggestions())
+
+def pick_customer(event=None):
+    """Fill the Customer field with the highlighted suggestion"""
+    selection = customer_suggestions.curselection()
+    if not selection:
+        return
+    entry_customer.delete(0, "end")
+    entry_customer.insert(0, customer_suggestions.get(selection[0]))
+    hide_customer_suggestions()
+    entry_customer.focus_set()
+    entry_customer.icursor("end")
+
+def customer_email(name):
+    """The saved email address for a customer, or "" """
+    try:
+        return get_customer_index().email_for(name)
+    except Exception as e:
+        print(f"Customer lookup failed: {e}")
+        return ""
+
+def refresh_contacts(event=None):
+    """Show the contacts whose name starts with the search text"""
+    try:
+        index = get_customer_index()
+    except Exception as e:
+        messagebox.showerror("Contacts Error", f"Failed to load contacts: {e}")
+        return
+    names = index.search(contact_search_var.get(), limit=None)
+    contacts_table.store = [(name, index.email_for(name)) for name in names]
+    contacts_table.refresh()
+    contacts_table.scroll_to(0)
+    contacts_count_label.config(text=f"{len(names)} of {len(index)} contacts")
+
+def save_contact():
+    """Add a contact, or update the email address of an existing one"""
+    name, email = contact_name_var.get().strip(), contact_email_var.get().strip()
+    if not name:
+        messagebox.showwarning("Missing Name", "Please enter a contact name.")
+        return
+    try:
+        get_invoice_store().save_customer(name, email)
+        get_customer_index().add(name, email)
+    except Exception as e:
+        messagebox.showerror("Contacts Error", f"Failed to save contact: {e}")
+        return
+    contact_name_var.set("")
+    contact_email_var.set("")
+    refresh_contacts()
+
+# ---------------------------- Reports ----------------------------
+# Reports come from rollup tables the invoice database keeps up to date, so
+# opening the tab costs a few small queries however long the history is.
+REPORTS = {
+    # name: (store method, row key of the first column, its heading)
+    "Revenue by month": ("revenue_by_month", "month", "Month"),
+    "Revenue by customer": ("revenue_by_customer", "customer", "Customer"),
+    "Revenue by currency": ("revenue_by_currency", "currency", "Currency"),
+}
+
+def refresh_reports(event=None):
+    """Reload the selected report and the outstanding totals"""
+    method, key, heading = REPORTS[report_kind_var.get()]
+    try:
+        store = get_invoice_store()
+        rows = getattr(store, method)()
+        by_currency = store.revenue_by_currency() if method != "revenue_by_currency" else rows
+    except Exception as e:
+        messagebox.showerror("Reports Error", f"Failed to load reports: {e}")
+        return
+    
+    reports_table.store = [
+        (row[key] or "(none)", row["currency"], row["invoices"], row["subtotal"],
+         row["tax"], row["total"], row["outstanding"])
+        for row in rows
+    ]
+    reports_table.heading("Group", text=heading)
+    reports_table.refresh()
+    reports_table.scroll_to(0)
+    
+    outstanding = [f"{format_money(row['outstanding'])} {row['currency']}" for row in by_currency if row["outstanding"]]
+    outstanding_label.config(text=f"Outstanding: {', '.join(outstanding) or 'nothing'}")
+
+def on_tab_changed(event):
+    if nb.select() == str(reports_tab):
+        refresh_reports()
+    elif nb.select() == str(contacts_tab):
+        refresh_contacts()
+
 # ---------------------------- PDF Generation ----------------------------
 def export_to_excel():
     """Export invoice data to Excel/CSV"""
@@ -135,296 +481,125 @@ def export_to_excel():
         
         if not file_path:  # User cancelled
             return
-            
-        # Prepare data
-        data = {
-            "Item": [item[1] for item in items],
-            "Quantity": [float(item[2]) for item in items],
-            "Unit Price": [float(item[3]) for item in items],
-            "Total": [float(item[2]) * float(item[3]) for item in items]
-        }
         
-        # Create DataFrame
-        df = pd.DataFrame(data)
-        
-        # Calculate summary
-        subtotal = df["Total"].sum()
+        # Snapshot the items so edits during the export don't affect it
+        store = items.copy()
         tax_rate = float(entry_tax.get() or 0)
-        tax = subtotal * (tax_rate / 100)
-        total = subtotal + tax
-        
-        # Add summary rows
-        summary = pd.DataFrame({
-            "Item": ["", "Subtotal", f"Tax ({tax_rate}%)", "Total"],
-            "Quantity": ["", "", "", ""],
-            "Unit Price": ["", "", "", ""],
-            "Total": ["", subtotal, tax, total]
-        })
-        
-        df = pd.concat([df, summary], ignore_index=True)
-        
-        # Export based on file extension
-        if file_path.endswith('.csv'):
-            df.to_csv(file_path, index=False, float_format='%.2f')
-            messagebox.showinfo("Success", f"Invoice data exported to:\n{file_path}")
-        else:  # Default to Excel
-            try:
-                # Use openpyxl for Excel export
-                with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, sheet_name='Invoice')
-                    
-                    # Get the workbook and worksheet
-                    workbook = writer.book
-                    worksheet = writer.sheets['Invoice']
-                    
-                    # Import styling modules
-                    from openpyxl.styles import Font, PatternFill, Alignment
-                    
-                    # Create styles
-                    header_fill = PatternFill(start_color='2C3E50', end_color='2C3E50', fill_type='solid')
-                    header_font = Font(bold=True, color='FFFFFF')
-                    bold_font = Font(bold=True)
-                    
-                    # Format headers
-                    for col_num in range(1, len(df.columns) + 1):
-                        cell = worksheet.cell(1, col_num)
-                        cell.fill = header_fill
-                        cell.font = header_font
-                        cell.alignment = Alignment(horizontal='center')
-                    
-                    # Format summary rows (last 3 rows)
-                    for row in range(len(df) - 2, len(df) + 1):
-                        for col in range(1, len(df.columns) + 1):
-                            cell = worksheet.cell(row + 1, col)  # +1 because Excel is 1-indexed
-                            cell.font = bold_font
-                    
-                    # Set column widths
-                    for idx, col in enumerate(df.columns):
-                        # Get maximum length of any item in the column
-                        max_length = max(df[col].astype(str).apply(len).max(), len(str(col)))
-                        # Set column width based on max length
-                        column_letter = worksheet.cell(1, idx + 1).column_letter
-                        worksheet.column_dimensions[column_letter].width = min(max_length + 2, 30)
-                    
-                    # Format currency columns (Unit Price and Total)
-                    for row in range(2, len(df) + 2):  # Excel is 1-indexed, and header is row 1
-                        # Format Unit Price column
-                        unit_price_col = worksheet.cell(1, 3).column_letter
-                        worksheet[f'{unit_price_col}{row}'].number_format = '#,##0.00'
-                        
-                        # Format Total column
-                        total_col = worksheet.cell(1, 4).column_letter
-                        worksheet[f'{total_col}{row}'].number_format = '#,##0.00'
-                
-                messagebox.showinfo("Success", f"Invoice data exported to:\n{file_path}")
-            except Exception as excel_error:
-                messagebox.showerror("Excel Export Error", f"Failed to export to Excel: {str(excel_error)}\n\nTrying CSV export as fallback...")
-                
-                # Fallback to CSV if Excel export fails
-                csv_path = file_path.rsplit(".", 1)[0] + ".csv"
-                df.to_csv(csv_path, index=False, float_format='%.2f')
-                messagebox.showinfo("Success", f"Invoice data exported to CSV as fallback:\n{csv_path}")
-        
     except Exception as e:
         messagebox.showerror("Export Error", f"Failed to export data: {str(e)}")
+        return
+    
+    def task(job):
+        from invoice_export import write_export
+        
+        with span("export_to_excel", items=len(store)):
+            check_cancelled(job, "Exporting invoice data...")
+            return write_export(store, tax_rate, file_path)
+    
+    def done(result):
+        written_path, excel_error = result
+        if excel_error is not None:
+            messagebox.showerror("Excel Export Error", f"Failed to export to Excel: {str(excel_error)}\n\nExported to CSV as fallback.")
+            messagebox.showinfo("Success", f"Invoice data exported to CSV as fallback:\n{written_path}")
+        else:
+            messagebox.showinfo("Success", f"Invoice data exported to:\n{written_path}")
+    
+    run_in_background("Exporting invoice data...", task, done,
+                      lambda e: messagebox.showerror("Export Error", f"Failed to export data: {str(e)}"))
+
+
+def current_invoice():
+    """Collect the invoice shown in the Invoice tab as a plain dict for the renderer"""
+    return {
+        "invoice_number": entry_invoice_number.get().strip(),
+        "date": date_entry.get(),
+        "customer": entry_customer.get().strip(),
+        "tax_rate": float(entry_tax.get() or 0),
+        "items": items.copy()  # Snapshot; the table may change while a job renders
+    }
 
-
-def generate_pdf(filename=None, show_dialog=True):
-    """Generate a PDF invoice with proper formatting and error handling"""
+def current_company():
+    """Company details from the Settings tab, layered over the saved config"""
+    company = dict(config)
+    company.update({
+        "company_name": company_name_var.get(),
+        "address": address_var.get(),
+        "city": city_var.get(),
+        "country": country_var.get(),
+        "phone": phone_var.get(),
+        "email": email_var.get(),
+        "website": website_var.get(),
+        "tax_id": tax_id_var.get(),
+        "currency": currency_var.get() or "USD",
+    })
+    return company
+
+def open_file(filename):
+    """Open a file with the platform's default application"""
+    import subprocess
+    import platform
+    
+    if platform.system() == 'Windows':
+        os.startfile(os.path.normpath(filename))
+    elif platform.system() == 'Darwin':  # macOS
+        subprocess.Popen(['open', filename])
+    else:  # Linux
+        subprocess.Popen(['xdg-open', filename])
+
+def generate_pdf():
+    """Generate a PDF invoice in the background and open it when done"""
+    if not items:
+        messagebox.showwarning("No Items", "Please add at least one item to the invoice.")
+        return False
+    
+    filename = filedialog.asksaveasfilename(
+        defaultextension=".pdf",
+        filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")],
+        title="Save PDF Invoice As"
+    )
+    
+    if not filename:  # User cancelled
+        return False
+    
     try:
-        # Get customer and invoice details
-        customer_name = entry_customer.get().strip()
-        invoice_number = entry_invoice_number.get().strip()
-        invoice_date = date_entry.get()
-        tax_rate = float(entry_tax.get() or 0)
-        
-        # Company details (from global config)
-        company_name = company_name_var.get() or "Your Company"
-        company_address = address_var.get() or ""
-        company_city = city_var.get() or ""
-        company_country = country_var.get() or ""
-        company_phone = phone_var.get() or ""
-        company_email = email_var.get() or ""
-        company_website = website_var.get() or ""
-        company_tax_id = tax_id_var.get() or ""
-        
-        # Currency - ensure it defaults to USD
-        currency = currency_var.get() or "USD"
-        
-        if not items:
-            messagebox.showwarning("No Items", "Please add at least one item to the invoice.")
-            return False
-        
-        # If filename is not provided and show_dialog is True, ask for a filename
-        if not filename and show_dialog:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")],
-                title="Save PDF Invoice As"
-            )
-            
-            if not filename:  # User cancelled
-                return False
-        
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
-        
-        # Create a PDF document
-        doc = SimpleDocTemplate(filename, pagesize=letter)
-        
-        # Container for the PDF elements
-        elements = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = styles["Title"]
-        heading_style = styles["Heading2"]
-        normal_style = styles["Normal"]
-        italic_style = styles["Italic"]
-        
-        # Create custom styles
-        right_style = ParagraphStyle(
-            name='RightAlign',
-            parent=styles['Normal'],
-            alignment=TA_RIGHT  # Using reportlab constants for alignment
-        )
-        
-        # Add company logo if available
-        logo_path = config.get("logo_path", "")
-        if logo_path and os.path.exists(logo_path):
-            try:
-                img = PILImage.open(logo_path)
-                width, height = img.size
-                aspect = height / width
-                img_width = 1.5 * inch
-                img_height = img_width * aspect
-                logo = Image(logo_path, width=img_width, height=img_height)
-                elements.append(logo)
-                elements.append(Spacer(1, 12))
-            except Exception as e:
-                print(f"Error loading logo: {e}")
-        
-        # Add title
-        elements.append(Paragraph(f"{company_name}", title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Company details
-        if company_address or company_city or company_country:
-            address_str = ", ".join(filter(None, [company_address, company_city, company_country]))
-            elements.append(Paragraph(f"<b>Address:</b> {address_str}", normal_style))
-        
-        if company_phone:
-            elements.append(Paragraph(f"<b>Phone:</b> {company_phone}", normal_style))
-        
-        if company_email:
-            elements.append(Paragraph(f"<b>Email:</b> {company_email}", normal_style))
-        
-        if company_website:
-            elements.append(Paragraph(f"<b>Website:</b> {company_website}", normal_style))
-        
-        if company_tax_id:
-            elements.append(Paragraph(f"<b>Tax ID:</b> {company_tax_id}", normal_style))
-        
-        elements.append(Spacer(1, 24))
-        
-        # Invoice header
-        elements.append(Paragraph("INVOICE", heading_style))
-        elements.append(Spacer(1, 12))
-        
-        # Invoice details in a table format
-        invoice_data = [
-            [Paragraph("<b>Invoice #:</b>", normal_style), invoice_number],
-            [Paragraph("<b>Date:</b>", normal_style), invoice_date],
-            [Paragraph("<b>Customer:</b>", normal_style), customer_name]
-        ]
-        
-        invoice_table = Table(invoice_data, colWidths=[100, 150])
-        invoice_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ]))
-        
-        elements.append(invoice_table)
-        elements.append(Spacer(1, 24))
-        
-        # Invoice items table
-        items_data = [["Item", "Quantity", f"Unit Price ({currency})", f"Total ({currency})"]]
-        
-        subtotal = 0
-        for item_data in items:
-            name = item_data[1]
-            quantity = float(item_data[2])
-            price = float(item_data[3])
-            total = quantity * price
-            subtotal += total
-            
-            items_data.append([name, f"{quantity:.2f}", f"{price:.2f}", f"{total:.2f}"])
-        
-        # Calculate tax and total
-        tax_amount = subtotal * (tax_rate / 100)
-        total_amount = subtotal + tax_amount
-        
-        # Add summary rows
-        items_data.append(["", "", "Subtotal:", f"{subtotal:.2f}"])
-        items_data.append(["", "", f"Tax ({tax_rate}%):", f"{tax_amount:.2f}"])
-        items_data.append(["", "", "Total:", f"{total_amount:.2f}"])
-        
-        # Create the table with the items
-        col_widths = [doc.width * 0.4, doc.width * 0.15, doc.width * 0.2, doc.width * 0.25]
-        items_table = Table(items_data, colWidths=col_widths)
-        
-        # Apply styles to the table
-        table_style = [
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -4), colors.beige),
-            ('GRID', (0, 0), (-1, -4), 1, colors.black),
-            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
-        ]
-        items_table.setStyle(TableStyle(table_style))
-        
-        elements.append(items_table)
-        elements.append(Spacer(1, 48))
-        
-        # Footer with terms
-        elements.append(Paragraph("<b>Terms & Conditions</b>", normal_style))
-        elements.append(Paragraph("Payment is due within 30 days.", normal_style))
-        elements.append(Paragraph("Please make checks payable to the company name above.", normal_style))
-        
-        # Build the PDF
-        doc.build(elements)
-        
-        if show_dialog:
-            messagebox.showinfo("Success", f"Invoice PDF generated successfully at:\n{filename}")
-            
-            # Try to open the PDF automatically
-            try:
-                import subprocess
-                import platform
-                
-                if platform.system() == 'Windows':
-                    os.startfile(os.path.normpath(filename))
-                elif platform.system() == 'Darwin':  # macOS
-                    subprocess.run(['open', filename])
-                else:  # Linux
-                    subprocess.run(['xdg-open', filename])
-            except Exception as e:
-                print(f"Failed to open PDF: {e}")
-                messagebox.showinfo("PDF Created", f"PDF created but couldn't be opened automatically.\nLocation: {filename}")
+        invoice, company = current_invoice(), current_company()
+    except ValueError as e:
+        messagebox.showerror("PDF Generation Error", f"Failed to generate PDF: {str(e)}")
+        return False
+    
+    def task(job):
+        from invoice_render import render_invoice
         
-        return True
+        with span("generate_pdf", items=len(invoice["items"])) as record:
+            check_cancelled(job, "Rendering PDF...")
+            render_invoice(invoice, company, filename, cache=get_render_cache())
+            record["bytes"] = os.path.getsize(filename)
+            with span("history.save"):
+                record_invoice(invoice, company)
+        return filename
+    
+    def done(filename):
+        messagebox.showinfo("Success", f"Invoice PDF generated successfully at:\n{filename}")
         
-    except Exception as e:
-        if show_dialog:
-            messagebox.showerror("PDF Generation Error", f"Failed to generate PDF: {str(e)}")
+        # Try to open the PDF automatically
+        try:
+            open_file(filename)
+        except Exception as e:
+            print(f"Failed to open PDF: {e}")
+            messagebox.showinfo("PDF Created", f"PDF created but couldn't be opened automatically.\nLocation: {filename}")
+    
+    def failed(e):
         print(f"PDF generation error: {e}")
-        return False
+        messagebox.showerror("PDF Generation Error", f"Failed to generate PDF: {str(e)}")
+    
+    return run_in_background("Rendering PDF...", task, done, failed)
 
 # ---------------------------- GUI Functions ----------------------------
+# The items table is a virtual grid over `items`: only the visible rows exist
+# as widgets. Adding or removing an item adjusts a running subtotal (in cents)
+# by that line's total instead of recomputing every line.
+items_subtotal = 0  # Running subtotal of `items`, in cents
+
 def add_item():
     item_name = entry_item.get()
     quantity = entry_quantity.get()
@@ -432,10 +607,7 @@ def add_item():
     
     if item_name and quantity and price:
         try:
-            # Add item with an index number
-            item_index = len(items) + 1
-            items.append((item_index, item_name, float(quantity), float(price)))
-            update_items_table()
+            append_items([(item_name, float(quantity), float(price))])
             entry_item.delete(0, tk.END)
             entry_quantity.delete(0, tk.END)
             entry_price.delete(0, tk.END)
@@ -444,7 +616,64 @@ def add_item():
     else:
         messagebox.showerror("Error", "All item fields are required!")
 
+def append_items(new_items):
+    """Add (name, quantity, price) items, updating the running totals and showing the end of the table"""
+    global items_subtotal
+    for name, quantity, price in new_items:
+        items.append(name, quantity, price)
+        items_subtotal += line_total(quantity, price)
+    
+    items_table.refresh(scroll_to_end=True)
+    update_totals()
+
+def remove_item():
+    """Remove the last item from the items list"""
+    global items_subtotal
+    if items:
+        item_data = items.pop()
+        items_subtotal -= line_total(item_data[2], item_data[3])
+        items_table.refresh()
+        update_totals()
+
+def clear_items():
+    """Remove every item"""
+    items.clear()
+    update_items_table()
+
+def paste_items():
+    """Add line items from the clipboard (tab or comma separated: item, quantity, price)"""
+    try:
+        text = root.clipboard_get()
+    except tk.TclError:
+        messagebox.showwarning("Paste Items", "The clipboard is empty.")
+        return
+    
+    new_items = []
+    skipped = 0
+    for line in text.splitlines():
+        fields = [field.strip() for field in (line.split("\t") if "\t" in line else line.split(","))]
+        if len(fields) < 3 or not fields[0]:
+            skipped += 1
+            continue
+        try:
+            quantity, price = float(fields[1]), float(fields[2].replace(",", ""))
+        except ValueError:
+            skipped += 1  # e.g. a header row
+            continue
+        new_items.append((fields[0], quantity, price))
+    
+    if new_items:
+        append_items(new_items)
+    if skipped:
+        messagebox.showinfo("Paste Items", f"Added {len(new_items)} item(s); skipped {skipped} line(s) that were not item, quantity, price.")
+
+def apply_item_filter(event=None):
+    """Filter the items table by the column and text in the filter bar"""
+    items_table.set_filter(filter_column_var.get(), filter_text_var.get())
+
 def update_items_table():
+    """Redraw the items table and recompute totals (used on startup, clear and currency changes)"""
+    global items_subtotal
     # Update currency label - ensure we use USD as default if not set
     currency = config.get("currency", "USD")
     if price_label:
@@ -453,28 +682,24 @@ def update_items_table():
     # Update table header
     items_table.heading("Price", text=f"Price ({currency})")
     
-    # Clear table
-    for item in items_table.get_children():
-        items_table.delete(item)
-        
-    # Populate table with items
-    subtotal = 0.0
-    for item_data in items:
-        # Unpack tuple which now includes the index
-        item_index, item_name, quantity, price = item_data
-        item_total = quantity * price
-        subtotal += item_total
-        items_table.insert("", "end", values=(item_index, item_name, quantity, f"{price:.2f}"))
+    # Recompute the running subtotal from scratch
+    items_subtotal = items.totals()["subtotal"]
+    items_table.refresh()
+    
+    update_totals()
+
+def update_totals(event=None):
+    """Show the running subtotal, tax and total in the summary frame"""
+    currency = config.get("currency", "USD")
     
     # Calculate and display total
     tax_rate = 0.0
     try:
-        tax_rate = float(entry_tax.get()) / 100.0
+        tax_rate = float(entry_tax.get())
     except (ValueError, AttributeError):
         pass
     
-    tax_amount = subtotal * tax_rate
-    total = subtotal + tax_amount
+    tax = tax_amount(items_subtotal, tax_rate)
     
     # Update summary display
     if "total_frame" not in globals():
@@ -502,9 +727,9 @@ def update_items_table():
         total_label.grid(row=2, column=1, sticky="e", padx=5)
     
     # Update the labels with the calculated values
-    subtotal_label.config(text=f"{currency} {subtotal:.2f}")
-    tax_label.config(text=f"{currency} {tax_amount:.2f}")
-    total_label.config(text=f"{currency} {total:.2f}")
+    subtotal_label.config(text=f"{currency} {format_money(items_subtotal)}")
+    tax_label.config(text=f"{currency} {format_money(tax)}")
+    total_label.config(text=f"{currency} {format_money(items_subtotal + tax)}")
 
 def load_logo(image_path, size=(150, 80)):
     """Load and resize logo image"""
@@ -533,8 +758,7 @@ def select_logo():
     
     if file_path:
         # Update the config with the new logo path
-        config["logo_path"] = file_path
-        save_config()
+        save_settings({"logo_path": file_path})
         
         # Display the logo
         company_logo = load_logo(file_path)
@@ -544,27 +768,17 @@ def select_logo():
         else:
             logo_label.config(text="Failed to load logo")
 
-def remove_item():
-    """Remove the last item from the items list"""
-    if items:
-        items.pop()
-        update_items_table()
-
 def clear_logo():
     """Clears the logo path from the config and UI."""
-    global config, logo_image_path, logo_label
-    
-    logo_image_path = ""
-    config['logo_path'] = ''
-    
     # Clear the UI
     logo_label.config(image=None)
     logo_label.image = None
     
-    # Save the change immediately
-    save_config()
+    save_settings({"logo_path": ""})
     messagebox.showinfo("Success", "Logo has been cleared.")
 
+mark_startup("imports")
+
 # Create main window and notebook tabs
 root = tk.Tk()
 root.title("Invoice Generator - Premium Edition")
@@ -591,6 +805,9 @@ style.configure('TFrame', background='#ffffff')
 
 # Load config first
 config = load_config()
+config_saver = ConfigSaver()  # Debounced, atomic writes of config.json
+apply_profiling()
+mark_startup("config loaded")
 
 # Create notebook (tabbed interface)
 nb = ttk.Notebook(root)
@@ -608,30 +825,69 @@ nb.add(settings_tab, text="Settings")
 nb.add(reports_tab, text="Reports ")
 nb.add(contacts_tab, text="Contacts ")
 
-# Add premium feature notices to premium tabs
-ttk.Label(
-    reports_tab, 
-    text="Reports Feature - Premium Edition", 
-    font=("Segoe UI", 14, "bold")
-).pack(pady=50)
-
-ttk.Label(
-    reports_tab, 
-    text="Track your sales performance, view customer history,\nand generate financial reports.", 
-    font=("Segoe UI", 12)
-).pack()
-
-ttk.Label(
-    contacts_tab, 
-    text="Customer Management - Premium Edition", 
-    font=("Segoe UI", 14, "bold")
-).pack(pady=50)
-
-ttk.Label(
-    contacts_tab, 
-    text="Manage your customer database, track communication history,\nand set follow-up reminders.", 
-    font=("Segoe UI", 12)
-).pack()
+nb.bind("<<NotebookTabChanged>>", on_tab_changed)
+
+# Reports tab: pick a report; it reloads whenever the tab is opened
+reports_bar = ttk.Frame(reports_tab, padding=10)
+reports_bar.pack(fill="x")
+ttk.Label(reports_bar, text="Report:").pack(side="left")
+report_kind_var = tk.StringVar(value="Revenue by month")
+report_combo = ttk.Combobox(reports_bar, textvariable=report_kind_var, values=list(REPORTS),
+                            width=22, state="readonly")
+report_combo.pack(side="left", padx=5)
+report_combo.bind("<<ComboboxSelected>>", refresh_reports)
+ttk.Button(reports_bar, text="Refresh", command=refresh_reports).pack(side="left", padx=5)
+outstanding_label = ttk.Label(reports_bar, text="", font=("Segoe UI", 10, "bold"))
+outstanding_label.pack(side="right", padx=5)
+
+reports_table = VirtualItemGrid(
+    reports_tab, [], ("Group", "Currency", "Invoices", "Subtotal", "Tax", "Total", "Outstanding"),
+    format_row=lambda row: (row[0], row[1], row[2], format_money(row[3]), format_money(row[4]),
+                            format_money(row[5]), format_money(row[6])),
+    sort_keys={
+        "Group": lambda row: str(row[0]).lower(),
+        "Currency": lambda row: row[1],
+        "Invoices": lambda row: row[2],
+        "Subtotal": lambda row: row[3],
+        "Tax": lambda row: row[4],
+        "Total": lambda row: row[5],
+        "Outstanding": lambda row: row[6],
+    },
+    height=18
+)
+reports_table.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+# Contacts tab: search by name prefix, add or update a contact's email
+contacts_bar = ttk.Frame(contacts_tab, padding=10)
+contacts_bar.pack(fill="x")
+ttk.Label(contacts_bar, text="Search:").pack(side="left")
+contact_search_var = tk.StringVar()
+contact_search_entry = ttk.Entry(contacts_bar, textvariable=contact_search_var, width=30)
+contact_search_entry.pack(side="left", padx=5)
+contact_search_entry.bind("<KeyRelease>", refresh_contacts)
+contacts_count_label = ttk.Label(contacts_bar, text="")
+contacts_count_label.pack(side="right", padx=5)
+
+contacts_table = VirtualItemGrid(
+    contacts_tab, [], ("Name", "Email"),
+    format_row=lambda row: row,
+    sort_keys={
+        "Name": lambda row: row[0].lower(),
+        "Email": lambda row: row[1].lower(),
+    },
+    height=16
+)
+contacts_table.pack(fill="both", expand=True, padx=10)
+
+contact_form = ttk.Frame(contacts_tab, padding=10)
+contact_form.pack(fill="x")
+contact_name_var = tk.StringVar()
+contact_email_var = tk.StringVar()
+ttk.Label(contact_form, text="Name:").pack(side="left")
+ttk.Entry(contact_form, textvariable=contact_name_var, width=30).pack(side="left", padx=5)
+ttk.Label(contact_form, text="Email:").pack(side="left")
+ttk.Entry(contact_form, textvariable=contact_email_var, width=30).pack(side="left", padx=5)
+ttk.Button(contact_form, text="Save Contact", command=save_contact).pack(side="left", padx=5)
 
 # Invoice tab layout - split into left and right frames
 frame_left = ttk.LabelFrame(invoice_tab, text="Invoice Details", padding=10)
@@ -642,9 +898,20 @@ ttk.Label(frame_left, text="Customer:").grid(row=0, column=0, sticky="w")
 entry_customer = ttk.Entry(frame_left, width=30)
 entry_customer.grid(row=0, column=1, pady=5)
 
+# Autocomplete list for the Customer field, floated just below it
+customer_suggestions = tk.Listbox(invoice_tab, exportselection=False, activestyle="none")
+entry_customer.bind("<KeyRelease>", on_customer_key)
+entry_customer.bind("<FocusOut>", on_customer_focus_out)
+customer_suggestions.bind("<Return>", pick_customer)
+customer_suggestions.bind("<Button-1>", lambda e: customer_suggestions.focus_set())
+customer_suggestions.bind("<ButtonRelease-1>", pick_customer)
+customer_suggestions.bind("<Escape>", lambda e: (hide_customer_suggestions(), entry_customer.focus_set()))
+customer_suggestions.bind("<FocusOut>", hide_customer_suggestions)
+
 ttk.Label(frame_left, text="Invoice Number:").grid(row=1, column=0, sticky="w")
 entry_invoice_number = ttk.Entry(frame_left, width=30)
 entry_invoice_number.grid(row=1, column=1, pady=5)
+ttk.Button(frame_left, text="New", width=5, command=new_invoice_number).grid(row=1, column=2, padx=(5, 0))
 
 ttk.Label(frame_left, text="Date:").grid(row=2, column=0, sticky="w")
 date_entry = DateEntry(frame_left, width=29, background='darkblue', foreground='white', date_pattern='yyyy-mm-dd')
@@ -654,6 +921,7 @@ ttk.Label(frame_left, text="Tax Rate (%):").grid(row=3, column=0, sticky="w")
 entry_tax = ttk.Entry(frame_left, width=30)
 entry_tax.grid(row=3, column=1, pady=5)
 entry_tax.insert(0, "0")  # Default to 0%
+entry_tax.bind("<KeyRelease>", update_totals)
 
 # Right frame for item entry
 frame_right = ttk.LabelFrame(invoice_tab, text="Add Items", padding=10)
@@ -675,17 +943,49 @@ entry_price.grid(row=2, column=1, pady=5)
 
 ttk.Button(frame_right, text="Add Item", command=add_item).grid(row=3, column=0, pady=10)
 ttk.Button(frame_right, text="Remove Last Item", command=remove_item).grid(row=3, column=1, pady=10)
-
+ttk.Button(frame_right, text="Paste Items", command=paste_items).grid(row=4, column=0, columnspan=2, pady=(0, 10))
+
+# Filter bar for the items table
+filter_frame = ttk.Frame(frame_left)
+filter_frame.grid(row=4, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+ttk.Label(filter_frame, text="Filter:").pack(side="left")
+filter_column_var = tk.StringVar(value="Item")
+ttk.Combobox(filter_frame, textvariable=filter_column_var, values=["Item", "Quantity", "Price"],
+             width=9, state="readonly").pack(side="left", padx=5)
+filter_text_var = tk.StringVar()
+filter_entry = ttk.Entry(filter_frame, textvariable=filter_text_var)
+filter_entry.pack(side="left", fill="x", expand=True)
+filter_entry.bind("<KeyRelease>", apply_item_filter)
+filter_column_var.trace_add("write", lambda *args: apply_item_filter())
+
+# Items table; click a heading to sort by that column
 columns = ("#", "Item", "Quantity", "Price")
-items_table = ttk.Treeview(frame_left, columns=columns, show="headings", height=10)
-items_table.heading("#", text="#")
-items_table.heading("Item", text="Item")
-items_table.heading("Quantity", text="Quantity")
+items_table = VirtualItemGrid(
+    frame_left, items, columns,
+    format_row=lambda item: (item[0], item[1], item[2], f"{item[3]:.2f}"),
+    sort_keys={
+        "#": lambda item: item[0],
+        "Item": lambda item: item[1].lower(),
+        "Quantity": lambda item: item[2],
+        "Price": lambda item: item[3],
+    },
+    filter_keys={
+        "Item": lambda item: item[1],
+        "Quantity": lambda item: item[2],
+        "Price": lambda item: item[3],
+    },
+    height=10
+)
 items_table.heading("Price", text=f"Price ({config.get('currency', 'USD')})")
-items_table.grid(row=4, column=0, columnspan=2, pady=10)
+items_table.grid(row=5, column=0, columnspan=2, pady=10, sticky="nsew")
 
 def send_email():
-    # First generate the PDF
+    """Render the invoice and email it as a PDF attachment, in the background"""
+    if not items:
+        messagebox.showwarning("No Items", "Please add at least one item to the invoice.")
+        return False
+    
+    # Ask where to save the PDF that gets attached
     pdf_filename = filedialog.asksaveasfilename(
         defaultextension=".pdf",
         filetypes=[("PDF files", "*.pdf")],
@@ -695,73 +995,87 @@ def send_email():
     if not pdf_filename:  # User cancelled file dialog
         return False 
     
-    # Generate the PDF file for email attachment
-    if not generate_pdf(filename=pdf_filename, show_dialog=False):
-        messagebox.showerror("Error", "Failed to generate PDF for email attachment!")
-        return False
-        
-    # Verify the PDF was created
-    if not os.path.exists(pdf_filename):
-        messagebox.showerror("Error", "PDF file was not created successfully!")
-        return False
-    
     # Get recipient email
-    recipient = simpledialog.askstring("Email", "Enter recipient email:")
+    recipient = simpledialog.askstring("Email", "Enter recipient email:",
+                                       initialvalue=customer_email(entry_customer.get()))
     if not recipient:
         return False  # User cancelled dialog
     
-    # Get sender email and password
-    sender_email = simpledialog.askstring("Email", "Enter your Gmail address:")
-    if not sender_email:
-        return False
+    # Use the SMTP server from Settings, or fall back to Gmail with prompted credentials
+    from invoice_mail import smtp_settings
     
-    password = simpledialog.askstring("Email", "Enter your Gmail app password:", show="*")
-    if not password:
+    settings = smtp_settings(config)
+    if settings["smtp_server"]:
+        sender_email = settings["smtp_user"] or config.get("email", "")
+    else:
+        sender_email = simpledialog.askstring("Email", "Enter your Gmail address:")
+        if not sender_email:
+            return False
+        
+        password = simpledialog.askstring("Email", "Enter your Gmail app password:", show="*")
+        if not password:
+            return False
+        
+        settings.update({
+            "smtp_server": "smtp.gmail.com",
+            "smtp_port": "465",
+            "smtp_user": sender_email,
+            "smtp_password": password,
+        })
+    
+    try:
+        invoice, company = current_invoice(), current_company()
+    except ValueError as e:
+        messagebox.showerror("Error", f"Failed to generate PDF for email attachment!\n\n{e}")
         return False
     
-    # Setup email message
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = recipient
-    msg['Subject'] = f"Invoice {entry_invoice_number.get()}"
-    
-    # Email body
-    body = f"Please find attached invoice {entry_invoice_number.get()} for {entry_customer.get()}.\n\nThank you,\n{config.get('company_name', '')}"
-    msg.attach(MIMEText(body, 'plain'))
-    
-    # Attach PDF
-    with open(pdf_filename, 'rb') as attachment:
-        part = MIMEBase('application', 'pdf')
-        part.set_payload(attachment.read())
-    
-        encoders.encode_base64(part)
-        part.add_header(
-            'Content-Disposition',
-            f"attachment; filename= {os.path.basename(pdf_filename)}",
+    def task(job):
+        with span("send_email", items=len(invoice["items"])):
+            send_task(job)
+    
+    def send_task(job):
+        from invoice_render import render_invoice
+        from invoice_mail import MailQueue, build_invoice_message
+        
+        # Generate the PDF file for email attachment
+        check_cancelled(job, "Rendering PDF...")
+        render_invoice(invoice, company, pdf_filename, cache=get_render_cache())
+        
+        # Verify the PDF was created
+        if not os.path.exists(pdf_filename):
+            raise IOError("PDF file was not created successfully!")
+        
+        # Setup email message
+        check_cancelled(job, "Connecting to mail server...")
+        msg = build_invoice_message(
+            sender_email, recipient, invoice["invoice_number"], invoice["customer"],
+            config.get('company_name', ''), pdf_filename
         )
-        msg.attach(part)
         
-        # Send email
-        try:
-            # Create a secure SSL/TLS connection to Gmail SMTP server
-            server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
-            server.ehlo()
-            
-            # Login to your Gmail account
-            server.login(sender_email, password)
-            
-            # Send the email
-            text = msg.as_string()
-            server.sendmail(sender_email, recipient, text)
-            server.quit()
-            messagebox.showinfo("Success", "Email sent successfully!")
-            return True
-        except smtplib.SMTPAuthenticationError:
+        # Send email, through the same queue as bulk mail so dropped connections are retried
+        check_cancelled(job, "Sending email...")
+        def attempt(key, attempt):
+            if attempt:
+                job["status"] = f"Sending email (attempt {attempt + 1} of {mail.max_retries + 1})..."
+        
+        with MailQueue(settings, connections=1, on_attempt=attempt) as mail:
+            mail.submit(msg)
+            [(_, error)] = mail.join()
+        if error is not None:
+            raise error
+        with span("history.save"):
+            record_invoice(invoice, company, email=recipient)
+    
+    def failed(e):
+        import smtplib
+        
+        if isinstance(e, smtplib.SMTPAuthenticationError):
             messagebox.showerror("Email Error", "Authentication failed. Please check your email and app password.\n\nNote: You need to use an App Password if you have 2FA enabled on your Google account.")
-            return False
-        except Exception as e:
+        else:
             messagebox.showerror("Email Error", f"Failed to send email: {e}")
-            return False
+    
+    return run_in_background("Sending invoice...", task,
+                             lambda result: messagebox.showinfo("Success", "Email sent successfully!"), failed)
 
 # Create a frame for totals display that will be updated by update_items_table()
 # Note: The actual frame will be created in update_items_table if needed
@@ -781,7 +1095,7 @@ generate_btn.pack(side="left", padx=5)
 export_btn = ttk.Button(left_btn_frame, text="Export to Excel/CSV", command=export_to_excel)
 export_btn.pack(side="left", padx=5)
 
-clear_btn = ttk.Button(left_btn_frame, text="Clear All Items", command=lambda: [items.clear(), update_items_table()])
+clear_btn = ttk.Button(left_btn_frame, text="Clear All Items", command=clear_items)
 clear_btn.pack(side="left", padx=5)
 
 # Right side button for email
@@ -791,6 +1105,15 @@ right_btn_frame.pack(side="right")
 email_btn = ttk.Button(right_btn_frame, text="📧 Send Invoice", command=send_email)
 email_btn.pack(side="right", padx=5)
 
+# Progress indicator for background jobs; shown only while one is running
+job_frame = ttk.Frame(button_frame)
+job_progress = ttk.Progressbar(job_frame, mode="indeterminate", length=120)
+job_progress.pack(side="left", padx=5)
+job_status_label = ttk.Label(job_frame, text="")
+job_status_label.pack(side="left", padx=5)
+cancel_btn = ttk.Button(job_frame, text="Cancel", command=cancel_job)
+cancel_btn.pack(side="left", padx=5)
+
 # Premium feature indicator
 premium_label = ttk.Label(button_frame, text="Premium Features Available", foreground="#e67e22", font=("Segoe UI", 9, "italic"))
 premium_label.pack(side="right", padx=20)
@@ -809,6 +1132,13 @@ email_var = tk.StringVar(value=config["email"])
 website_var = tk.StringVar(value=config["website"])
 tax_id_var = tk.StringVar(value=config["tax_id"])
 currency_var = tk.StringVar(value=config["currency"])
+smtp_server_var = tk.StringVar(value=config.get("smtp_server", ""))
+smtp_port_var = tk.StringVar(value=config.get("smtp_port", "587"))
+smtp_user_var = tk.StringVar(value=config.get("smtp_user", ""))
+smtp_password_var = tk.StringVar(value=config.get("smtp_password", ""))
+number_prefix_var = tk.StringVar(value=config.get("invoice_number_prefix", "INV-"))
+number_format_var = tk.StringVar(value=config.get("invoice_number_format", "{prefix}{number:05d}"))
+profiling_var = tk.BooleanVar(value=bool(config.get("profiling", False)))
 
 # Logo frame
 logo_frame = ttk.Frame(settings_tab, padding=10)
@@ -869,6 +1199,37 @@ ttk.Label(form_frame, text="Currency:").grid(row=5, column=2, sticky="w", pady=5
 currency_combo = ttk.Combobox(form_frame, textvariable=currency_var, values=["USD", "EGP", "EUR", "GBP"], width=27, state="readonly")
 currency_combo.grid(row=5, column=3, sticky="w", pady=5)
 
+# Email Settings
+ttk.Label(form_frame, text="Email Settings", font=("Arial", 12, "bold")).grid(row=6, column=0, columnspan=2, pady=(20, 10), sticky="w")
+
+ttk.Label(form_frame, text="SMTP Server:").grid(row=7, column=0, sticky="w", pady=5)
+ttk.Entry(form_frame, textvariable=smtp_server_var, width=40).grid(row=7, column=1, sticky="w", pady=5)
+
+ttk.Label(form_frame, text="SMTP User:").grid(row=8, column=0, sticky="w", pady=5)
+ttk.Entry(form_frame, textvariable=smtp_user_var, width=40).grid(row=8, column=1, sticky="w", pady=5)
+
+ttk.Label(form_frame, text="SMTP Port:").grid(row=7, column=2, sticky="w", pady=5, padx=(30, 0))
+ttk.Entry(form_frame, textvariable=smtp_port_var, width=30).grid(row=7, column=3, sticky="w", pady=5)
+
+ttk.Label(form_frame, text="SMTP Password:").grid(row=8, column=2, sticky="w", pady=5, padx=(30, 0))
+ttk.Entry(form_frame, textvariable=smtp_password_var, width=30, show="*").grid(row=8, column=3, sticky="w", pady=5)
+
+# Invoice Numbers
+ttk.Label(form_frame, text="Invoice Numbers", font=("Arial", 12, "bold")).grid(row=9, column=0, columnspan=2, pady=(20, 10), sticky="w")
+
+ttk.Label(form_frame, text="Prefix:").grid(row=10, column=0, sticky="w", pady=5)
+ttk.Entry(form_frame, textvariable=number_prefix_var, width=40).grid(row=10, column=1, sticky="w", pady=5)
+
+ttk.Label(form_frame, text="Format:").grid(row=10, column=2, sticky="w", pady=5, padx=(30, 0))
+ttk.Entry(form_frame, textvariable=number_format_var, width=30).grid(row=10, column=3, sticky="w", pady=5)
+ttk.Label(form_frame, text="Use {prefix}, {number}, {year} and {month}, e.g. {prefix}{year}-{number:04d}",
+          font=("Segoe UI", 9, "italic")).grid(row=11, column=1, columnspan=3, sticky="w")
+
+# Diagnostics
+ttk.Label(form_frame, text="Diagnostics", font=("Arial", 12, "bold")).grid(row=12, column=0, columnspan=2, pady=(20, 10), sticky="w")
+ttk.Checkbutton(form_frame, text=f"Record timing of PDF, export and email stages (to {invoice_profile.profile_path()})",
+                variable=profiling_var).grid(row=13, column=0, columnspan=4, sticky="w")
+
 # Save button
 button_frame = ttk.Frame(settings_tab)
 button_frame.pack(fill="x", padx=5, pady=10)
@@ -891,10 +1252,21 @@ currency_combo['values'] = ["USD", "EGP", "EUR", "GBP"]
 if currency_var.get() != "USD":
     currency_var.set("USD")
     config["currency"] = "USD"
-    save_config()
+    save_config(show_message=False)
+
+mark_startup("widgets built")
 
 # Initial call to set the currency on startup (after all UI elements are created)
 root.update()  # Ensure all UI elements are fully created
 update_items_table()
+mark_startup("first window shown")
+report_startup()
+
+# Load the heavy modules while the user fills in the invoice
+root.after(PREWARM_DELAY_MS, prewarm_modules)
+
+# Suggest the next invoice number once the window is up
+root.after_idle(new_invoice_number)
+root.protocol("WM_DELETE_WINDOW", on_close)
 
 root.mainloop()
\ No newline at end of file
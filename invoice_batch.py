@@ -0,0 +1,312 @@
+# Headless batch rendering for Invoice Generator Premium
+# Renders many invoices to PDF without creating a Tk root
+#
+# Usage:
+#   python invoice_batch.py invoices.json --out-dir pdfs/
+#   python invoice_batch.py invoices.csv --out-dir pdfs/ --config /path/to/config.json
+#   python invoice_batch.py ledger.xlsx --out-dir pdfs/
+#   python invoice_batch.py invoices.json --out-dir pdfs/ --workers 8 --chunk-size 50
+#   python invoice_batch.py invoices.csv --out-dir pdfs/ --assign-numbers
+#   python invoice_batch.py invoices.csv --out-dir pdfs/ --no-cache
+#   python invoice_batch.py invoices.csv --out-dir pdfs/ --fast
+#   python invoice_batch.py invoices.csv --merge pdfs/invoices.pdf --per-file 5000
+#
+# Rendered PDFs are kept in the render cache (see render_cache.py), so
+# re-running a batch after a partial failure only renders what changed.
+#
+# --merge writes the invoices into a few combined PDFs instead of one file
+# each, with a bookmark per invoice and an index (invoices.index.csv) giving
+# the file and page range of every invoice number.
+
+import os
+import sys
+import csv
+import argparse
+import itertools
+import threading
+import multiprocessing
+from invoice_config import read_config
+from invoice_import import iter_invoices
+from invoice_render import render_invoice, render_merged, get_render_context
+
+# ---------------------------- Loading ----------------------------
+def load_invoices(path):
+    """Stream invoice records from a .json, .csv or .xlsx file"""
+    return iter_invoices(path)
+
+# ---------------------------- Rendering ----------------------------
+def invoice_filename(invoice, out_dir):
+    """Output path for an invoice, named after its invoice number"""
+    number = str(invoice.get("invoice_number", "")).strip() or "invoice"
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in number)
+    return os.path.join(out_dir, f"{safe}.pdf")
+
+# Company settings and render cache for the current worker process, set once by _init_worker()
+_worker_company = None
+_worker_cache = None
+
+def _init_worker(company, cache=None):
+    """Pool initializer: keep the company settings and cache, and warm the logo once per worker"""
+    global _worker_company, _worker_cache
+    _worker_company = company
+    _worker_cache = cache
+    get_render_context(company)
+
+def _render_task(task):
+    """Render one (invoice, path) pair; returns (invoice_number, error or None, cached)"""
+    invoice, out_path = task
+    try:
+        cached = render_invoice(invoice, _worker_company, out_path, cache=_worker_cache)
+        return invoice.get("invoice_number", ""), None, cached
+    except Exception as e:
+        return invoice.get("invoice_number", ""), str(e), False
+
+def assign_numbers(invoices, numbers):
+    """Give invoices without an invoice number the next one from an InvoiceNumberAllocator"""
+    for invoice in invoices:
+        if not str(invoice.get("invoice_number", "")).strip():
+            invoice = dict(invoice, invoice_number=numbers.next_number())
+        yield invoice
+
+def run_batch(invoices, company, out_dir, workers=1, chunk_size=20, progress=None, numbers=None,
+              cache=None, stats=None):
+    """Render every invoice into out_dir; returns (succeeded, failures)
+
+    With workers > 1 the invoices are spread over a process pool in chunks of
+    chunk_size. A failing invoice is recorded and skipped so the rest of the
+    run continues. progress, if given, is called as progress(done) after each
+    invoice.
+
+    invoices may be a lazy iterator; at most a few chunks per worker are read
+    ahead of the renderers, so large imports are never loaded all at once.
+
+    numbers, if given, is an InvoiceNumberAllocator: invoices without a number
+    are numbered in the parent process as they are read, and the numbers of
+    invoices that failed to render are handed back.
+
+    cache, if given, is a RenderCache shared by all workers; unchanged
+    invoices are copied from it. stats, if given, is a dict that receives
+    the number of invoices served from the cache under "cached".
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if numbers is not None:
+        invoices = assign_numbers(invoices, numbers)
+    tasks = ((invoice, invoice_filename(invoice, out_dir)) for invoice in invoices)
+
+    if workers > 1:
+        chunk_size = max(1, chunk_size)
+        # Pool.imap drains its input as fast as it can; the semaphore keeps
+        # the read-ahead bounded so a streamed import stays streamed.
+        in_flight = threading.BoundedSemaphore(workers * chunk_size * 2)
+        stopped = threading.Event()
+
+        def throttled(tasks):
+            for task in tasks:
+                while not in_flight.acquire(timeout=0.1):
+                    if stopped.is_set():
+                        return
+                yield task
+
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(company, cache))
+        results = pool.imap_unordered(_render_task, throttled(tasks), chunksize=chunk_size)
+    else:
+        pool = None
+        _init_worker(company, cache)
+        results = map(_render_task, tasks)
+
+    succeeded = 0
+    cached_count = 0
+    failures = []
+    try:
+        for done, (number, error, cached) in enumerate(results, 1):
+            if pool is not None:
+                in_flight.release()
+            if error is None:
+                succeeded += 1
+                cached_count += cached
+                if numbers is not None:
+                    numbers.confirm([number])
+            else:
+                failures.append((number, error))
+            if progress:
+                progress(done)
+    except BaseException:
+        if pool is not None:
+            stopped.set()
+            pool.terminate()
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if numbers is not None:
+        numbers.release([number for number, _ in failures])
+    if stats is not None:
+        stats["cached"] = cached_count
+    return succeeded, failures
+
+# ---------------------------- Merged Output ----------------------------
+DEFAULT_PER_FILE = 1000
+
+def part_path(out_path, number):
+    """File name of the number-th part (from 1) of a merged PDF split into several"""
+    stem, extension = os.path.splitext(out_path)
+    return f"{stem}-{number:04d}{extension or '.pdf'}"
+
+def index_path(out_path):
+    """The index CSV written beside a merged PDF"""
+    return f"{os.path.splitext(out_path)[0]}.index.csv"
+
+def _merged_parts(invoices, out_path, per_file):
+    """(invoices, path) per part; reads one part ahead to know whether to number the files"""
+    chunks = iter(lambda: list(itertools.islice(invoices, per_file)), [])
+    first = next(chunks, None)
+    second = next(chunks, None)
+    if second is None:
+        if first is not None:
+            yield first, out_path
+        return
+    for number, chunk in enumerate(itertools.chain([first, second], chunks), 1):
+        yield chunk, part_path(out_path, number)
+
+def _render_part_task(task):
+    """Render one part of a merged batch; returns (path, entries, failures)"""
+    invoices, out_path = task
+    try:
+        entries, failures = render_merged(invoices, _worker_company, out_path)
+        return out_path, entries, failures
+    except Exception as e:  # The whole part failed to build
+        return out_path, [], [(str(invoice.get("invoice_number", "")), str(e)) for invoice in invoices]
+
+def run_merged_batch(invoices, company, out_path, per_file=DEFAULT_PER_FILE, workers=1, progress=None,
+                     numbers=None):
+    """Render invoices into combined PDFs of up to per_file invoices; returns (succeeded, failures)
+
+    A single part is written to out_path; more are numbered beside it
+    (invoices-0001.pdf, invoices-0002.pdf, ...). The index CSV next to
+    out_path lists the file and page range of every invoice, in input order.
+    Parts are rendered in parallel with workers > 1. progress, if given, is
+    called as progress(done) after each part with the invoices done so far.
+    numbers works as in run_batch.
+    """
+    per_file = max(1, per_file)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    if numbers is not None:
+        invoices = assign_numbers(invoices, numbers)
+    parts = _merged_parts(iter(invoices), out_path, per_file)
+
+    if workers > 1:
+        # As in run_batch, the semaphore keeps Pool.imap from reading every
+        # part ahead: at most one part per worker plus one waiting
+        in_flight = threading.BoundedSemaphore(workers + 1)
+        stopped = threading.Event()
+
+        def throttled(parts):
+            for part in parts:
+                while not in_flight.acquire(timeout=0.1):
+                    if stopped.is_set():
+                        return
+                yield part
+
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(company,))
+        # imap (not imap_unordered) keeps the parts in order for the index
+        results = pool.imap(_render_part_task, throttled(parts))
+    else:
+        pool = None
+        _init_worker(company)
+        results = map(_render_part_task, parts)
+
+    succeeded = 0
+    failures = []
+    try:
+        with open(index_path(out_path), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["invoice_number", "file", "first_page", "last_page"])
+            for part_path, entries, part_failures in results:
+                if pool is not None:
+                    in_flight.release()
+                name = os.path.basename(part_path)
+                writer.writerows((number, name, first_page, last_page)
+                                 for number, first_page, last_page in entries)
+                if numbers is not None:
+                    numbers.confirm([number for number, _, _ in entries])
+                succeeded += len(entries)
+                failures.extend(part_failures)
+                if progress:
+                    progress(succeeded + len(failures))
+    except BaseException:
+        if pool is not None:
+            stopped.set()
+            pool.terminate()
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if numbers is not None:
+        numbers.release([number for number, _ in failures])
+    return succeeded, failures
+
+def add_batch_arguments(parser):
+    """Command line options of the batch command (shared with invoice_flow.py)"""
+    parser.add_argument("input", help="JSON, CSV or XLSX file with invoice records")
+    parser.add_argument("--out-dir", default="invoices", help="Directory to write PDFs into")
+    parser.add_argument("--config", default=None, help="Company config.json (defaults to the GUI config)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of rendering processes")
+    parser.add_argument("--chunk-size", type=int, default=20, help="Invoices handed to a worker at a time")
+    parser.add_argument("--assign-numbers", action="store_true",
+                        help="Number invoices that have no invoice number from the shared sequence")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Render every invoice, ignoring (and not filling) the render cache")
+    parser.add_argument("--fast", action="store_true",
+                        help="Draw invoices directly on a canvas when their layout allows (see fast_render)")
+    parser.add_argument("--merge", metavar="PDF",
+                        help="Write the invoices into this combined PDF (with bookmarks and an index CSV) "
+                             "instead of one PDF each in --out-dir")
+    parser.add_argument("--per-file", type=int, default=DEFAULT_PER_FILE,
+                        help="With --merge, most invoices per combined PDF; more are split into numbered files")
+
+def run_batch_command(args):
+    """Run a batch from parsed command line options; returns the exit status"""
+    company = read_config(args.config)
+    invoices = load_invoices(args.input)
+    if args.fast:
+        company["fast_render"] = True  # Read by render_invoice in every worker
+    cache = None
+    if not args.no_cache:
+        from render_cache import RenderCache
+        cache = RenderCache.from_config(company)
+    numbers = None
+    if args.assign_numbers:
+        from invoice_numbers import InvoiceNumberAllocator
+        # One database round trip per chunk rather than per invoice
+        numbers = InvoiceNumberAllocator.from_config(company, block_size=args.chunk_size)
+    stats = {}
+    try:
+        if args.merge:
+            succeeded, failures = run_merged_batch(invoices, company, args.merge, per_file=args.per_file,
+                                                   workers=args.workers, numbers=numbers)
+        else:
+            succeeded, failures = run_batch(invoices, company, args.out_dir, workers=args.workers,
+                                            chunk_size=args.chunk_size, numbers=numbers,
+                                            cache=cache, stats=stats)
+    finally:
+        if numbers is not None:
+            numbers.close()
+
+    for number, error in failures:
+        print(f"Failed {number}: {error}", file=sys.stderr)
+    if args.merge:
+        print(f"Merged {succeeded} invoice(s) into {args.merge} (index: {index_path(args.merge)}), "
+              f"{len(failures)} failed")
+        return 1 if failures else 0
+    reused = f" ({stats['cached']} unchanged, copied from the render cache)" if stats.get("cached") else ""
+    print(f"Rendered {succeeded} invoice(s){reused}, {len(failures)} failed")
+    return 1 if failures else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render invoices to PDF without the GUI")
+    add_batch_arguments(parser)
+    return run_batch_command(parser.parse_args(argv))
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Needed for PyInstaller builds on Windows
+    sys.exit(main())
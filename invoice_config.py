@@ -0,0 +1,208 @@
+# Configuration for Invoice Generator Premium
+# Reads and writes the per-user config.json shared by the GUI and the command line tools
+#
+# Writes go to a temporary file that then replaces config.json, so a crash
+# mid-write never leaves a truncated file behind. Read-modify-write cycles
+# hold a lock file (config.json.lock) so two processes saving at once don't
+# drop each other's changes. Reads are cached and only hit the disk again
+# when the file's mtime or size changed.
+
+import os
+import sys
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from mac_compatibility import get_config_path
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+DEFAULT_CONFIG = {
+    "company_name": "",
+    "address": "",
+    "city": "",
+    "country": "",
+    "phone": "",
+    "email": "",
+    "website": "",
+    "tax_id": "",
+    "currency": "USD",
+    "logo_path": "",
+    "smtp_server": "",
+    "smtp_port": "587",
+    "smtp_user": "",
+    "smtp_password": "",
+    "invoice_number_prefix": "INV-",
+    "invoice_number_format": "{prefix}{number:05d}",
+    "profiling": False,
+    "render_cache_mb": 256,
+    "fast_render": False,
+    "mail_rate_per_minute": 0,
+    "mail_max_in_flight": 4
+}
+
+# Seconds ConfigSaver waits for more changes before writing
+CONFIG_SAVE_DELAY = 0.5
+
+_cache = {}  # Config path -> ((mtime_ns, size), config)
+_cache_lock = threading.Lock()
+
+# ---------------------------- Files ----------------------------
+@contextmanager
+def config_lock(config_path=None):
+    """Hold the cross-process lock for a config file"""
+    config_path = config_path or get_config_path()
+    with open(config_path + ".lock", "a+") as lock_file:
+        if os.name == "nt":
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)  # Retries for up to 10 s
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _read_file(config_path):
+    """The parsed config file, served from the cache while the file is unchanged"""
+    stat = os.stat(config_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(config_path)
+    if cached is not None and cached[0] == signature:
+        return dict(cached[1])
+
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    with _cache_lock:
+        _cache[config_path] = (signature, config)
+    return dict(config)
+
+def _write_file(config, config_path):
+    """Replace the config file atomically (write a temp file, fsync, rename)"""
+    directory = os.path.dirname(os.path.abspath(config_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".config-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(config, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, config_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    stat = os.stat(config_path)
+    with _cache_lock:
+        _cache[config_path] = ((stat.st_mtime_ns, stat.st_size), dict(config))
+
+def load_config(config_path=None):
+    """Load the config, creating a default one if it is missing or unreadable
+
+    An unreadable file is kept as config.json.corrupt rather than overwritten.
+    """
+    config_path = config_path or get_config_path()
+    # Ensure the parent directory exists
+    os.makedirs(os.path.dirname(os.path.abspath(config_path)), exist_ok=True)
+
+    if os.path.exists(config_path):
+        try:
+            return _read_file(config_path)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Config file {config_path} is unreadable ({e}); starting from defaults", file=sys.stderr)
+            try:
+                os.replace(config_path, config_path + ".corrupt")
+            except OSError:
+                pass
+
+    # Create and return a default config if it doesn't exist or was invalid
+    default_config = dict(DEFAULT_CONFIG)
+    write_config(default_config, config_path)
+    return default_config
+
+def read_config(config_path=None):
+    """Load the config without creating or repairing anything (for headless runs)"""
+    config_path = config_path or get_config_path()
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(config_path):
+        config.update(_read_file(config_path))
+    return config
+
+def write_config(config, config_path=None):
+    """Write the whole config to disk, atomically"""
+    config_path = config_path or get_config_path()
+    with config_lock(config_path):
+        _write_file(config, config_path)
+
+def update_config(changes, config_path=None):
+    """Apply changes to the config on disk and return the result
+
+    The file is re-read under the lock, so keys changed by another process
+    since this one loaded the config are kept.
+    """
+    config_path = config_path or get_config_path()
+    with config_lock(config_path):
+        try:
+            config = _read_file(config_path)
+        except (OSError, json.JSONDecodeError):
+            config = dict(DEFAULT_CONFIG)
+        config.update(changes)
+        _write_file(config, config_path)
+    return config
+
+# ---------------------------- Debounced Saving ----------------------------
+class ConfigSaver:
+    """Collects config changes and writes them in one go once they stop coming
+
+    save() can be called on every edit; the file is written delay seconds
+    after the last call. flush() writes pending changes right away (e.g. on
+    an explicit Save or before exiting).
+    """
+
+    def __init__(self, config_path=None, delay=CONFIG_SAVE_DELAY):
+        self.config_path = config_path
+        self.delay = delay
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def save(self, changes):
+        with self._lock:
+            self._pending.update(changes)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending changes now; returns the saved config, or None if nothing was pending"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return None
+            try:
+                return update_config(pending, self.config_path)
+            except BaseException:
+                # Keep the changes for the next attempt, unless newer ones replaced them
+                self._pending = dict(pending, **self._pending)
+                raise
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Failed to save settings: {e}", file=sys.stderr)
@@ -0,0 +1,103 @@
+# Excel/CSV export for Invoice Generator Premium
+# Writes invoice line items with a subtotal/tax/total summary
+
+import os
+import pandas as pd
+from invoice_profile import span
+from item_store import ItemStore
+from xlsx_writer import XlsxWriter, inline_string, STYLE_DEFAULT, STYLE_HEADER, STYLE_MONEY, STYLE_BOLD, STYLE_BOLD_MONEY
+
+def write_export(items, tax_rate, file_path):
+    """Write line items to Excel or CSV, chosen by the file extension
+
+    items is an ItemStore or a list of {"name", "quantity", "price"} dicts.
+    Returns (written_path, excel_error); excel_error is set when the Excel
+    export failed and a CSV fallback was written.
+    """
+    with span("export", items=len(items), format=os.path.splitext(file_path)[1].lstrip(".").lower()) as record:
+        written_path, excel_error = _write_export(items, tax_rate, file_path)
+        record["bytes"] = os.path.getsize(written_path)
+    return written_path, excel_error
+
+def _write_export(items, tax_rate, file_path):
+    store = ItemStore.from_items(items)
+    totals = store.totals(tax_rate)
+
+    # Export based on file extension
+    if file_path.endswith('.csv'):
+        df = _export_frame(store, totals, tax_rate)
+        with span("export.csv"):
+            df.to_csv(file_path, index=False, float_format='%.2f')
+        return file_path, None
+
+    try:
+        with span("export.xlsx", items=len(store)):
+            _write_xlsx(store, totals, tax_rate, file_path)
+        return file_path, None
+    except Exception as excel_error:
+        # Fallback to CSV if Excel export fails
+        csv_path = file_path.rsplit(".", 1)[0] + ".csv"
+        _export_frame(store, totals, tax_rate).to_csv(csv_path, index=False, float_format='%.2f')
+        return csv_path, excel_error
+
+def _export_frame(store, totals, tax_rate):
+    """Line items plus the summary rows as one DataFrame, for CSV"""
+    with span("export.frame", items=len(store)):
+        data = {
+            "Item": store.names(),
+            "Quantity": store.quantities(),
+            "Unit Price": store.prices(),
+            "Total": totals["line_totals"] / 100
+        }
+
+        # Create DataFrame
+        df = pd.DataFrame(data)
+
+        # Add summary rows
+        summary = pd.DataFrame({
+            "Item": ["", "Subtotal", f"Tax ({tax_rate}%)", "Total"],
+            "Quantity": ["", "", "", ""],
+            "Unit Price": ["", "", "", ""],
+            "Total": ["", totals["subtotal"] / 100, totals["tax"] / 100, totals["total"] / 100]
+        })
+
+        return pd.concat([df, summary], ignore_index=True)
+
+def _write_xlsx(store, totals, tax_rate, file_path):
+    """Stream the sheet with xlsx_writer: header, one row per item, then the summary
+
+    Styles are chosen per column (money format on Unit Price and Total) and
+    per row (header, bold summary), never set cell by cell.
+    """
+    headers = ["Item", "Quantity", "Unit Price", "Total"]
+    summary = [
+        ["Subtotal", None, None, totals["subtotal"] / 100],
+        [f"Tax ({tax_rate}%)", None, None, totals["tax"] / 100],
+        ["Total", None, None, totals["total"] / 100],
+    ]
+
+    # Item names are interned in the store; escape each distinct name once
+    name_table = store.name_table()
+    names = [inline_string(name) for name in name_table]
+    quantities = store.quantities().tolist()
+    prices = store.prices().tolist()
+    line_totals = (totals["line_totals"] / 100).tolist()
+
+    # Column widths: longest text, or the widest number as displayed, capped at 30
+    longest_name = max(map(len, name_table), default=0)
+    widths = [
+        max(longest_name, len(headers[0]), *(len(row[0]) for row in summary)),
+        max(len(headers[1]), *(len(f"{value:g}") for value in (min(quantities, default=0), max(quantities, default=0)))),
+        max(len(headers[2]), *(len(f"{value:,.2f}") for value in (min(prices, default=0), max(prices, default=0)))),
+        max(len(headers[3]), *(len(f"{value:,.2f}") for value in
+                               (min(line_totals, default=0), max(line_totals, default=0), summary[-1][3]))),
+    ]
+
+    with XlsxWriter(file_path, sheet_name="Invoice", widths=[min(width + 2, 30) for width in widths]) as writer:
+        writer.append(headers, STYLE_HEADER)
+        codes = store.name_codes().tolist()
+        writer.append_columns([[names[code] for code in codes], quantities, prices, line_totals],
+                              styles=[STYLE_DEFAULT, STYLE_DEFAULT, STYLE_MONEY, STYLE_MONEY])
+        writer.append([])
+        for row in summary:
+            writer.append(row, [STYLE_BOLD, STYLE_BOLD, STYLE_BOLD_MONEY, STYLE_BOLD_MONEY])
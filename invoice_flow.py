@@ -0,0 +1,286 @@
+# invoice-flow command line interface for Invoice Generator Premium
+# Renders, exports and emails invoices without the GUI
+#
+# Usage:
+#   python invoice_flow.py render invoice.json -o invoice.pdf
+#   python invoice_flow.py batch invoices.csv --out-dir pdfs/ --workers 8
+#   python invoice_flow.py export invoice.json -o items.xlsx
+#   python invoice_flow.py send invoice.json --to client@example.com
+#   python invoice_flow.py send-all invoices.csv --rate 120 --in-flight 4
+#   python invoice_flow.py outbox --status failed
+#   python invoice_flow.py save ledger.csv
+#   python invoice_flow.py list --customer "Acme Corp" --from 2024-01-01
+#   python invoice_flow.py report customer
+#   python invoice_flow.py status INV-1001 paid
+#
+# render, export and send read one invoice from a JSON, CSV or XLSX file (the
+# same formats as batch); use --number to pick one when the file holds several.
+# Company and SMTP settings come from the GUI's config.json unless --config is given.
+# save, list, report, status, send-all and outbox use the GUI's invoice
+# database unless --db is given.
+
+import os
+import sys
+import argparse
+import multiprocessing
+from invoice_config import read_config
+
+def render_cache(args, config):
+    """The shared render cache, unless --no-cache was given"""
+    if args.no_cache:
+        return None
+    from render_cache import RenderCache
+    return RenderCache.from_config(config)
+
+def load_invoice(path, number=None):
+    """The invoice with the given number from a file (or its first invoice)"""
+    from invoice_import import iter_invoices
+
+    for invoice in iter_invoices(path):
+        if number is None or str(invoice.get("invoice_number", "")) == number:
+            return invoice
+    if number is None:
+        raise SystemExit(f"No invoices found in {path}")
+    raise SystemExit(f"Invoice {number} not found in {path}")
+
+# ---------------------------- Commands ----------------------------
+def command_render(args):
+    from invoice_render import render_invoice
+
+    invoice = load_invoice(args.input, args.number)
+    output = args.output or f"{invoice.get('invoice_number') or 'invoice'}.pdf"
+    config = read_config(args.config)
+    render_invoice(invoice, config, output, cache=render_cache(args, config), fast=args.fast or None)
+    print(f"Invoice PDF written to {output}")
+    return 0
+
+def command_batch(args):
+    from invoice_batch import run_batch_command
+
+    return run_batch_command(args)
+
+def command_export(args):
+    from invoice_export import write_export
+
+    invoice = load_invoice(args.input, args.number)
+    written_path, excel_error = write_export(invoice.get("items") or [], float(invoice.get("tax_rate") or 0), args.output)
+    if excel_error is not None:
+        print(f"Excel export failed ({excel_error}); wrote CSV instead", file=sys.stderr)
+    print(f"Invoice data exported to {written_path}")
+    return 0
+
+def command_send(args):
+    from mac_compatibility import get_temp_dir
+    from invoice_render import render_invoice
+    from invoice_mail import MailQueue, build_invoice_message, smtp_settings
+
+    config = read_config(args.config)
+    settings = smtp_settings(config)
+    if not settings["smtp_server"]:
+        raise SystemExit("No SMTP server configured; set one in the Settings tab or in config.json")
+
+    invoice = load_invoice(args.input, args.number)
+    number = str(invoice.get("invoice_number", "")) or "invoice"
+    pdf_path = args.pdf or os.path.join(get_temp_dir(), f"{number.replace(' ', '_')}.pdf")
+    render_invoice(invoice, config, pdf_path, cache=render_cache(args, config), fast=args.fast or None)
+
+    sender = args.sender or settings["smtp_user"] or config.get("email", "")
+    if not sender:
+        raise SystemExit("No sender address; pass --from or set an SMTP user or company email")
+    msg = build_invoice_message(sender, args.to, number, invoice.get("customer", ""),
+                                config.get("company_name", ""), pdf_path)
+    def attempt(key, attempt):
+        if attempt:
+            print(f"Retrying ({attempt} of {mail.max_retries})...", file=sys.stderr)
+
+    with MailQueue(settings, connections=1, on_attempt=attempt) as mail:
+        mail.submit(msg)
+        [(_, error)] = mail.join()
+    if error is not None:
+        raise SystemExit(f"Sending invoice {number} failed: {error}")
+    print(f"Invoice {number} sent to {args.to}")
+    return 0
+
+def command_send_all(args):
+    from invoice_import import iter_invoices
+    from invoice_mail import smtp_settings
+    from invoice_store import InvoiceStore
+    from mail_outbox import Outbox, MailDispatcher, TokenBucket, DEFAULT_MAX_IN_FLIGHT
+
+    config = read_config(args.config)
+    settings = smtp_settings(config)
+    if not settings["smtp_server"]:
+        raise SystemExit("No SMTP server configured; set one in the Settings tab or in config.json")
+    sender = args.sender or settings["smtp_user"] or config.get("email", "")
+    if not sender:
+        raise SystemExit("No sender address; pass --from or set an SMTP user or company email")
+    if args.fast:
+        config["fast_render"] = True
+
+    with Outbox(args.db) as outbox:
+        if args.retry_failed:
+            print(f"Queued {outbox.retry_failed()} failed invoice(s) again")
+        if args.input:
+            with InvoiceStore(args.db) as store:
+                def with_recipients(invoices):
+                    # The address from the file, else the one saved for the customer
+                    for invoice in invoices:
+                        email = invoice.get("email")
+                        if not email:
+                            customer = store.get_customer(str(invoice.get("customer", "")).strip())
+                            email = customer["email"] if customer else ""
+                        yield invoice, email
+                queued = outbox.add(with_recipients(iter_invoices(args.input)), resend=args.resend)
+            print(f"Queued {queued} invoice(s)")
+
+        rate = args.rate if args.rate is not None else float(config.get("mail_rate_per_minute") or 0)
+        in_flight = args.in_flight or int(config.get("mail_max_in_flight") or DEFAULT_MAX_IN_FLIGHT)
+        dispatcher = MailDispatcher(outbox, config, settings, sender, max_in_flight=in_flight,
+                                    limiter=TokenBucket.per_minute(rate), render_workers=args.workers,
+                                    cache=render_cache(args, config))
+        sent, failed = dispatcher.run()
+        counts = outbox.counts()
+    print(f"Sent {sent} invoice(s), {failed} failed")
+    if counts["failed"]:
+        print(f"{counts['failed']} invoice(s) in the outbox have failed; see 'outbox --status failed'", file=sys.stderr)
+    return 1 if failed or counts["failed"] else 0
+
+def command_outbox(args):
+    from mail_outbox import Outbox
+
+    with Outbox(args.db) as outbox:
+        counts = outbox.counts()
+        entries = outbox.list_entries(args.status, limit=args.limit)
+    print(", ".join(f"{count} {status}" for status, count in counts.items()))
+    for entry in entries:
+        print(f"{entry['invoice_number']:<16} {entry['status']:<8} {entry['attempts']:>3}  {entry['updated']:<19}  "
+              f"{entry['recipient']:<30.30} {entry['error']}")
+    return 0
+
+def command_save(args):
+    from invoice_import import iter_invoices
+    from invoice_store import InvoiceStore
+
+    currency = read_config(args.config).get("currency") or "USD"
+    with InvoiceStore(args.db) as store:
+        count = len(store.save_invoices(iter_invoices(args.input), currency))
+    print(f"Saved {count} invoices to {store.path}")
+    return 0
+
+def command_list(args):
+    from invoice_totals import format_money
+    from invoice_store import InvoiceStore
+
+    with InvoiceStore(args.db) as store:
+        invoices = store.list_invoices(args.customer, args.date_from, args.date_to, limit=args.limit)
+    for invoice in invoices:
+        print(f"{invoice['invoice_number']:<16} {invoice['date']:<10}  {invoice['customer']:<30.30} "
+              f"{format_money(invoice['total']):>12} {invoice['currency']}  {invoice['status']}")
+    return 0
+
+def command_report(args):
+    from invoice_totals import format_money
+    from invoice_store import InvoiceStore
+
+    with InvoiceStore(args.db) as store:
+        rows = getattr(store, f"revenue_by_{args.by}")()
+    print(f"{args.by.capitalize():<30} {'Currency':<8} {'Invoices':>9} {'Total':>14} {'Outstanding':>14}")
+    for row in rows:
+        print(f"{str(row[args.by]):<30.30} {row['currency']:<8} {row['invoices']:>9} "
+              f"{format_money(row['total']):>14} {format_money(row['outstanding']):>14}")
+    return 0
+
+def command_status(args):
+    from invoice_store import InvoiceStore
+
+    with InvoiceStore(args.db) as store:
+        if not store.set_status(args.number, args.status):
+            raise SystemExit(f"Invoice {args.number} not found")
+    print(f"Invoice {args.number} marked {args.status}")
+    return 0
+
+# ---------------------------- Entry Point ----------------------------
+def build_parser():
+    from invoice_batch import add_batch_arguments
+
+    parser = argparse.ArgumentParser(prog="invoice-flow", description="Render, export and email invoices without the GUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render = commands.add_parser("render", help="Render one invoice to PDF")
+    render.add_argument("input", help="JSON, CSV or XLSX file with the invoice")
+    render.add_argument("-o", "--output", help="PDF to write (defaults to <invoice number>.pdf)")
+    render.set_defaults(handler=command_render)
+
+    batch = commands.add_parser("batch", help="Render many invoices to a directory of PDFs")
+    add_batch_arguments(batch)
+    batch.set_defaults(handler=command_batch)
+
+    export = commands.add_parser("export", help="Export one invoice's line items to Excel or CSV")
+    export.add_argument("input", help="JSON, CSV or XLSX file with the invoice")
+    export.add_argument("-o", "--output", required=True, help="File to write (.xlsx or .csv)")
+    export.set_defaults(handler=command_export)
+
+    send = commands.add_parser("send", help="Render one invoice and email it using the configured SMTP server")
+    send.add_argument("input", help="JSON, CSV or XLSX file with the invoice")
+    send.add_argument("--to", required=True, help="Recipient email address")
+    send.add_argument("--from", dest="sender", help="Sender address (defaults to the SMTP user, then the company email)")
+    send.add_argument("--pdf", help="Where to keep the rendered PDF (defaults to a temp file)")
+    send.set_defaults(handler=command_send)
+
+    send_all = commands.add_parser("send-all", help="Email many invoices through the outbox, within a rate limit")
+    send_all.add_argument("input", nargs="?",
+                          help="JSON, CSV or XLSX file with the invoices to queue (omit to resume the outbox)")
+    send_all.add_argument("--from", dest="sender", help="Sender address (defaults to the SMTP user, then the company email)")
+    send_all.add_argument("--rate", type=float, help="Most messages per minute (default: mail_rate_per_minute; 0 = no limit)")
+    send_all.add_argument("--in-flight", type=int, help="SMTP connections sending at once (default: mail_max_in_flight)")
+    send_all.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of PDF rendering processes")
+    send_all.add_argument("--resend", action="store_true", help="Queue invoices again even if they were sent before")
+    send_all.add_argument("--retry-failed", action="store_true", help="Queue the outbox's failed invoices again")
+    send_all.set_defaults(handler=command_send_all)
+
+    outbox = commands.add_parser("outbox", help="Show the delivery status of invoices sent with send-all")
+    outbox.add_argument("--status", choices=["queued", "sending", "sent", "failed"], help="Only invoices with this status")
+    outbox.add_argument("--limit", type=int, default=50, help="Maximum number of invoices to show")
+    outbox.set_defaults(handler=command_outbox)
+
+    save = commands.add_parser("save", help="Add invoices from a file to the invoice database")
+    save.add_argument("input", help="JSON, CSV or XLSX file with the invoices")
+    save.add_argument("--config", default=None, help="Company config.json, for the default currency")
+    save.set_defaults(handler=command_save)
+
+    history = commands.add_parser("list", help="List invoices from the invoice database, newest first")
+    history.add_argument("--customer", help="Only invoices for this customer")
+    history.add_argument("--from", dest="date_from", help="Only invoices on or after this date (YYYY-MM-DD)")
+    history.add_argument("--to", dest="date_to", help="Only invoices on or before this date (YYYY-MM-DD)")
+    history.add_argument("--limit", type=int, default=50, help="Maximum number of invoices to show")
+    history.set_defaults(handler=command_list)
+
+    report = commands.add_parser("report", help="Revenue and outstanding totals from the invoice database")
+    report.add_argument("by", choices=["month", "customer", "currency"], help="How to group the invoices")
+    report.set_defaults(handler=command_report)
+
+    status = commands.add_parser("status", help="Mark an invoice in the invoice database paid or unpaid")
+    status.add_argument("number", help="Invoice number")
+    status.add_argument("status", choices=["paid", "unpaid"])
+    status.set_defaults(handler=command_status)
+
+    for command in (render, export, send):
+        command.add_argument("--number", help="Invoice number to use when the file holds several")
+        command.add_argument("--config", default=None, help="Company config.json (defaults to the GUI config)")
+    send_all.add_argument("--config", default=None, help="Company config.json (defaults to the GUI config)")
+    for command in (render, send, send_all):
+        command.add_argument("--no-cache", action="store_true",
+                             help="Render the PDF even if an identical one is in the render cache")
+        command.add_argument("--fast", action="store_true",
+                             help="Draw the PDF directly on a canvas when the invoice's layout allows")
+    for command in (save, history, report, status, send_all, outbox):
+        command.add_argument("--db", default=None, help="Invoice database (defaults to the GUI's invoices.db)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Needed for PyInstaller builds on Windows
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# Streaming invoice importer for Invoice Generator Premium
+# Reads line items from JSON, CSV or XLSX files and yields one invoice at a time
+#
+# CSV and XLSX files hold one row per line item with the columns
+#   invoice_number, date, customer, tax_rate, item, quantity, price
+# and optionally email (the customer's address, for bulk sending).
+# Rows belonging to the same invoice must be next to each other (as they are in
+# a ledger sorted by invoice number); only the invoice being assembled is kept
+# in memory, so memory use does not grow with the size of the file.
+
+import csv
+import json
+from datetime import date, datetime
+
+# Columns expected in a CSV/XLSX import file; one row per line item
+IMPORT_COLUMNS = ["invoice_number", "date", "customer", "tax_rate", "item", "quantity", "price"]
+
+# Alternative header spellings, e.g. the columns written by export_to_excel()
+COLUMN_ALIASES = {
+    "invoice": "invoice_number",
+    "invoice_#": "invoice_number",
+    "invoice_no": "invoice_number",
+    "unit_price": "price",
+}
+
+def _normalize_header(name):
+    key = str(name or "").strip().lower().replace(" ", "_")
+    return COLUMN_ALIASES.get(key, key)
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value).strip()
+
+def group_rows(rows, check_order=False):
+    """Group line-item rows (dicts keyed by IMPORT_COLUMNS) into invoices
+
+    Yields each invoice as soon as its last row has been read. Rows of one
+    invoice must be next to each other; an invoice number that shows up again
+    after other invoices starts a second invoice with that number.
+
+    check_order raises ValueError in that case instead. It has to remember
+    every invoice number seen, so memory then grows with the number of
+    invoices in the file.
+    """
+    seen = set() if check_order else None
+    invoice = None
+    for row in rows:
+        number = _cell_text(row.get("invoice_number"))
+        if invoice is None or number != invoice["invoice_number"]:
+            if invoice is not None:
+                yield invoice
+            if seen is not None:
+                if number in seen:
+                    raise ValueError(f"Rows for invoice {number} are not contiguous; sort the file by invoice number")
+                seen.add(number)
+            invoice = {
+                "invoice_number": number,
+                "date": _cell_text(row.get("date")),
+                "customer": _cell_text(row.get("customer")),
+                "tax_rate": row.get("tax_rate") or 0,
+                "items": []
+            }
+            if row.get("email"):
+                invoice["email"] = _cell_text(row.get("email"))
+        invoice["items"].append({
+            "name": _cell_text(row.get("item")),
+            "quantity": row.get("quantity") or 0,
+            "price": row.get("price") or 0
+        })
+    if invoice is not None:
+        yield invoice
+
+def iter_csv_rows(path):
+    """Stream rows from a CSV file as dicts with normalized column names"""
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [_normalize_header(name) for name in header]
+        for values in reader:
+            if not any(values):
+                continue
+            yield dict(zip(columns, values))
+
+def iter_xlsx_rows(path, sheet_name=None):
+    """Stream rows from the first (or named) sheet of an XLSX file
+
+    Uses openpyxl's read-only mode, which parses the sheet lazily instead of
+    building the whole workbook in memory.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_normalize_header(name) for name in header]
+        for values in rows:
+            if all(value is None for value in values):
+                continue
+            yield dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+def iter_invoices_json(path):
+    """Invoices from a JSON file holding a list, {"invoices": [...]} or a single invoice"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data["invoices"] if "invoices" in data else [data]
+    return iter(data)
+
+def iter_invoices(path, check_order=False):
+    """Yield invoice dicts from a .json, .csv or .xlsx file, one at a time
+
+    check_order is passed on to group_rows() for CSV and XLSX files.
+    """
+    lower = path.lower()
+    if lower.endswith('.csv'):
+        return group_rows(iter_csv_rows(path), check_order)
+    if lower.endswith(('.xlsx', '.xlsm')):
+        return group_rows(iter_xlsx_rows(path), check_order)
+    return iter_invoices_json(path)
@@ -0,0 +1,246 @@
+# Email delivery for Invoice Generator Premium
+# Builds invoice emails and delivers them through a pool of persistent SMTP connections
+#
+# The SMTP server comes from the smtp_server / smtp_port / smtp_user /
+# smtp_password settings stored in config.json. Port 465 uses implicit TLS;
+# any other port upgrades with STARTTLS when the server offers it, so a plain
+# local test server (python -m aiosmtpd -n) works as well.
+
+import os
+import ssl
+import time
+import queue
+import smtplib
+import threading
+from email import encoders
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.mime.base import MIMEBase
+from invoice_profile import span
+
+# ---------------------------- Messages ----------------------------
+def build_invoice_message(sender, recipient, invoice_number, customer, company_name, pdf_path):
+    """Email with the invoice PDF attached"""
+    with span("mail.message") as record:
+        msg = _build_invoice_message(sender, recipient, invoice_number, customer, company_name, pdf_path)
+        record["bytes"] = os.path.getsize(pdf_path)
+    return msg
+
+def _build_invoice_message(sender, recipient, invoice_number, customer, company_name, pdf_path):
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Subject'] = f"Invoice {invoice_number}"
+
+    # Email body
+    body = f"Please find attached invoice {invoice_number} for {customer}.\n\nThank you,\n{company_name}"
+    msg.attach(MIMEText(body, 'plain'))
+
+    # Attach PDF
+    with open(pdf_path, 'rb') as attachment:
+        part = MIMEBase('application', 'pdf')
+        part.set_payload(attachment.read())
+
+    encoders.encode_base64(part)
+    part.add_header(
+        'Content-Disposition',
+        f"attachment; filename= {os.path.basename(pdf_path)}",
+    )
+    msg.attach(part)
+    return msg
+
+# ---------------------------- Connections ----------------------------
+def smtp_settings(config):
+    """The SMTP part of the app config"""
+    return {
+        "smtp_server": config.get("smtp_server", ""),
+        "smtp_port": config.get("smtp_port", "587"),
+        "smtp_user": config.get("smtp_user", ""),
+        "smtp_password": config.get("smtp_password", ""),
+    }
+
+def open_smtp_connection(settings, timeout=30):
+    """Connect (and log in, if a user is configured) to the configured SMTP server"""
+    with span("mail.connect"):
+        return _open_smtp_connection(settings, timeout)
+
+def _open_smtp_connection(settings, timeout):
+    host = settings.get("smtp_server") or "localhost"
+    port = int(settings.get("smtp_port") or 587)
+    context = ssl.create_default_context()
+
+    if port == 465:
+        server = smtplib.SMTP_SSL(host, port, timeout=timeout, context=context)
+        server.ehlo()
+    else:
+        server = smtplib.SMTP(host, port, timeout=timeout)
+        server.ehlo()
+        if server.has_extn('starttls'):
+            server.starttls(context=context)
+            server.ehlo()
+
+    user = settings.get("smtp_user")
+    password = settings.get("smtp_password")
+    if user and password:
+        try:
+            server.login(user, password)
+        except Exception:
+            server.close()
+            raise
+    return server
+
+def send_message(server, msg):
+    """server.send_message(), timed as the mail.send stage"""
+    with span("mail.send"):
+        server.send_message(msg)
+
+def is_transient_error(error):
+    """Whether a failed send is worth retrying on a fresh connection"""
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+def reset_connection(server, error):
+    """After a failed send: keep a connection that only refused one message, close a broken one
+
+    Returns the connection to go on with, or None to open a new one.
+    """
+    if server is None:
+        return None
+    if isinstance(error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+        try:
+            server.rset()
+            return server
+        except Exception:
+            pass
+    try:
+        server.close()
+    except Exception:
+        pass
+    return None
+
+# ---------------------------- Delivery Queue ----------------------------
+class MailQueue:
+    """Background delivery queue backed by a small pool of SMTP connections
+
+    Each worker thread keeps one authenticated connection open and sends every
+    message it picks up over it, reconnecting only when the server drops the
+    connection. Transient failures (4xx replies, dropped connections) are
+    retried with exponential backoff; permanent ones are recorded and skipped.
+
+    limiter, if given, is a rate limiter such as mail_outbox.TokenBucket: a
+    token is taken from it before every delivery attempt, retries included.
+
+    progress, if given, is called from the worker threads as
+    progress(sent, failed, submitted) after every message. on_attempt and
+    on_done, if given, are called from the worker threads as
+    on_attempt(key, attempt) before every delivery attempt (attempt counts
+    from 0, so anything above is a retry) and on_done(key, exception or None)
+    once a message was sent or given up on.
+    """
+
+    def __init__(self, settings, connections=2, max_retries=3, backoff=1.0, limiter=None, progress=None,
+                 on_attempt=None, on_done=None):
+        self.settings = settings
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limiter = limiter
+        self.progress = progress
+        self.on_attempt = on_attempt
+        self.on_done = on_done
+        self.results = []  # (key, exception or None) per message, in completion order
+        self.sent = 0
+        self.failed = 0
+        self.submitted = 0
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._run, name=f"smtp-{n}", daemon=True)
+            for n in range(max(1, connections))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, msg, key=None):
+        """Queue a message; key identifies it in results (defaults to the Subject)"""
+        with self._lock:
+            self.submitted += 1
+        self._jobs.put((key if key is not None else msg['Subject'], msg))
+
+    def join(self):
+        """Wait until every submitted message was sent or gave up"""
+        self._jobs.join()
+        return list(self.results)
+
+    def close(self):
+        """Finish the queued messages, then close all connections"""
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        server = None
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                break
+            key, msg = job
+            server, error = self._deliver(server, key, msg)
+            with self._lock:
+                self.results.append((key, error))
+                if error is None:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                counts = (self.sent, self.failed, self.submitted)
+            if self.on_done:
+                self.on_done(key, error)
+            if self.progress:
+                self.progress(*counts)
+            self._jobs.task_done()
+
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+    def _deliver(self, server, key, msg):
+        """Send one message, retrying transient failures; returns (server, exception or None)"""
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                self._wait_for_token()
+            if self.on_attempt:
+                self.on_attempt(key, attempt)
+            try:
+                if server is None:
+                    server = open_smtp_connection(self.settings)
+                send_message(server, msg)
+                return server, None
+            except Exception as e:
+                error = e
+                server = reset_connection(server, e)
+                if not is_transient_error(e) or attempt == self.max_retries:
+                    break
+                time.sleep(self.backoff * (2 ** attempt))
+        return server, error
+
+    def _wait_for_token(self):
+        while True:
+            with self._lock:  # The limiter is shared by all workers
+                wait = self.limiter.take()
+            if not wait:
+                return
+            time.sleep(wait)
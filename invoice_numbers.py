@@ -0,0 +1,191 @@
+# Invoice number allocation for Invoice Generator Premium
+# Hands out invoice numbers that stay unique across threads, processes and app instances
+#
+# The sequence lives in the invoice database next to config.json, so every GUI
+# window, batch run and command line tool using that config directory draws
+# from the same counter. Numbers are reserved in blocks inside a SQLite
+# IMMEDIATE transaction (which takes the database write lock), so parallel
+# renderers touch the database once per block rather than once per invoice.
+# Reserved numbers that end up unused are handed back and issued again first,
+# so closing a window or stopping a batch early doesn't leave gaps.
+
+import sqlite3
+import threading
+from collections import deque
+from datetime import date
+from string import Formatter
+from invoice_store import get_database_path
+
+DEFAULT_PREFIX = "INV-"
+DEFAULT_FORMAT = "{prefix}{number:05d}"
+# Candidate numbers tried for one block before giving up; all of them being
+# taken means the format can't produce fresh numbers
+MAX_CANDIDATES = 100000
+
+def check_number_format(number_format):
+    """Raise ValueError unless number_format is usable: it must contain a {number} field"""
+    try:
+        fields = [field for _, field, _, _ in Formatter().parse(number_format) if field is not None]
+    except ValueError as e:
+        raise ValueError(f"Invalid invoice number format {number_format!r}: {e}")
+    if "number" not in fields:
+        raise ValueError(f"Invoice number format {number_format!r} has no {{number}} field")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS number_sequences (
+    name TEXT PRIMARY KEY,
+    next_value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS number_returns (
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (name, value)
+) WITHOUT ROWID;
+"""
+
+class InvoiceNumberAllocator:
+    """Issues formatted invoice numbers from a shared, persistent sequence
+
+    number_format is a str.format() pattern with {prefix}, {number}, {year}
+    and {month}, e.g. "{prefix}{year}-{number:04d}". Each distinct prefix
+    (and year or month, when the format uses them) has its own sequence.
+    Numbers already used by a stored invoice are skipped.
+
+    block_size is how many numbers are reserved per database transaction.
+    Call confirm() once an issued number is in use, and release() (or use the
+    allocator as a context manager) to hand back the numbers reserved but not
+    issued.
+    """
+
+    def __init__(self, path=None, prefix=DEFAULT_PREFIX, number_format=DEFAULT_FORMAT, block_size=1, start=1):
+        self.path = path or get_database_path()
+        self.prefix = prefix
+        self.number_format = number_format or DEFAULT_FORMAT
+        self.block_size = max(1, block_size)
+        self.start = start
+        self._lock = threading.Lock()
+        self._reserved = deque()  # (sequence name, value) reserved for this allocator
+        self._issued = {}  # Issued, not yet confirmed number -> (sequence name, value), for release()
+        check_number_format(self.number_format)
+        self.format_number(1)  # Fail early on a bad format
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config, path=None, block_size=1):
+        """Allocator using the invoice_number_prefix/_format settings of the app config"""
+        return cls(path, prefix=config.get("invoice_number_prefix", DEFAULT_PREFIX),
+                   number_format=config.get("invoice_number_format") or DEFAULT_FORMAT,
+                   block_size=block_size)
+
+    def format_number(self, value, today=None):
+        today = today or date.today()
+        return self.number_format.format(prefix=self.prefix, number=value,
+                                         year=today.year, month=f"{today.month:02d}")
+
+    def sequence_name(self, today=None):
+        """Key of the sequence numbers are drawn from: the format with everything but the number filled in"""
+        today = today or date.today()
+        values = {"prefix": self.prefix, "year": today.year, "month": f"{today.month:02d}"}
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(self.number_format):
+            parts.append(literal)
+            if field == "number":
+                parts.append("#")
+            elif field is not None:
+                parts.append(format(values[field], spec))
+        return "".join(parts)
+
+    # ---------------------------- Issuing ----------------------------
+    def next_number(self):
+        """The next free invoice number, as a formatted string"""
+        with self._lock:
+            name = self.sequence_name()
+            # A new year or month starts a new sequence; older reservations go back
+            while self._reserved and self._reserved[0][0] != name:
+                self._return([self._reserved.popleft()])
+            if not self._reserved:
+                self._reserve(name)
+            name, value = self._reserved.popleft()
+            number = self.format_number(value)
+            self._issued[number] = (name, value)
+            return number
+
+    def confirm(self, numbers):
+        """Mark issued numbers as used for good, so release() no longer tracks them"""
+        with self._lock:
+            for number in numbers:
+                self._issued.pop(number, None)
+
+    def release(self, unused=()):
+        """Hand back every reserved number, plus any issued numbers listed in unused"""
+        with self._lock:
+            returned = list(self._reserved)
+            self._reserved.clear()
+            returned += [self._issued.pop(number) for number in unused if number in self._issued]
+            if returned:
+                self._return(returned)
+
+    def close(self):
+        self.release()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---------------------------- Database ----------------------------
+    def _reserve(self, name):
+        """Move the next block of free numbers from the database into _reserved"""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            block = []
+            tried = 0
+            while len(block) < self.block_size:
+                if tried >= MAX_CANDIDATES:
+                    raise RuntimeError(f"No free invoice number among {tried} candidates for {name!r}")
+                wanted = self.block_size - len(block)
+                # Returned numbers first, lowest first, then fresh ones
+                candidates = [value for (value,) in conn.execute(
+                    "SELECT value FROM number_returns WHERE name = ? ORDER BY value LIMIT ?", (name, wanted))]
+                conn.executemany("DELETE FROM number_returns WHERE name = ? AND value = ?",
+                                 [(name, value) for value in candidates])
+                if len(candidates) < wanted:
+                    row = conn.execute("SELECT next_value FROM number_sequences WHERE name = ?", (name,)).fetchone()
+                    first = row[0] if row else self.start
+                    count = wanted - len(candidates)
+                    candidates += range(first, first + count)
+                    conn.execute("INSERT OR REPLACE INTO number_sequences (name, next_value) VALUES (?, ?)",
+                                 (name, first + count))
+                tried += len(candidates)
+                used = self._used_numbers([self.format_number(value) for value in candidates])
+                block += [value for value in candidates if self.format_number(value) not in used]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._reserved.extend((name, value) for value in block)
+
+    def _used_numbers(self, numbers):
+        """The numbers in the list that a stored invoice already has (e.g. typed by hand)"""
+        try:
+            placeholders = ",".join("?" * len(numbers))
+            return {number for (number,) in self._conn.execute(
+                f"SELECT invoice_number FROM invoices WHERE invoice_number IN ({placeholders})", numbers)}
+        except sqlite3.OperationalError:
+            return set()  # No invoices table yet
+
+    def _return(self, reserved):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany("INSERT OR IGNORE INTO number_returns (name, value) VALUES (?, ?)", reserved)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
@@ -0,0 +1,154 @@
+# Opt-in timing instrumentation for Invoice Generator Premium
+# Records how long each stage of rendering, exporting and emailing takes
+#
+# Profiling is off unless turned on in the Settings tab or with an
+# environment variable (for the command line tools and batch runs):
+#
+#   INVOICE_PROFILE=1          write spans as JSON lines
+#   INVOICE_PROFILE=cprofile   also write a .pstats file per top-level span
+#   INVOICE_PROFILE_FILE=path  where the JSON lines go (default: profile.jsonl
+#                              next to config.json; .pstats files go beside it)
+#
+# Summarize a profile with:
+#   python invoice_profile.py profile.jsonl
+
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from mac_compatibility import get_config_path
+
+_settings = {"enabled": False, "path": None, "cprofile": False}
+_local = threading.local()  # Per-thread stack of open spans
+_write_lock = threading.Lock()
+_cprofile_lock = threading.Lock()  # Only one cProfile profiler can run at a time
+
+def default_profile_path():
+    return os.path.join(os.path.dirname(get_config_path()), "profile.jsonl")
+
+def configure(enabled, path=None, cprofile=False):
+    """Turn span recording on or off"""
+    _settings.update(enabled=bool(enabled), path=path or default_profile_path(), cprofile=bool(cprofile))
+
+def configure_from_env():
+    """Apply INVOICE_PROFILE / INVOICE_PROFILE_FILE; returns whether the variable turned profiling on"""
+    mode = os.environ.get("INVOICE_PROFILE", "").strip().lower()
+    if not mode or mode in ("0", "off", "false"):
+        return False
+    configure(True, os.environ.get("INVOICE_PROFILE_FILE"), cprofile=(mode == "cprofile"))
+    return True
+
+def is_enabled():
+    return _settings["enabled"]
+
+def profile_path():
+    return _settings["path"] or default_profile_path()
+
+@contextmanager
+def span(name, **fields):
+    """Time the enclosed block as one stage
+
+    Yields a dict; set extra fields on it (e.g. "bytes" or "items") and they
+    are written with the span. Spans nest per thread; each record carries its
+    parent's name. Does nothing (beyond yielding a dict) while profiling is off.
+    """
+    record = dict(fields)
+    if not _settings["enabled"]:
+        yield record
+        return
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    profiler = None
+    if parent is None and _settings["cprofile"] and _cprofile_lock.acquire(blocking=False):
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiler (e.g. a debugger) is active
+            profiler = None
+            _cprofile_lock.release()
+
+    stack.append(name)
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stack.pop()
+        if profiler is not None:
+            profiler.disable()
+            record["pstats"] = _dump_stats(profiler, name, started_at)
+            _cprofile_lock.release()
+        record.update({
+            "span": name,
+            "ms": round(elapsed * 1000, 3),
+            "start": round(started_at, 6),
+            "parent": parent,
+            "depth": len(stack),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        })
+        _write(record)
+
+def _dump_stats(profiler, name, started_at):
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started_at))
+    path = os.path.join(os.path.dirname(os.path.abspath(profile_path())),
+                        f"{name}-{stamp}-{os.getpid()}.pstats")
+    try:
+        profiler.dump_stats(path)
+        return path
+    except OSError as e:
+        print(f"Failed to write profile {path}: {e}", file=sys.stderr)
+        return None
+
+def _write(record):
+    # One O_APPEND write per line, so batch workers can share the file
+    line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+    try:
+        with _write_lock:
+            fd = os.open(profile_path(), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+    except OSError as e:
+        print(f"Failed to write profile span: {e}", file=sys.stderr)
+
+# ---------------------------- Summary ----------------------------
+def summarize(path):
+    """Count, total, mean and max milliseconds per span name, slowest total first"""
+    stats = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            entry = stats.setdefault(record["span"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += record["ms"]
+            entry["max_ms"] = max(entry["max_ms"], record["ms"])
+    for entry in stats.values():
+        entry["mean_ms"] = entry["total_ms"] / entry["count"]
+    return sorted(stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else default_profile_path()
+    print(f"{'Span':<28} {'Count':>7} {'Total ms':>12} {'Mean ms':>10} {'Max ms':>10}")
+    for name, entry in summarize(path):
+        print(f"{name:<28} {entry['count']:>7} {entry['total_ms']:>12.1f} {entry['mean_ms']:>10.2f} {entry['max_ms']:>10.2f}")
+    return 0
+
+configure_from_env()
+
+if __name__ == "__main__":
+    sys.exit(main())
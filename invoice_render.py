@@ -0,0 +1,831 @@
+# PDF rendering core for Invoice Generator Premium
+# Builds invoice PDFs from plain data, with no dependency on the Tk GUI
+
+import io
+import os
+import re
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from reportlab import rl_config
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Image, Spacer, Flowable, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_RIGHT
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import getFont
+from reportlab.pdfgen.canvas import Canvas
+import numpy as np
+from PIL import Image as PILImage
+from invoice_totals import format_money
+from invoice_profile import span
+from item_store import ItemStore
+
+# Compressed streams are written as binary rather than ASCII85 text: without
+# ReportLab's C extension the encoding is a noticeable share of render time,
+# and it makes every PDF a quarter larger. ReportLab only has a process-wide
+# switch for this, read both while drawing (images) and while saving (page
+# streams), so it is flipped around each whole build and restored afterwards.
+# The lock keeps concurrent renders from restoring it under each other.
+_stream_lock = threading.Lock()
+
+@contextmanager
+def _binary_streams():
+    with _stream_lock:
+        saved = rl_config.useA85
+        rl_config.useA85 = 0
+        try:
+            yield
+        finally:
+            rl_config.useA85 = saved
+
+# An invoice is a plain dict:
+#   {
+#       "invoice_number": "INV-001",
+#       "date": "2025-01-31",
+#       "customer": "ACME Corp",
+#       "tax_rate": 14.0,
+#       "items": [{"name": "Widget", "quantity": 2, "price": 9.99}, ...]
+#   }
+# "items" may also be an ItemStore, which the GUI passes directly.
+# The company is the config dict stored by load_config() in invoice.py.
+
+# ---------------------------- Render Context Cache ----------------------------
+# The logo and stylesheet are the same for every invoice a company renders, so
+# they are built once and reused. Entries are keyed on the logo path and its
+# mtime, so replacing the logo file (or choosing another one) rebuilds them.
+LOGO_WIDTH = 1.5 * inch
+LOGO_MAX_PIXELS = 450  # 300 dpi at the drawn logo width
+
+_render_contexts = {}
+_render_cache_stats = {"hits": 0, "misses": 0}
+
+def _build_styles():
+    styles = getSampleStyleSheet()
+    right_style = ParagraphStyle(
+        name='RightAlign',
+        parent=styles['Normal'],
+        alignment=TA_RIGHT  # Using reportlab constants for alignment
+    )
+    return styles, right_style
+
+def _load_logo(data):
+    """Decode the logo file's bytes and pre-scale it to print size; returns (png_bytes, width, height)"""
+    with PILImage.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        aspect = height / width
+        if width > LOGO_MAX_PIXELS:
+            img = img.resize((LOGO_MAX_PIXELS, max(1, round(LOGO_MAX_PIXELS * aspect))), PILImage.LANCZOS)
+        if img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA")
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+    return buffer.getvalue(), LOGO_WIDTH, LOGO_WIDTH * aspect
+
+def get_render_context(company):
+    """Cached logo and styles for the given company settings"""
+    logo_path = company.get("logo_path", "") or ""
+    try:
+        mtime = os.path.getmtime(logo_path) if logo_path else None
+    except OSError:
+        mtime = None
+    key = (logo_path, mtime)
+
+    context = _render_contexts.get(key)
+    if context is not None:
+        _render_cache_stats["hits"] += 1
+        return context
+
+    _render_cache_stats["misses"] += 1
+    styles, right_style = _build_styles()
+    logo = None
+    logo_digest = None
+    if mtime is not None:
+        # Read once: the render cache key hashes the same bytes that are embedded
+        try:
+            with open(logo_path, "rb") as f:
+                data = f.read()
+            logo_digest = hashlib.sha256(data).hexdigest()
+            logo = _load_logo(data)
+        except Exception as e:
+            print(f"Error loading logo: {e}")
+
+    context = {"styles": styles, "right_style": right_style, "logo": logo, "logo_digest": logo_digest}
+    # Only the current settings are worth keeping
+    _render_contexts.clear()
+    _render_contexts[key] = context
+    return context
+
+def clear_render_cache():
+    """Drop cached render contexts, e.g. after the settings were saved"""
+    _render_contexts.clear()
+
+def render_cache_stats():
+    """Hit/miss counters for the render context cache"""
+    return dict(_render_cache_stats, size=len(_render_contexts))
+
+# ---------------------------- Item Tables ----------------------------
+# Up to LONG_INVOICE_ITEMS lines, the items go into one table that ReportLab
+# splits across pages itself. Splitting re-lays out the rest of the table on
+# every page, so longer invoices are planned page by page instead: each page
+# gets its own table with the header row, the subtotal brought forward from
+# the previous page, and the page's own subtotal. Page tables are only built
+# when ReportLab reaches them and are dropped once drawn, so memory stays
+# flat and render time grows with the number of pages.
+LONG_INVOICE_ITEMS = 300
+ROW_HEIGHT = 18  # 10pt text with the default 3pt top and bottom padding
+HEADER_HEIGHT = 27  # The header row has 12pt bottom padding
+FRAME_PADDING = 12  # SimpleDocTemplate's frame pads 6pt at the top and bottom
+
+def _item_row(name, quantity, price, line_total):
+    return [name, f"{quantity:.2f}", f"{price:.2f}", format_money(line_total)]
+
+def _table_style(first_item, last_item):
+    """Header, beige gridded item rows first_item..last_item, bold rows outside them"""
+    table_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, first_item), (-1, last_item), colors.beige),
+        ('GRID', (0, 0), (-1, last_item), 1, colors.black),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, last_item + 1), (-1, -1), 'Helvetica-Bold'),
+    ]
+    if first_item > 1:  # Brought-forward row
+        table_style.append(('FONTNAME', (0, 1), (-1, first_item - 1), 'Helvetica-Bold'))
+    return TableStyle(table_style)
+
+def _items_table(items, totals, header, summary_rows, col_widths):
+    """All items in a single table, for invoices of normal length"""
+    items_data = [header]
+    for (_, name, quantity, price), line_total in zip(items, totals["line_totals"].tolist()):
+        items_data.append(_item_row(name, quantity, price, line_total))
+    items_data.extend(summary_rows)
+
+    items_table = Table(items_data, colWidths=col_widths)
+    items_table.setStyle(_table_style(1, len(items_data) - len(summary_rows) - 1))
+    return items_table
+
+class _ItemPage(Flowable):
+    """One page of line items; its Table is built when laid out and dropped once drawn"""
+
+    def __init__(self, build):
+        Flowable.__init__(self)
+        self._build = build
+        self._table = None
+
+    def wrap(self, available_width, available_height):
+        if self._table is None:
+            self._table = self._build()
+        self.width, self.height = self._table.wrap(available_width, available_height)
+        return self.width, self.height
+
+    def draw(self):
+        self._table.drawOn(self.canv, 0, 0)
+        self._table = None
+
+def _page_ranges(count, first_rows, rows):
+    """(start, end) item ranges, one per page
+
+    first_rows and rows are how many rows fit under the header on the first
+    and later pages. Every page but the first also has a brought-forward row;
+    every page but the last ends with the page subtotal and the carried
+    forward total, and the last ends with the page subtotal and the summary.
+    """
+    ranges = []
+    start = 0
+    while True:
+        available = rows if ranges else first_rows
+        brought_forward = 1 if ranges else 0
+        if count - start + brought_forward + 4 <= available:
+            ranges.append((start, count))
+            return ranges
+        # Always leave at least one item for the page with the summary
+        end = min(start + available - brought_forward - 2, count - 1)
+        ranges.append((start, end))
+        start = end
+
+def _item_pages(items, totals, header, summary_rows, col_widths, elements, doc):
+    """Flowables laying out a long invoice's items one page-sized table at a time"""
+    frame_height = doc.height - FRAME_PADDING
+    rows = int((frame_height - HEADER_HEIGHT) // ROW_HEIGHT) - 1  # One row of slack
+    used = 0
+    for flowable in elements:
+        used += flowable.wrap(doc.width, frame_height)[1] + flowable.getSpaceBefore() + flowable.getSpaceAfter()
+    first_rows = int((frame_height - used - HEADER_HEIGHT) // ROW_HEIGHT) - 1
+
+    pages = []
+    if first_rows < 8:  # Too little room left under the invoice details
+        pages.append(PageBreak())
+        first_rows = rows
+
+    name_table = items.name_table()
+    name_codes = items.name_codes()
+    quantities = items.quantities()
+    prices = items.prices()
+    line_totals = np.asarray(totals["line_totals"], dtype=np.int64)
+    running = np.cumsum(line_totals)
+    ranges = _page_ranges(len(items), first_rows, rows)
+
+    def build(start, end, last):
+        brought_forward = int(running[start - 1]) if start else 0
+        data = [header]
+        if start:
+            data.append(["", "", "Brought forward:", format_money(brought_forward)])
+        first_item = len(data)
+        for code, quantity, price, line_total in zip(name_codes[start:end].tolist(), quantities[start:end].tolist(),
+                                                     prices[start:end].tolist(), line_totals[start:end].tolist()):
+            data.append(_item_row(name_table[code], quantity, price, line_total))
+        last_item = len(data) - 1
+        data.append(["", "", "Page subtotal:", format_money(int(running[end - 1]) - brought_forward)])
+        if last:
+            data.extend(summary_rows)
+        else:
+            data.append(["", "", "Carried forward:", format_money(running[end - 1])])
+
+        table = Table(data, colWidths=col_widths, rowHeights=[HEADER_HEIGHT] + [ROW_HEIGHT] * (len(data) - 1))
+        table.setStyle(_table_style(first_item, last_item))
+        return table
+
+    for index, (start, end) in enumerate(ranges):
+        last = index == len(ranges) - 1
+        pages.append(_ItemPage(lambda start=start, end=end, last=last: build(start, end, last)))
+    return pages
+
+# ---------------------------- Render Cache Key ----------------------------
+# Bump whenever the PDF layout changes, so PDFs cached by an older version
+# are not handed out again
+TEMPLATE_VERSION = 2
+
+# The company settings that appear in the PDF
+COMPANY_FIELDS = ("company_name", "address", "city", "country", "phone", "email",
+                  "website", "tax_id", "currency")
+
+def render_key(invoice, company):
+    """Stable hash of everything the PDF depends on: invoice, company, logo and template"""
+    items = ItemStore.from_items(invoice.get("items") or [])
+    header = {
+        "template": TEMPLATE_VERSION,
+        "invoice": [str(invoice.get("invoice_number", "")).strip(), str(invoice.get("date", "")),
+                    str(invoice.get("customer", "")).strip(), float(invoice.get("tax_rate") or 0)],
+        "company": [str(company.get(field) or "") for field in COMPANY_FIELDS],
+        "logo": get_render_context(company)["logo_digest"],
+    }
+    digest = hashlib.sha256(json.dumps(header).encode("utf-8"))
+    digest.update(json.dumps(items.names()).encode("utf-8"))
+    digest.update(items.quantities().tobytes())
+    digest.update(items.price_cents().tobytes())
+    return digest.hexdigest()
+
+# ---------------------------- Rendering ----------------------------
+def render_invoice(invoice, company, out, cache=None, fast=None):
+    """Render an invoice to `out` (a file path or a writable binary file object).
+
+    cache, if given, is a RenderCache: a PDF rendered before from the same
+    data, settings, logo and template is copied from it instead of rendered
+    again. Returns True when the PDF came from the cache.
+
+    fast draws the invoice directly on a canvas when its layout allows (see
+    _render_canvas) and falls back to platypus otherwise. It defaults to the
+    company's fast_render setting.
+
+    Raises on failure; callers decide how to report errors.
+    """
+    with span("render_invoice", invoice=str(invoice.get("invoice_number", ""))) as record:
+        invoice = dict(invoice, items=ItemStore.from_items(invoice.get("items") or []))
+        data = key = None
+        if cache is not None:
+            with span("render.cache"):
+                key = render_key(invoice, company)
+                data = cache.get(key)
+        record["cached"] = data is not None
+        if data is None:
+            if fast is None:
+                fast = bool(company.get("fast_render", False))
+            if fast:
+                with span("render.canvas", items=len(invoice["items"])):
+                    data = _render_canvas(invoice, company)
+            record["renderer"] = "canvas" if data is not None else "platypus"
+            if data is None:
+                data = _render_invoice(invoice, company)
+            if cache is not None:
+                cache.put(key, data)
+
+        with span("render.write") as write_record:
+            write_record["bytes"] = len(data)
+            if isinstance(out, str):
+                # Create directory if it doesn't exist
+                os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+                with open(out, "wb") as f:
+                    f.write(data)
+            else:
+                out.write(data)
+    return record["cached"]
+
+def _render_invoice(invoice, company):
+    """Build the PDF and return its bytes"""
+    # Create a PDF document in memory; the caller writes (and caches) the bytes
+    target = io.BytesIO()
+    doc = SimpleDocTemplate(target, pagesize=letter)
+    elements = _invoice_elements(invoice, company, doc)
+
+    # Build the PDF
+    with span("render.build", items=len(invoice["items"])) as record, _binary_streams():
+        doc.build(elements)
+        record["pages"] = doc.page
+
+    return target.getvalue()
+
+def _invoice_elements(invoice, company, doc):
+    """The flowables of one invoice, laid out to start at the top of a page of doc"""
+    customer_name = str(invoice.get("customer", "")).strip()
+    invoice_number = str(invoice.get("invoice_number", "")).strip()
+    invoice_date = str(invoice.get("date", ""))
+    tax_rate = float(invoice.get("tax_rate") or 0)
+    items = invoice["items"]
+
+    # Company details
+    company_name = company.get("company_name") or "Your Company"
+    company_address = company.get("address") or ""
+    company_city = company.get("city") or ""
+    company_country = company.get("country") or ""
+    company_phone = company.get("phone") or ""
+    company_email = company.get("email") or ""
+    company_website = company.get("website") or ""
+    company_tax_id = company.get("tax_id") or ""
+
+    # Currency - ensure it defaults to USD
+    currency = company.get("currency") or "USD"
+
+    if not items:
+        raise ValueError("Invoice has no items")
+
+    # Container for the PDF elements
+    elements = []
+
+    # Styles and logo come from the render context cache
+    with span("render.context"):
+        context = get_render_context(company)
+    styles = context["styles"]
+    title_style = styles["Title"]
+    heading_style = styles["Heading2"]
+    normal_style = styles["Normal"]
+
+    # Add company logo if available
+    if context["logo"]:
+        logo_bytes, img_width, img_height = context["logo"]
+        logo = Image(io.BytesIO(logo_bytes), width=img_width, height=img_height)
+        elements.append(logo)
+        elements.append(Spacer(1, 12))
+
+    # Add title
+    elements.append(Paragraph(f"{company_name}", title_style))
+    elements.append(Spacer(1, 12))
+
+    # Company details
+    if company_address or company_city or company_country:
+        address_str = ", ".join(filter(None, [company_address, company_city, company_country]))
+        elements.append(Paragraph(f"<b>Address:</b> {address_str}", normal_style))
+
+    if company_phone:
+        elements.append(Paragraph(f"<b>Phone:</b> {company_phone}", normal_style))
+
+    if company_email:
+        elements.append(Paragraph(f"<b>Email:</b> {company_email}", normal_style))
+
+    if company_website:
+        elements.append(Paragraph(f"<b>Website:</b> {company_website}", normal_style))
+
+    if company_tax_id:
+        elements.append(Paragraph(f"<b>Tax ID:</b> {company_tax_id}", normal_style))
+
+    elements.append(Spacer(1, 24))
+
+    # Invoice header
+    elements.append(Paragraph("INVOICE", heading_style))
+    elements.append(Spacer(1, 12))
+
+    # Invoice details in a table format
+    invoice_data = [
+        [Paragraph("<b>Invoice #:</b>", normal_style), invoice_number],
+        [Paragraph("<b>Date:</b>", normal_style), invoice_date],
+        [Paragraph("<b>Customer:</b>", normal_style), customer_name]
+    ]
+
+    invoice_table = Table(invoice_data, colWidths=[100, 150])
+    invoice_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ]))
+
+    elements.append(invoice_table)
+    elements.append(Spacer(1, 24))
+
+    # Invoice items table
+    header = ["Item", "Quantity", f"Unit Price ({currency})", f"Total ({currency})"]
+    col_widths = [doc.width * 0.4, doc.width * 0.15, doc.width * 0.2, doc.width * 0.25]
+    with span("render.rows", items=len(items)):
+        totals = items.totals(tax_rate)
+    summary_rows = [
+        ["", "", "Subtotal:", format_money(totals["subtotal"])],
+        ["", "", f"Tax ({tax_rate}%):", format_money(totals["tax"])],
+        ["", "", "Total:", format_money(totals["total"])],
+    ]
+
+    with span("render.table", items=len(items)):
+        if len(items) > LONG_INVOICE_ITEMS:
+            elements.extend(_item_pages(items, totals, header, summary_rows, col_widths, elements, doc))
+        else:
+            elements.append(_items_table(items, totals, header, summary_rows, col_widths))
+
+    elements.append(Spacer(1, 48))
+
+    # Footer with terms
+    elements.append(Paragraph("<b>Terms & Conditions</b>", normal_style))
+    elements.append(Paragraph("Payment is due within 30 days.", normal_style))
+    elements.append(Paragraph("Please make checks payable to the company name above.", normal_style))
+    return elements
+
+# ---------------------------- Merged Documents ----------------------------
+# Many invoices in one PDF, each starting on a new page with an outline entry
+# (bookmark) under its invoice number. Everything is one platypus document,
+# so the fonts and the logo image are stored once however many invoices it
+# holds.
+class _InvoiceStart(Flowable):
+    """Zero-size marker before an invoice: adds its bookmark and notes its first page"""
+    _ZEROSIZE = 1  # Drawn even though it takes no space, and leaves the frame "at top"
+
+    def __init__(self, key, title, pages):
+        Flowable.__init__(self)
+        self.key = key
+        self.title = title
+        self._pages = pages
+        self.width = self.height = 0
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=0)
+        self._pages[self.key] = self.canv.getPageNumber()
+
+def render_merged(invoices, company, out):
+    """Render invoices into one PDF at `out` (a file path or a writable binary file object)
+
+    Returns (entries, failures). entries has one (invoice_number, first_page,
+    last_page) tuple per invoice in the PDF, in order. Invoices that can't be
+    laid out (e.g. no items) are left out and listed in failures as
+    (invoice_number, error); if none are left, nothing is written.
+    """
+    target = io.BytesIO()
+    doc = SimpleDocTemplate(target, pagesize=letter, title="Invoices")
+    elements = []
+    numbers = []
+    failures = []
+    first_pages = {}
+    with span("render_merged", invoices=len(invoices)) as record:
+        for invoice in invoices:
+            number = str(invoice.get("invoice_number", "")).strip()
+            try:
+                invoice = dict(invoice, items=ItemStore.from_items(invoice.get("items") or []))
+                invoice_elements = _invoice_elements(invoice, company, doc)
+            except Exception as e:
+                failures.append((number, str(e)))
+                continue
+            customer = str(invoice.get("customer", "")).strip()
+            if elements:
+                elements.append(PageBreak())
+            key = f"invoice-{len(numbers)}"
+            elements.append(_InvoiceStart(key, f"{number} ({customer})" if customer else number, first_pages))
+            elements.extend(invoice_elements)
+            numbers.append((key, number))
+        if not numbers:
+            return [], failures
+
+        with span("render.build") as build_record, _binary_streams():
+            doc.build(elements)
+            build_record["pages"] = doc.page
+        data = target.getvalue()
+        record["bytes"] = len(data)
+
+        if isinstance(out, str):
+            os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+            with open(out, "wb") as f:
+                f.write(data)
+        else:
+            out.write(data)
+
+    entries = []
+    for index, (key, number) in enumerate(numbers):
+        last_page = first_pages[numbers[index + 1][0]] - 1 if index + 1 < len(numbers) else doc.page
+        entries.append((number, first_pages[key], last_page))
+    return entries, failures
+
+# ---------------------------- Canvas Fast Path ----------------------------
+# For everyday invoices the platypus machinery (paragraph parsing, table
+# layout, flowable splitting) does far more work than the layout needs.
+# _render_canvas draws the same letter-size layout straight into the page
+# stream at the positions platypus arrives at: SimpleDocTemplate's one inch
+# margins and 6pt frame padding, the sample stylesheet's fonts and spacing,
+# and the fixed row heights of single-line table cells. Text is measured
+# with the standard fonts' width tables and written as PDF operators, so
+# there is no per-string text object either.
+#
+# Invoices it can't lay out that way (text that would wrap, is parsed as
+# markup or has characters outside the fonts' encoding, more than
+# FAST_MAX_PAGES pages, long-invoice mode) go through platypus as before.
+# "python benchmark.py --verify-fast" compares the two renderers.
+FAST_MAX_PAGES = 2
+FRAME_LEFT = 72 + 6
+FRAME_WIDTH = letter[0] - 2 * 72 - 12
+FRAME_TOP = letter[1] - 72 - 6
+FRAME_BOTTOM = 72 + 6
+TABLE_WIDTH = letter[0] - 2 * 72  # The item columns are sized from doc.width, not the frame
+TABLE_LEFT = FRAME_LEFT + (FRAME_WIDTH - TABLE_WIDTH) / 2
+TABLE_EDGES = [TABLE_LEFT + TABLE_WIDTH * fraction for fraction in (0, 0.4, 0.55, 0.75, 1)]
+_FUZZ = 1e-6
+_MARKUP = re.compile(r"<|&#?\w+;")
+_PLAIN_TEXT = re.compile(r"[ !#-'*-\[\]-~]*")  # Printable ASCII that needs no escaping in a PDF string
+_ESCAPES = {ord("("): "\\(", ord(")"): "\\)", ord("\\"): "\\\\"}
+_FONT_WIDTHS = {}
+
+class _LayoutUnsupported(Exception):
+    """The invoice needs platypus (wrapping text, markup, too many pages)"""
+
+def _encode(text):
+    """Text as a PDF string literal in the standard fonts' WinAnsi encoding"""
+    if _PLAIN_TEXT.fullmatch(text):
+        return f"({text})"
+    try:
+        data = text.encode("winansi")
+    except UnicodeEncodeError:
+        raise _LayoutUnsupported("text outside WinAnsi")
+    return "(" + "".join(_ESCAPES.get(byte) or (chr(byte) if 32 <= byte < 127 else f"\\{byte:03o}")
+                         for byte in data) + ")"
+
+def _text_width(text, font, size):
+    widths = _FONT_WIDTHS.get(font)
+    if widths is None:
+        widths = _FONT_WIDTHS[font] = getFont(font).widths
+    try:
+        data = text.encode("winansi")
+    except UnicodeEncodeError:
+        raise _LayoutUnsupported("text outside WinAnsi")
+    return sum(map(widths.__getitem__, data)) * size / 1000
+
+def _rgb(color, operator):
+    return "%.6f %.6f %.6f %s" % (color.red, color.green, color.blue, operator)
+
+_DARKBLUE_FILL = _rgb(colors.darkblue, "rg")
+_BEIGE_FILL = _rgb(colors.beige, "rg")
+_WHITESMOKE_FILL = _rgb(colors.whitesmoke, "rg")
+_BLACK_FILL = "0 0 0 rg"
+
+class _CanvasFrame:
+    """Follows the platypus frame (current y, top-of-frame state, last space after) and writes page operators"""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.pages = 1
+        self._fonts = {}
+        self._reset()
+
+    def _reset(self):
+        self.y = FRAME_TOP
+        self.at_top = True
+        self.space_after = 0
+
+    def new_page(self):
+        if self.pages == FAST_MAX_PAGES:
+            raise _LayoutUnsupported("too many pages")
+        self.canvas.showPage()
+        self.pages += 1
+        self._reset()
+
+    def space_before(self, before):
+        # Space before is dropped at the top of a frame and overlaps the previous space after
+        return 0 if self.at_top else max(before - self.space_after, 0)
+
+    def place(self, height, before=0, after=0):
+        """Bottom y of a block of this height, starting a new page if it doesn't fit"""
+        for _ in range(2):
+            bottom = self.y - self.space_before(before) - height
+            if bottom >= FRAME_BOTTOM - _FUZZ:
+                self.y = bottom - after
+                self.space_after = after
+                self.at_top = False
+                return bottom
+            self.new_page()
+        raise _LayoutUnsupported("block taller than a page")
+
+    def font(self, name, size):
+        """The Tf operator for a font, registering the font with the document once"""
+        key = (name, size)
+        operator = self._fonts.get(key)
+        if operator is None:
+            operator = self._fonts[key] = f"{self.canvas._doc.getInternalFontName(name)} {size} Tf"
+        return operator
+
+    def write(self, operators):
+        self.canvas.addLiteral("\n".join(operators))
+
+def _paragraph_text(text):
+    if _MARKUP.search(text):
+        raise _LayoutUnsupported("markup in paragraph text")
+    return " ".join(text.split())  # Paragraphs collapse whitespace
+
+def _draw_paragraph(frame, style, runs, centered=False):
+    """A one-line Paragraph made of (font name, text) runs"""
+    width = sum(_text_width(text, font, style.fontSize) for font, text in runs)
+    if width > FRAME_WIDTH + _FUZZ:
+        raise _LayoutUnsupported("paragraph would wrap")
+    bottom = frame.place(style.leading, style.spaceBefore, style.spaceAfter)
+    x = FRAME_LEFT + ((FRAME_WIDTH - width) / 2 if centered else 0)
+    operators = [f"BT {_BLACK_FILL} {x:.3f} {bottom + style.leading - style.fontSize:.3f} Td"]
+    for font, text in runs:
+        operators.append(f"{frame.font(font, style.fontSize)} {_encode(text)} Tj")
+    operators.append("ET")
+    frame.write(operators)
+
+def _cell_text(value):
+    value = str(value)
+    if "\n" in value:
+        raise _LayoutUnsupported("multi-line table cell")
+    return value
+
+# Item table rows are (kind, cells); every row is ROW_HEIGHT except the header
+_HEADER, _ITEM, _SUMMARY = range(3)
+
+def _draw_item_rows(frame, rows, bottom):
+    """Draw rows of the items table with its bottom edge at y=bottom"""
+    regular = frame.font("Helvetica", 10)
+    bold = frame.font("Helvetica-Bold", 10)
+    edges = TABLE_EDGES
+    heights = [HEADER_HEIGHT if kind == _HEADER else ROW_HEIGHT for kind, _ in rows]
+    tops = []
+    top = bottom + sum(heights)
+    for height in heights:
+        tops.append(top)
+        top -= height
+
+    # Backgrounds, then text, then the grid, as platypus does
+    operators = []
+    item_rows = [index for index, (kind, _) in enumerate(rows) if kind == _ITEM]
+    if rows[0][0] == _HEADER:
+        operators.append(f"{_DARKBLUE_FILL} {TABLE_LEFT:.3f} {tops[0] - HEADER_HEIGHT:.3f} {TABLE_WIDTH:.3f} {HEADER_HEIGHT} re f")
+    if item_rows:
+        first, last = item_rows[0], item_rows[-1]
+        operators.append(f"{_BEIGE_FILL} {TABLE_LEFT:.3f} {tops[last] - ROW_HEIGHT:.3f} "
+                         f"{TABLE_WIDTH:.3f} {tops[first] - tops[last] + ROW_HEIGHT:.3f} re f")
+
+    operators.append("BT")
+    for (kind, cells), row_top, height in zip(rows, tops, heights):
+        if kind == _HEADER:
+            operators.append(f"{_WHITESMOKE_FILL} {bold}")
+            baseline = row_top - height + 14  # 12pt bottom padding
+            for column, text in enumerate(cells):
+                x = (edges[column] + edges[column + 1] - _text_width(text, "Helvetica-Bold", 10)) / 2
+                operators.append(f"1 0 0 1 {x:.3f} {baseline:.3f} Tm {_encode(text)} Tj")
+            operators.append(_BLACK_FILL)
+            continue
+        font_name = "Helvetica-Bold" if kind == _SUMMARY else "Helvetica"
+        operators.append(bold if kind == _SUMMARY else regular)
+        baseline = row_top - height + 5  # 3pt bottom padding
+        if cells[0]:
+            operators.append(f"1 0 0 1 {edges[0] + 6:.3f} {baseline:.3f} Tm {_encode(cells[0])} Tj")
+        for column in (1, 2, 3):
+            text = cells[column]
+            if text:
+                x = edges[column + 1] - 6 - _text_width(text, font_name, 10)
+                operators.append(f"1 0 0 1 {x:.3f} {baseline:.3f} Tm {_encode(text)} Tj")
+    operators.append("ET")
+
+    gridded = [index for index, (kind, _) in enumerate(rows) if kind != _SUMMARY]
+    if gridded:
+        grid_bottom = tops[gridded[-1]] - heights[gridded[-1]]
+        operators.append("0 0 0 RG 1 w 1 J 1 j n")
+        for y in [tops[index] for index in gridded] + [grid_bottom]:
+            operators.append(f"{edges[0]:.3f} {y:.3f} m {edges[-1]:.3f} {y:.3f} l")
+        for x in edges:
+            operators.append(f"{x:.3f} {grid_bottom:.3f} m {x:.3f} {tops[0]:.3f} l")
+        operators.append("S")
+    frame.write(operators)
+
+def _draw_item_table(frame, rows):
+    """Place the items table, splitting it between rows onto the next page like platypus"""
+    while rows:
+        available = frame.y - FRAME_BOTTOM
+        fitting = 0
+        used = 0
+        for kind, _ in rows:
+            height = HEADER_HEIGHT if kind == _HEADER else ROW_HEIGHT
+            if used + height > available:
+                break
+            used += height
+            fitting += 1
+        if fitting == 0:
+            if frame.at_top:
+                raise _LayoutUnsupported("row taller than a page")
+            frame.new_page()
+            continue
+        bottom = frame.place(used)
+        _draw_item_rows(frame, rows[:fitting], bottom)
+        rows = rows[fitting:]
+        if rows:
+            frame.new_page()
+
+def _render_canvas(invoice, company):
+    """The PDF bytes drawn directly on a canvas, or None if the invoice needs platypus"""
+    items = invoice["items"]
+    if not items:
+        raise ValueError("Invoice has no items")
+    if len(items) > LONG_INVOICE_ITEMS:
+        return None
+
+    context = get_render_context(company)
+    styles = context["styles"]
+    normal_style = styles["Normal"]
+    bold_font = "Helvetica-Bold"
+    currency = company.get("currency") or "USD"
+    tax_rate = float(invoice.get("tax_rate") or 0)
+
+    with _binary_streams():
+        target = io.BytesIO()
+        canvas = Canvas(target, pagesize=letter)
+        frame = _CanvasFrame(canvas)
+        try:
+            # Logo, centered, then the company name and details
+            if context["logo"]:
+                if context.get("logo_reader") is None:
+                    context["logo_reader"] = ImageReader(io.BytesIO(context["logo"][0]))
+                _, img_width, img_height = context["logo"]
+                bottom = frame.place(img_height)
+                canvas.drawImage(context["logo_reader"], FRAME_LEFT + (FRAME_WIDTH - img_width) / 2, bottom,
+                                 img_width, img_height, mask="auto")
+                frame.place(12)
+            company_name = _paragraph_text(company.get("company_name") or "Your Company")
+            _draw_paragraph(frame, styles["Title"], [(styles["Title"].fontName, company_name)], centered=True)
+            frame.place(12)
+
+            company_address = company.get("address") or ""
+            company_city = company.get("city") or ""
+            company_country = company.get("country") or ""
+            details = []
+            if company_address or company_city or company_country:
+                details.append(("Address:", ", ".join(filter(None, [company_address, company_city, company_country]))))
+            for label, field in (("Phone:", "phone"), ("Email:", "email"), ("Website:", "website"), ("Tax ID:", "tax_id")):
+                if company.get(field):
+                    details.append((label, company[field]))
+            for label, value in details:
+                value = _paragraph_text(value)
+                _draw_paragraph(frame, normal_style, [(bold_font, label), (normal_style.fontName, f" {value}" if value else "")])
+            frame.place(24)
+
+            heading_style = styles["Heading2"]
+            _draw_paragraph(frame, heading_style, [(heading_style.fontName, "INVOICE")])
+            frame.place(12)
+
+            # Invoice details: a centered 100 + 150pt table, 18pt rows, text top-aligned
+            details_rows = [("Invoice #:", _cell_text(str(invoice.get("invoice_number", "")).strip())),
+                            ("Date:", _cell_text(invoice.get("date", ""))),
+                            ("Customer:", _cell_text(str(invoice.get("customer", "")).strip()))]
+            bottom = frame.place(ROW_HEIGHT * len(details_rows))
+            left = FRAME_LEFT + (FRAME_WIDTH - 250) / 2
+            baseline = bottom + ROW_HEIGHT * len(details_rows) - 13  # 3pt top padding, 10pt text
+            operators = ["BT", _BLACK_FILL]
+            for label, value in details_rows:
+                operators.append(f"{frame.font(bold_font, 10)} 1 0 0 1 {left + 6:.3f} {baseline:.3f} Tm {_encode(label)} Tj")
+                operators.append(f"{frame.font(normal_style.fontName, 10)} 1 0 0 1 {left + 106:.3f} {baseline:.3f} Tm "
+                                 f"{_encode(value)} Tj")
+                baseline -= ROW_HEIGHT
+            operators.append("ET")
+            frame.write(operators)
+            frame.place(24)
+
+            # Items, with the summary rows at the end of the same table
+            totals = items.totals(tax_rate)
+            rows = [(_HEADER, ["Item", "Quantity", f"Unit Price ({currency})", f"Total ({currency})"])]
+            for (_, name, quantity, price), line_total in zip(items, totals["line_totals"].tolist()):
+                rows.append((_ITEM, [_cell_text(name)] + _item_row(name, quantity, price, line_total)[1:]))
+            rows.append((_SUMMARY, ["", "", "Subtotal:", format_money(totals["subtotal"])]))
+            rows.append((_SUMMARY, ["", "", f"Tax ({tax_rate}%):", format_money(totals["tax"])]))
+            rows.append((_SUMMARY, ["", "", "Total:", format_money(totals["total"])]))
+            _draw_item_table(frame, rows)
+            frame.place(48)
+
+            # Footer with terms
+            _draw_paragraph(frame, normal_style, [(bold_font, "Terms & Conditions")])
+            _draw_paragraph(frame, normal_style, [(normal_style.fontName, "Payment is due within 30 days.")])
+            _draw_paragraph(frame, normal_style, [(normal_style.fontName, "Please make checks payable to the company name above.")])
+        except _LayoutUnsupported:
+            return None
+
+        canvas.showPage()
+        canvas.save()
+        return target.getvalue()
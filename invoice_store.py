@@ -0,0 +1,418 @@
+# Local invoice database for Invoice Generator Premium
+# Keeps every generated invoice, its line items and its customer in SQLite
+#
+# The database lives next to config.json (invoices.db). It runs in WAL mode so
+# the GUI, the command line tools and batch runs can read while another
+# process writes. Money is stored as integer cents, computed by the same
+# totals engine as the PDF.
+
+import os
+import sqlite3
+import threading
+from mac_compatibility import get_config_path
+from invoice_totals import price_to_cents, line_total_cents, tax_amount
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    email TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY,
+    invoice_number TEXT NOT NULL UNIQUE,
+    customer_id INTEGER REFERENCES customers(id),
+    date TEXT NOT NULL DEFAULT '',
+    tax_rate REAL NOT NULL DEFAULT 0,
+    currency TEXT NOT NULL DEFAULT 'USD',
+    subtotal INTEGER NOT NULL DEFAULT 0,
+    tax INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'unpaid'
+);
+
+CREATE INDEX IF NOT EXISTS idx_invoices_customer ON invoices(customer_id, date);
+CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(date);
+
+CREATE TABLE IF NOT EXISTS line_items (
+    invoice_id INTEGER NOT NULL REFERENCES invoices(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    price_cents INTEGER NOT NULL,
+    PRIMARY KEY (invoice_id, position)
+) WITHOUT ROWID;
+"""
+
+# ---------------------------- Report Rollups ----------------------------
+# Revenue reports read small rollup tables instead of scanning every invoice.
+# Triggers on invoices keep them up to date in the same transaction as the
+# invoice itself: an insert adds the invoice to its month and customer rows,
+# a delete subtracts it, and an update does both.
+REPORT_TABLES = {
+    # table: (key column, expression for the key from an invoice row)
+    "report_months": ("month", "substr({row}.date, 1, 7)"),
+    "report_customers": ("customer_id", "coalesce({row}.customer_id, 0)"),
+}
+
+def _rollup_change(table, row, sign):
+    key, expression = REPORT_TABLES[table]
+    key_value = expression.format(row=row)
+    outstanding = f"CASE WHEN {row}.status = 'unpaid' THEN {row}.total ELSE 0 END"
+    sql = (
+        f"INSERT INTO {table} ({key}, currency, invoices, subtotal, tax, total, outstanding)"
+        f" VALUES ({key_value}, {row}.currency, {sign}1, {sign}{row}.subtotal, {sign}{row}.tax,"
+        f" {sign}{row}.total, {sign}{outstanding})"
+        f" ON CONFLICT ({key}, currency) DO UPDATE SET"
+        f" invoices = invoices + excluded.invoices, subtotal = subtotal + excluded.subtotal,"
+        f" tax = tax + excluded.tax, total = total + excluded.total,"
+        f" outstanding = outstanding + excluded.outstanding;"
+    )
+    if sign == "-":
+        sql += f" DELETE FROM {table} WHERE {key} = {key_value} AND currency = {row}.currency AND invoices = 0;"
+    return sql
+
+def _report_schema():
+    statements = []
+    for table, (key, _) in REPORT_TABLES.items():
+        key_type = "TEXT" if key == "month" else "INTEGER"
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            f" {key} {key_type} NOT NULL, currency TEXT NOT NULL,"
+            " invoices INTEGER NOT NULL, subtotal INTEGER NOT NULL, tax INTEGER NOT NULL,"
+            " total INTEGER NOT NULL, outstanding INTEGER NOT NULL,"
+            f" PRIMARY KEY ({key}, currency)) WITHOUT ROWID;")
+
+    add = " ".join(_rollup_change(table, "NEW", "") for table in REPORT_TABLES)
+    subtract = " ".join(_rollup_change(table, "OLD", "-") for table in REPORT_TABLES)
+    statements.append(f"CREATE TRIGGER IF NOT EXISTS invoices_report_insert AFTER INSERT ON invoices BEGIN {add} END;")
+    statements.append(f"CREATE TRIGGER IF NOT EXISTS invoices_report_delete AFTER DELETE ON invoices BEGIN {subtract} END;")
+    statements.append(f"CREATE TRIGGER IF NOT EXISTS invoices_report_update AFTER UPDATE ON invoices BEGIN {subtract} {add} END;")
+    return "\n".join(statements)
+
+REPORT_SCHEMA = _report_schema()
+
+# Bumped when a schema change needs existing databases to be migrated
+SCHEMA_VERSION = 1
+
+# Columns returned by list_invoices()/get_invoice()
+_SUMMARY_COLUMNS = """
+    i.id, i.invoice_number, i.date, c.name, c.email, i.tax_rate, i.currency,
+    i.subtotal, i.tax, i.total, i.status
+"""
+
+def get_database_path():
+    """invoices.db in the same per-user directory as config.json"""
+    return os.path.join(os.path.dirname(get_config_path()), "invoices.db")
+
+def _item_rows(items):
+    """(name, quantity, price in cents) for an ItemStore or a list of item dicts"""
+    if hasattr(items, "price_cents"):
+        return list(zip(items.names(), items.quantities().tolist(), items.price_cents().tolist()))
+    rows = []
+    for item in items:
+        if isinstance(item, dict):
+            name, quantity, price = item["name"], item["quantity"], item["price"]
+        else:
+            name, quantity, price = item
+        rows.append((str(name), float(quantity), price_to_cents(price)))
+    return rows
+
+def _summary(row):
+    (invoice_id, number, date, customer, email, tax_rate, currency,
+     subtotal, tax, total, status) = row
+    return {
+        "id": invoice_id,
+        "invoice_number": number,
+        "date": date,
+        "customer": customer or "",
+        "email": email or "",
+        "tax_rate": tax_rate,
+        "currency": currency,
+        "subtotal": subtotal,
+        "tax": tax,
+        "total": total,
+        "status": status,
+    }
+
+class InvoiceStore:
+    """SQLite-backed history of invoices, line items and customers
+
+    Invoices are keyed by invoice number: saving an invoice whose number is
+    already stored replaces it. Lookups by number, customer and date range go
+    through indexes. One store may be shared between threads; statements are
+    serialized on an internal lock.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_database_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._customer_ids = {}  # Lower-cased name -> customer id
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                                     isolation_level=None)  # Transactions are explicit
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; safe with WAL
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._migrate()
+
+    def _migrate(self):
+        self._conn.executescript(SCHEMA + REPORT_SCHEMA)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+                if version < 1:
+                    # Databases from before the report rollups existed
+                    self._rebuild_reports()
+                if version < SCHEMA_VERSION:
+                    self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---------------------------- Writing ----------------------------
+    def save_invoice(self, invoice, currency="USD"):
+        """Insert or replace one invoice; returns its row id"""
+        return self.save_invoices([invoice], currency)[0]
+
+    def save_invoices(self, invoices, currency="USD", batch_size=1000):
+        """Insert or replace many invoices, committing every batch_size invoices
+
+        invoices is any iterable of invoice dicts (as read by iter_invoices or
+        built by the GUI); it is consumed lazily, so a large import streams.
+        Returns the row ids in input order.
+        """
+        ids = []
+        with self._lock:
+            cursor = self._conn.cursor()
+            pending = 0
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for invoice in invoices:
+                    ids.append(self._write_invoice(cursor, invoice, currency))
+                    pending += 1
+                    if pending >= batch_size:
+                        cursor.execute("COMMIT")
+                        cursor.execute("BEGIN IMMEDIATE")
+                        pending = 0
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                self._customer_ids.clear()  # May hold ids of rolled back rows
+                raise
+        return ids
+
+    def _write_invoice(self, cursor, invoice, default_currency):
+        number = str(invoice.get("invoice_number", "")).strip()
+        if not number:
+            raise ValueError("Invoice number is required to save an invoice")
+        rows = _item_rows(invoice.get("items") or [])
+        tax_rate = float(invoice.get("tax_rate") or 0)
+        subtotal = sum(line_total_cents(quantity, cents) for _, quantity, cents in rows)
+        tax = tax_amount(subtotal, tax_rate)
+        customer_id = self._customer_id(cursor, str(invoice.get("customer", "")).strip(),
+                                        invoice.get("email"))
+        values = (customer_id, str(invoice.get("date", "")), tax_rate,
+                  invoice.get("currency") or default_currency,
+                  subtotal, tax, subtotal + tax)
+
+        row = cursor.execute("SELECT id FROM invoices WHERE invoice_number = ?", (number,)).fetchone()
+        if row is None:
+            cursor.execute(
+                "INSERT INTO invoices (customer_id, date, tax_rate, currency, subtotal, tax, total, invoice_number)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values + (number,))
+            invoice_id = cursor.lastrowid
+        else:
+            invoice_id = row[0]
+            cursor.execute(
+                "UPDATE invoices SET customer_id = ?, date = ?, tax_rate = ?, currency = ?,"
+                " subtotal = ?, tax = ?, total = ? WHERE id = ?", values + (invoice_id,))
+            cursor.execute("DELETE FROM line_items WHERE invoice_id = ?", (invoice_id,))
+
+        cursor.executemany(
+            "INSERT INTO line_items (invoice_id, position, name, quantity, price_cents) VALUES (?, ?, ?, ?, ?)",
+            [(invoice_id, position, name, quantity, cents)
+             for position, (name, quantity, cents) in enumerate(rows)])
+        return invoice_id
+
+    def _customer_id(self, cursor, name, email=None):
+        if not name:
+            return None
+        key = name.lower()
+        customer_id = self._customer_ids.get(key)
+        if customer_id is None:
+            row = cursor.execute("SELECT id FROM customers WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                cursor.execute("INSERT INTO customers (name, email) VALUES (?, ?)", (name, email or ""))
+                customer_id = cursor.lastrowid
+            else:
+                customer_id = row[0]
+            self._customer_ids[key] = customer_id
+        if email:
+            cursor.execute("UPDATE customers SET email = ? WHERE id = ?", (email, customer_id))
+        return customer_id
+
+    def save_customer(self, name, email=""):
+        """Add a customer or update their email; returns the customer id"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                customer_id = self._customer_id(cursor, name.strip(), email)
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                self._customer_ids.clear()
+                raise
+        return customer_id
+
+    def delete_invoice(self, invoice_number):
+        """Remove an invoice and its line items; returns whether it existed"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM invoices WHERE invoice_number = ?", (invoice_number,))
+            return cursor.rowcount > 0
+
+    def set_status(self, invoice_number, status):
+        """Mark an invoice "paid" or "unpaid"; returns whether it exists"""
+        if status not in ("paid", "unpaid"):
+            raise ValueError(f"Unknown invoice status: {status}")
+        with self._lock:
+            cursor = self._conn.execute("UPDATE invoices SET status = ? WHERE invoice_number = ?",
+                                        (status, invoice_number))
+            return cursor.rowcount > 0
+
+    def _rebuild_reports(self):
+        """Recompute the rollup tables from the invoices (inside a transaction)"""
+        outstanding = "sum(CASE WHEN status = 'unpaid' THEN total ELSE 0 END)"
+        for table, (key, expression) in REPORT_TABLES.items():
+            key_value = expression.format(row="invoices")
+            self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute(
+                f"INSERT INTO {table} ({key}, currency, invoices, subtotal, tax, total, outstanding)"
+                f" SELECT {key_value}, currency, count(*), sum(subtotal), sum(tax), sum(total), {outstanding}"
+                f" FROM invoices GROUP BY 1, 2")
+
+    def rebuild_reports(self):
+        """Recompute the report rollups from scratch (they are normally kept up to date)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._rebuild_reports()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ---------------------------- Reading ----------------------------
+    def get_invoice(self, invoice_number):
+        """The stored invoice with its items, or None
+
+        Items are {"name", "quantity", "price"} dicts, so the result can be
+        passed straight to render_invoice().
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM invoices i LEFT JOIN customers c ON c.id = i.customer_id"
+                " WHERE i.invoice_number = ?", (invoice_number,)).fetchone()
+            if row is None:
+                return None
+            invoice = _summary(row)
+            invoice["items"] = [
+                {"name": name, "quantity": quantity, "price": cents / 100}
+                for name, quantity, cents in self._conn.execute(
+                    "SELECT name, quantity, price_cents FROM line_items WHERE invoice_id = ? ORDER BY position",
+                    (invoice["id"],))
+            ]
+        return invoice
+
+    def list_invoices(self, customer=None, date_from=None, date_to=None, limit=100, offset=0):
+        """Invoice summaries (no items), newest first
+
+        customer matches a name exactly (case-insensitive); date_from and
+        date_to are inclusive ISO dates ("YYYY-MM-DD").
+        """
+        conditions, params = self._filters(customer, date_from, date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM invoices i LEFT JOIN customers c ON c.id = i.customer_id"
+                f" {where} ORDER BY i.date DESC, i.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]).fetchall()
+        return [_summary(row) for row in rows]
+
+    def count_invoices(self, customer=None, date_from=None, date_to=None):
+        conditions, params = self._filters(customer, date_from, date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM invoices i {where}", params).fetchone()[0]
+
+    def _filters(self, customer, date_from, date_to):
+        conditions, params = [], []
+        if customer is not None:
+            conditions.append("i.customer_id = (SELECT id FROM customers WHERE name = ?)")
+            params.append(customer)
+        if date_from:
+            conditions.append("i.date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("i.date <= ?")
+            params.append(date_to)
+        return conditions, params
+
+    def list_customers(self):
+        """(name, email) for every customer, in no particular order"""
+        with self._lock:
+            return self._conn.execute("SELECT name, email FROM customers").fetchall()
+
+    def get_customer(self, name):
+        """{"id", "name", "email"} for a customer (case-insensitive), or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT id, name, email FROM customers WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "name": row[1], "email": row[2]}
+
+    # ---------------------------- Reports ----------------------------
+    # All amounts are integer cents; every report row also carries the number
+    # of invoices and the unpaid ("outstanding") part of the total.
+    def revenue_by_month(self):
+        """Rows of {"month", "currency", ...}, newest month first"""
+        return self._report(
+            "SELECT month, currency, invoices, subtotal, tax, total, outstanding"
+            " FROM report_months ORDER BY month DESC, currency", "month")
+
+    def revenue_by_customer(self):
+        """Rows of {"customer", "currency", ...}, highest total first"""
+        return self._report(
+            "SELECT coalesce(c.name, ''), r.currency, r.invoices, r.subtotal, r.tax, r.total, r.outstanding"
+            " FROM report_customers r LEFT JOIN customers c ON c.id = r.customer_id"
+            " ORDER BY r.total DESC", "customer")
+
+    def revenue_by_currency(self):
+        """Rows of {"currency", ...}; the outstanding column is the total still unpaid"""
+        return self._report(
+            "SELECT currency, currency, sum(invoices), sum(subtotal), sum(tax), sum(total), sum(outstanding)"
+            " FROM report_months GROUP BY currency ORDER BY currency", "currency")
+
+    def _report(self, sql, key):
+        with self._lock:
+            rows = self._conn.execute(sql).fetchall()
+        return [
+            {key: group, "currency": currency, "invoices": invoices, "subtotal": subtotal,
+             "tax": tax, "total": total, "outstanding": outstanding}
+            for group, currency, invoices, subtotal, tax, total, outstanding in rows
+        ]
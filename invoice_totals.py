@@ -0,0 +1,107 @@
+# Totals engine for Invoice Generator Premium
+# One place to compute line totals, subtotal, tax and grand total, so the PDF,
+# the on-screen summary and the Excel/CSV export always show the same numbers.
+#
+# Money is handled as integer cents (int64). Prices are rounded to the cent,
+# each line total is rounded to the cent, and tax is rounded once on the
+# subtotal, all half-up like a calculator. Work is done on NumPy arrays, so a
+# single invoice and a whole batch of invoices use the same vectorized pass.
+
+import math
+import numpy as np
+
+# Guards against binary floating point noise, e.g. 2.675 * 100 == 267.4999...
+_ROUNDING_EPSILON = 1e-9
+
+def round_half_up(values):
+    """Round to the nearest integer, halves away from zero, as int64"""
+    values = np.asarray(values, dtype=np.float64)
+    return (np.sign(values) * np.floor(np.abs(values) + 0.5 + _ROUNDING_EPSILON)).astype(np.int64)
+
+def to_cents(amounts):
+    """Convert money amounts (floats or numeric strings) to int64 cents"""
+    return round_half_up(np.asarray(amounts, dtype=np.float64) * 100)
+
+def _round_half_up_scalar(value):
+    return int(math.copysign(math.floor(abs(value) + 0.5 + _ROUNDING_EPSILON), value))
+
+def price_to_cents(price):
+    """Cents for a single amount; same rounding as to_cents(), without NumPy overhead"""
+    return _round_half_up_scalar(float(price) * 100)
+
+def line_total(quantity, price):
+    """Cents for a single line; same rounding as compute_totals(), without NumPy overhead"""
+    return line_total_cents(quantity, price_to_cents(price))
+
+def line_total_cents(quantity, price_cents):
+    """line_total() for a price that is already in integer cents"""
+    return _round_half_up_scalar(float(quantity) * price_cents)
+
+def tax_amount(subtotal, tax_rate):
+    """Tax in cents on a subtotal in cents"""
+    return _round_half_up_scalar(subtotal * float(tax_rate or 0) / 100)
+
+def format_money(cents):
+    """Format cents as a plain two-decimal amount, e.g. 123456 -> '1234.56'"""
+    cents = int(cents)
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+def compute_totals(quantities, prices, tax_rate=0):
+    """Totals for one invoice
+
+    Returns a dict with "line_totals" (int64 array of cents) and "subtotal",
+    "tax" and "total" (int cents).
+    """
+    return compute_totals_cents(quantities, to_cents(prices), tax_rate)
+
+def compute_totals_cents(quantities, price_cents, tax_rate=0):
+    """compute_totals() for prices that are already in integer cents"""
+    quantities = np.asarray(quantities, dtype=np.float64)
+    line_totals = round_half_up(quantities * np.asarray(price_cents, dtype=np.int64))
+    subtotal = int(line_totals.sum())
+    tax = int(round_half_up(subtotal * float(tax_rate or 0) / 100))
+    return {
+        "line_totals": line_totals,
+        "subtotal": subtotal,
+        "tax": tax,
+        "total": subtotal + tax
+    }
+
+def item_totals(items, tax_rate=0):
+    """compute_totals() for an ItemStore or a list of {"name", "quantity", "price"} dicts"""
+    if hasattr(items, "totals"):
+        return items.totals(tax_rate)
+    quantities = [float(item["quantity"]) for item in items]
+    prices = [float(item["price"]) for item in items]
+    return compute_totals(quantities, prices, tax_rate)
+
+def batch_totals(invoice_numbers, quantities, prices, tax_rates):
+    """Totals for many invoices at once from flat per-line columns
+
+    All arguments are sequences with one entry per line item; tax_rates holds
+    each line's invoice tax rate (the first line of an invoice wins). Returns
+    a pandas DataFrame indexed by invoice number with integer-cent "subtotal",
+    "tax" and "total" columns, in order of first appearance. Raises
+    ValueError if a line has no invoice number (None or NaN).
+    """
+    import pandas as pd
+
+    codes, numbers = pd.factorize(pd.Series(invoice_numbers, dtype=object), sort=False)
+    missing = np.flatnonzero(codes == -1)
+    if len(missing):
+        raise ValueError(f"{len(missing)} line(s) have no invoice number, the first at index {missing[0]}")
+    line_totals = round_half_up(np.asarray(quantities, dtype=np.float64) * to_cents(prices))
+
+    subtotals = np.zeros(len(numbers), dtype=np.int64)
+    np.add.at(subtotals, codes, line_totals)
+
+    # Tax rate of the first line of each invoice
+    _, first_rows = np.unique(codes, return_index=True)
+    rates = np.asarray(tax_rates, dtype=np.float64)[first_rows]
+
+    taxes = round_half_up(subtotals * rates / 100)
+    return pd.DataFrame(
+        {"subtotal": subtotals, "tax": taxes, "total": subtotals + taxes},
+        index=pd.Index(numbers, name="invoice_number")
+    )
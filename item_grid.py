@@ -0,0 +1,185 @@
+# Virtual-scrolling line item grid for Invoice Generator Premium
+# Shows a window of rows from a backing sequence instead of one Treeview row per item
+
+from tkinter import ttk
+
+class VirtualItemGrid(ttk.Frame):
+    """A fixed-height Treeview that only ever holds the rows currently on screen
+
+    store is any sequence of rows (e.g. the `items` list); it is read, never
+    copied. format_row(row) returns the values shown for a row. Sorting and
+    filtering build a list of indices into the store, so the row data itself
+    stays where it is. sort_keys maps a column to a key function on a row and
+    filter_keys maps a column to the row value that filters are matched
+    against.
+
+    Call refresh() after the store changed.
+    """
+
+    def __init__(self, parent, store, columns, format_row, sort_keys=None, filter_keys=None, height=10):
+        super().__init__(parent)
+        self.store = store
+        self.columns = columns
+        self.format_row = format_row
+        self.sort_keys = sort_keys or {}
+        self.filter_keys = filter_keys or {}
+        self.height = height
+        self.top = 0  # Position of the first visible row in the view
+        self.view = None  # Store indices in display order; None means all rows, in store order
+        self.sort_column = None
+        self.sort_descending = False
+        self.filter_column = None
+        self.filter_text = ""
+        self._view_dirty = False
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="browse")
+        for column in columns:
+            command = (lambda c=column: self.toggle_sort(c)) if column in self.sort_keys else ""
+            self.tree.heading(column, text=column, command=command)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        # The Treeview never scrolls itself; wheel and keys move the window instead
+        for widget in (self.tree, self.scrollbar):
+            widget.bind("<MouseWheel>", self._on_mousewheel)
+            widget.bind("<Button-4>", lambda e: self.scroll(-3))
+            widget.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.height) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll(self.height) or "break")
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0) or "break")
+        self.tree.bind("<End>", lambda e: self.scroll_to(self.row_count()) or "break")
+
+        self._slots = []  # Treeview row ids reused for the visible rows
+
+    # ---------------------------- View ----------------------------
+    def heading(self, column, **options):
+        """Configure a column heading, like Treeview.heading()"""
+        if "text" in options and column == self.sort_column:
+            options["text"] += " ▼" if self.sort_descending else " ▲"
+        self.tree.heading(column, **options)
+
+    def row_count(self):
+        """Number of rows in the current (sorted/filtered) view"""
+        self._ensure_view()
+        return len(self.store) if self.view is None else len(self.view)
+
+    def refresh(self, scroll_to_end=False):
+        """Redraw after the store changed; sorting and filtering are reapplied"""
+        if self.sort_column or self.filter_text:
+            self._view_dirty = True
+        if scroll_to_end:
+            self.top = self.row_count()
+        self._redraw()
+
+    def toggle_sort(self, column):
+        """Sort by a column; clicking the same column again reverses the order"""
+        if self.sort_column == column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        for name in self.columns:
+            arrow = ""
+            if name == self.sort_column:
+                arrow = " ▼" if self.sort_descending else " ▲"
+            text = self.tree.heading(name, "text").rstrip(" ▲▼")
+            self.tree.heading(name, text=text + arrow)
+        self._view_dirty = True
+        self.scroll_to(0)
+
+    def set_filter(self, column, text):
+        """Only show rows whose column matches text
+
+        Text columns match case-insensitive substrings. Numeric columns accept
+        a number or a comparison such as ">100", "<=5" or "=2".
+        """
+        self.filter_column = column
+        self.filter_text = (text or "").strip()
+        self._view_dirty = True
+        self.scroll_to(0)
+
+    def _ensure_view(self):
+        if not self._view_dirty:
+            return
+        self._view_dirty = False
+        if not self.sort_column and not self.filter_text:
+            self.view = None
+            return
+
+        indices = range(len(self.store))
+        if self.filter_text and self.filter_column in self.filter_keys:
+            matches = self._matcher(self.filter_text)
+            value = self.filter_keys[self.filter_column]
+            store = self.store
+            indices = [i for i in indices if matches(value(store[i]))]
+        if self.sort_column:
+            key = self.sort_keys[self.sort_column]
+            store = self.store
+            indices = sorted(indices, key=lambda i: key(store[i]), reverse=self.sort_descending)
+        self.view = list(indices)
+
+    @staticmethod
+    def _matcher(text):
+        for op, compare in ((">=", lambda a, b: a >= b), ("<=", lambda a, b: a <= b),
+                            (">", lambda a, b: a > b), ("<", lambda a, b: a < b),
+                            ("=", lambda a, b: a == b)):
+            if text.startswith(op):
+                try:
+                    bound = float(text[len(op):])
+                except ValueError:
+                    break
+                return lambda value: isinstance(value, (int, float)) and compare(value, bound)
+
+        needle = text.lower()
+        try:
+            number = float(text)
+        except ValueError:
+            number = None
+        def matches(value):
+            if isinstance(value, (int, float)):
+                return number is not None and value == number
+            return needle in str(value).lower()
+        return matches
+
+    # ---------------------------- Scrolling ----------------------------
+    def scroll(self, rows):
+        self.scroll_to(self.top + rows)
+
+    def scroll_to(self, position):
+        self.top = position
+        self._redraw()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.row_count()))
+        elif action == "scroll":
+            step = self.height if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120; macOS reports small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-delta * 3)
+        return "break"
+
+    def _redraw(self):
+        """Fill the visible slots with rows top .. top + height of the view"""
+        count = self.row_count()
+        self.top = max(0, min(self.top, count - self.height))
+
+        visible = min(self.height, count - self.top)
+        while len(self._slots) < visible:
+            self._slots.append(self.tree.insert("", "end", values=()))
+        while len(self._slots) > visible:
+            self.tree.delete(self._slots.pop())
+
+        for offset, slot in enumerate(self._slots):
+            position = self.top + offset
+            index = position if self.view is None else self.view[position]
+            self.tree.item(slot, values=self.format_row(self.store[index]))
+
+        if count:
+            self.scrollbar.set(self.top / count, (self.top + visible) / count)
+        else:
+            self.scrollbar.set(0, 1)
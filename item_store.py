@@ -0,0 +1,218 @@
+# Columnar line item store for Invoice Generator Premium
+# Keeps line items in NumPy columns instead of a list of tuples
+
+import numpy as np
+from invoice_totals import compute_totals_cents, price_to_cents
+
+class ItemStore:
+    """Line items held column by column
+
+    Each item takes a row id (int64), a name code (int32), a quantity
+    (float64), a price in cents (int64) and a live flag: 29 bytes, plus one
+    shared copy of each distinct item name. Row ids are assigned once and
+    never reused, so they stay valid when other items are removed.
+
+    remove() only clears the row's live flag (O(1), found through a row id ->
+    slot dict); the dead rows are squeezed out in one pass, keeping the order,
+    the next time the rows are read or the columns run out of room.
+
+    Indexing and iterating still yield (row_id, name, quantity, price) tuples,
+    so the store can stand in wherever the old list of item tuples was read.
+    The column accessors return NumPy views of the live rows without copying.
+    """
+
+    _INITIAL_CAPACITY = 64
+    _COLUMNS = ("_ids", "_name_codes", "_quantities", "_price_cents", "_live")
+
+    def __init__(self, capacity=_INITIAL_CAPACITY):
+        capacity = max(1, capacity)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._name_codes = np.empty(capacity, dtype=np.int32)
+        self._quantities = np.empty(capacity, dtype=np.float64)
+        self._price_cents = np.empty(capacity, dtype=np.int64)
+        self._live = np.empty(capacity, dtype=np.bool_)
+        self._names = []  # Interned name table: code -> name
+        self._name_index = {}  # name -> code
+        self._slots = {}  # row id -> slot in the columns
+        self._size = 0  # Live items
+        self._used = 0  # Slots filled, live or removed
+        self._next_id = 1
+
+    @classmethod
+    def from_items(cls, items):
+        """Build a store from {"name", "quantity", "price"} dicts or (name, quantity, price) tuples"""
+        if isinstance(items, ItemStore):
+            return items
+        items = list(items)
+        store = cls(len(items))
+        for item in items:
+            if isinstance(item, dict):
+                store.append(item["name"], item["quantity"], item["price"])
+            else:
+                store.append(*item)
+        return store
+
+    # ---------------------------- Sequence ----------------------------
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("item index out of range")
+        self._compact()
+        return (int(self._ids[index]),
+                self._names[self._name_codes[index]],
+                float(self._quantities[index]),
+                int(self._price_cents[index]) / 100)
+
+    def __iter__(self):
+        names = self._names
+        for row_id, code, quantity, cents in zip(self.row_ids().tolist(), self.name_codes().tolist(),
+                                                 self.quantities().tolist(), self.price_cents().tolist()):
+            yield row_id, names[code], quantity, cents / 100
+
+    def __bool__(self):
+        return self._size > 0
+
+    # ---------------------------- Editing ----------------------------
+    def append(self, name, quantity, price):
+        """Add an item and return its row id (amortized O(1))"""
+        if self._used == len(self._ids):
+            self._compact()
+            if self._used > len(self._ids) // 2:
+                self._grow(2 * len(self._ids))
+        name = str(name)
+        code = self._name_index.get(name)
+        if code is None:
+            code = len(self._names)
+            self._names.append(name)
+            self._name_index[name] = code
+
+        row = self._used
+        row_id = self._next_id
+        self._ids[row] = row_id
+        self._name_codes[row] = code
+        self._quantities[row] = float(quantity)
+        self._price_cents[row] = price_to_cents(price)
+        self._live[row] = True
+        self._slots[row_id] = row
+        self._size += 1
+        self._used += 1
+        self._next_id += 1
+        return row_id
+
+    def extend(self, items):
+        """Append (name, quantity, price) tuples; returns their row ids"""
+        return [self.append(*item) for item in items]
+
+    def pop(self):
+        """Remove and return the last item (O(1))"""
+        if not self._size:
+            raise IndexError("pop from empty item store")
+        item = self[self._size - 1]
+        self.remove(item[0])
+        return item
+
+    def remove(self, row_id):
+        """Remove the item with this row id, keeping the order of the others (O(1))"""
+        row = self._slots.pop(row_id)
+        self._live[row] = False
+        self._size -= 1
+        # Removed rows at the end need no compaction, just forgetting
+        while self._used and not self._live[self._used - 1]:
+            self._used -= 1
+
+    def clear(self):
+        """Remove every item; row ids keep counting up"""
+        self._size = 0
+        self._used = 0
+        self._slots = {}
+        self._names = []
+        self._name_index = {}
+
+    def copy(self):
+        """Independent snapshot, e.g. for a background job"""
+        self._compact()
+        store = ItemStore(self._size)
+        size = self._size
+        for attr in self._COLUMNS:
+            getattr(store, attr)[:size] = getattr(self, attr)[:size]
+        store._names = list(self._names)
+        store._name_index = dict(self._name_index)
+        store._slots = dict(self._slots)
+        store._size = size
+        store._used = size
+        store._next_id = self._next_id
+        return store
+
+    def _compact(self):
+        """Squeeze removed rows out of the columns, keeping the order (O(n))"""
+        if self._used == self._size:
+            return
+        keep = np.flatnonzero(self._live[:self._used])
+        size = len(keep)
+        for attr in self._COLUMNS:
+            column = getattr(self, attr)
+            column[:size] = column[keep]
+        self._used = size
+        self._slots = dict(zip(self._ids[:size].tolist(), range(size)))
+
+    def _grow(self, capacity):
+        for attr in self._COLUMNS:
+            old = getattr(self, attr)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._used] = old[:self._used]
+            setattr(self, attr, new)
+
+    def __getstate__(self):
+        # Only the live rows are worth sending to another process
+        self._compact()
+        state = self.__dict__.copy()
+        for attr in self._COLUMNS:
+            state[attr] = getattr(self, attr)[:self._size].copy()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if not len(self._ids):
+            self._grow(self._INITIAL_CAPACITY)
+
+    # ---------------------------- Columns ----------------------------
+    def row_ids(self):
+        self._compact()
+        return self._ids[:self._size]
+
+    def name_codes(self):
+        self._compact()
+        return self._name_codes[:self._size]
+
+    def name_table(self):
+        """Distinct item names, indexed by name code"""
+        return self._names
+
+    def names(self):
+        """Item names in row order (a new list; names themselves are shared)"""
+        names = self._names
+        return [names[code] for code in self.name_codes().tolist()]
+
+    def quantities(self):
+        self._compact()
+        return self._quantities[:self._size]
+
+    def price_cents(self):
+        self._compact()
+        return self._price_cents[:self._size]
+
+    def prices(self):
+        """Prices as floats (computed from the cent column)"""
+        return self.price_cents() / 100
+
+    def totals(self, tax_rate=0):
+        """compute_totals() over the columns, without building per-item objects"""
+        return compute_totals_cents(self.quantities(), self.price_cents(), tax_rate)
+
+    def nbytes(self):
+        """Approximate memory used by the columns (excluding the name table)"""
+        return sum(getattr(self, attr).nbytes for attr in self._COLUMNS)
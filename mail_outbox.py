@@ -0,0 +1,336 @@
+# Bulk invoice mailing for Invoice Generator Premium
+# Renders and sends many invoices at once, within the mail provider's rate limit
+#
+# Invoices to send are first written to an outbox table in the invoice
+# database (next to config.json), together with their recipient. The
+# dispatcher then works through the outbox on an asyncio event loop: PDFs are
+# rendered and attached in a process pool while earlier messages are being
+# sent, sends go out over a few persistent SMTP connections (max_in_flight),
+# and a token bucket spaces them to the configured messages per minute.
+#
+# Every invoice's status (queued, sending, sent, failed), attempt count and
+# last error are kept in the outbox, so a run that crashed or was stopped
+# picks up where it left off. An invoice that was being sent at the time of
+# the crash is sent again, since there is no telling whether the server got it.
+
+import os
+import json
+import time
+import shutil
+import asyncio
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from invoice_store import get_database_path
+from invoice_mail import MailQueue, build_invoice_message
+from invoice_profile import span
+
+DEFAULT_MAX_IN_FLIGHT = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    invoice_number TEXT PRIMARY KEY,
+    recipient TEXT NOT NULL,
+    invoice TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT NOT NULL DEFAULT '',
+    updated TEXT NOT NULL DEFAULT ''
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status);
+"""
+
+STATUSES = ("queued", "sending", "sent", "failed")
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+# ---------------------------- Outbox ----------------------------
+class Outbox:
+    """Persistent list of invoices to email, with the delivery status of each
+
+    Keyed by invoice number. Adding an invoice that was already sent leaves
+    it alone unless resend is set; adding one that is queued or failed
+    queues it again with the new data. One outbox may be shared between
+    threads; statements are serialized on an internal lock.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_database_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---------------------------- Queueing ----------------------------
+    def add(self, invoices, resend=False, batch_size=1000):
+        """Queue (invoice, recipient) pairs; returns how many were queued
+
+        An invoice without a recipient is recorded as failed instead.
+        """
+        queued = 0
+        batch = []
+        for invoice, recipient in invoices:
+            number = str(invoice.get("invoice_number", "")).strip()
+            if not number:
+                raise ValueError("Invoices in the outbox need an invoice number")
+            items = invoice.get("items") or []
+            if not isinstance(items, list):  # An ItemStore, e.g. from the GUI
+                items = [{"name": name, "quantity": quantity, "price": price} for _, name, quantity, price in items]
+            data = json.dumps(dict(invoice, items=items), default=str)
+            status, error = ("queued", "") if recipient else ("failed", "No recipient address")
+            batch.append((number, recipient or "", data, status, error, _now()))
+            if len(batch) >= batch_size:
+                queued += self._write(batch, resend)
+                batch = []
+        if batch:
+            queued += self._write(batch, resend)
+        return queued
+
+    def _write(self, rows, resend):
+        """Insert or requeue rows in one transaction; returns how many were queued"""
+        sql = """
+            INSERT INTO outbox (invoice_number, recipient, invoice, status, error, updated)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(invoice_number) DO UPDATE SET
+                recipient = excluded.recipient, invoice = excluded.invoice, status = excluded.status,
+                attempts = 0, error = excluded.error, updated = excluded.updated"""
+        if not resend:
+            sql += " WHERE outbox.status != 'sent'"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(sql, [row for row in rows if row[3] == "queued"])
+                queued = self._conn.total_changes - before
+                self._conn.executemany(sql, [row for row in rows if row[3] != "queued"])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return queued
+
+    def retry_failed(self):
+        """Queue every failed invoice that has a recipient again; returns how many"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = 'queued', attempts = 0, error = '', updated = ? "
+                "WHERE status = 'failed' AND recipient != ''", (_now(),))
+            return cursor.rowcount
+
+    def pending(self, batch_size=500):
+        """Yield (invoice_number, recipient, invoice) for everything queued or interrupted mid-send"""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, invoice_number, recipient, invoice FROM outbox "
+                    "WHERE status IN ('queued', 'sending') AND rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, batch_size)).fetchall()
+            if not rows:
+                return
+            for rowid, number, recipient, data in rows:
+                yield number, recipient, json.loads(data)
+            last = rows[-1][0]
+
+    # ---------------------------- Status ----------------------------
+    def mark_sending(self, invoice_number):
+        """Record the start of a delivery attempt"""
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET status = 'sending', attempts = attempts + 1, updated = ? "
+                               "WHERE invoice_number = ?", (_now(), invoice_number))
+
+    def mark_done(self, invoice_number, error=None):
+        """Record an invoice as sent, or as failed with error"""
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET status = ?, error = ?, updated = ? WHERE invoice_number = ?",
+                               ("failed" if error else "sent", error or "", _now(), invoice_number))
+
+    def counts(self):
+        """Number of invoices per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, count(*) FROM outbox GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def list_entries(self, status=None, limit=100):
+        """{"invoice_number", "recipient", "status", "attempts", "error", "updated"}, most recent first"""
+        sql = "SELECT invoice_number, recipient, status, attempts, error, updated FROM outbox"
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY updated DESC, rowid DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        columns = ("invoice_number", "recipient", "status", "attempts", "error", "updated")
+        return [dict(zip(columns, row)) for row in rows]
+
+# ---------------------------- Rate Limiting ----------------------------
+class TokenBucket:
+    """Allows rate operations per second on average, in bursts of at most capacity
+
+    take() is the bookkeeping and returns how long to wait before trying
+    again; MailQueue sleeps that long in its sender threads.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._last = clock()
+
+    @classmethod
+    def per_minute(cls, messages, capacity=1):
+        """A bucket for a messages-per-minute limit; None when the limit is 0 (unlimited)"""
+        if not messages or messages <= 0:
+            return None
+        return cls(messages / 60, capacity)
+
+    def take(self):
+        """Take a token if one is free; returns 0, or the seconds until one will be"""
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+# ---------------------------- Dispatcher ----------------------------
+# Company settings and render cache for the current render worker, set once by _init_worker()
+_worker_company = None
+_worker_cache = None
+
+def _init_worker(company, cache=None):
+    global _worker_company, _worker_cache
+    from invoice_render import get_render_context
+
+    _worker_company = company
+    _worker_cache = cache
+    get_render_context(company)
+
+def _build_message(task):
+    """Render an invoice and return the email with it attached (runs in a render worker)"""
+    from invoice_batch import invoice_filename
+    from invoice_render import render_invoice
+
+    invoice, sender, recipient, pdf_dir = task
+    # A directory of its own per task: different invoice numbers can sanitize
+    # to the same file name ("A/1" and "A_1"), and the file name is what the
+    # attachment is called
+    task_dir = tempfile.mkdtemp(dir=pdf_dir)
+    try:
+        pdf_path = invoice_filename(invoice, task_dir)
+        render_invoice(invoice, _worker_company, pdf_path, cache=_worker_cache)
+        return build_invoice_message(sender, recipient, invoice["invoice_number"], invoice.get("customer", ""),
+                                     _worker_company.get("company_name", ""), pdf_path)
+    finally:
+        shutil.rmtree(task_dir, ignore_errors=True)
+
+class MailDispatcher:
+    """Sends everything pending in an outbox, rendering each invoice's PDF on the way
+
+    render_workers processes render PDFs ahead of the senders, at most a
+    few messages ahead so memory stays bounded. Rendered messages are
+    delivered by a MailQueue with max_in_flight connections, which also
+    applies the limiter and retries transient failures.
+
+    progress, if given, is called as progress(sent, failed) after every
+    invoice. run() returns (sent, failed) for this run.
+    """
+
+    def __init__(self, outbox, company, settings, sender, max_in_flight=DEFAULT_MAX_IN_FLIGHT, limiter=None,
+                 render_workers=1, cache=None, max_retries=3, backoff=1.0, progress=None):
+        self.outbox = outbox
+        self.company = company
+        self.settings = settings
+        self.sender = sender
+        self.max_in_flight = max(1, max_in_flight)
+        self.limiter = limiter
+        self.render_workers = max(1, render_workers)
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.progress = progress
+        self.sent = 0
+        self.failed = 0
+
+    def run(self):
+        with span("mail.dispatch") as record:
+            asyncio.run(self._run())
+            record.update(sent=self.sent, failed=self.failed)
+        return self.sent, self.failed
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        if self.render_workers > 1:
+            render_pool = ProcessPoolExecutor(self.render_workers, initializer=_init_worker,
+                                              initargs=(self.company, self.cache))
+        else:  # Still off the event loop, so rendering overlaps with sending
+            render_pool = ThreadPoolExecutor(1, initializer=_init_worker, initargs=(self.company, self.cache))
+        # Invoices between being picked up and finished; bounds the rendered messages held in memory
+        window = asyncio.Semaphore(self.max_in_flight + self.render_workers * 2)
+
+        def done(number, error):
+            loop.call_soon_threadsafe(self._finish, number, str(error) if error is not None else None, window)
+
+        mail = MailQueue(self.settings, connections=self.max_in_flight, max_retries=self.max_retries,
+                         backoff=self.backoff, limiter=self.limiter,
+                         on_attempt=lambda number, attempt: self.outbox.mark_sending(number), on_done=done)
+        renders = set()
+        try:
+            with tempfile.TemporaryDirectory() as pdf_dir:
+                for number, recipient, invoice in self.outbox.pending():
+                    await window.acquire()
+                    task = asyncio.create_task(self._prepare(render_pool, mail, window,
+                                                             (invoice, self.sender, recipient, pdf_dir)))
+                    renders.add(task)
+                    task.add_done_callback(renders.discard)
+                await asyncio.gather(*renders)
+                # done() callbacks are queued on the loop before join() returns, so all have run after this
+                await loop.run_in_executor(None, mail.join)
+        finally:
+            for task in renders:
+                task.cancel()
+            await asyncio.gather(*renders, return_exceptions=True)
+            render_pool.shutdown(wait=True, cancel_futures=True)
+            await loop.run_in_executor(None, mail.close)
+
+    async def _prepare(self, render_pool, mail, window, task):
+        number = task[0]["invoice_number"]
+        try:
+            msg = await asyncio.get_running_loop().run_in_executor(render_pool, _build_message, task)
+        except Exception as e:
+            self._finish(number, f"Rendering failed: {e}", window)
+            return
+        mail.submit(msg, key=number)
+
+    def _finish(self, number, error, window):
+        self.outbox.mark_done(number, error)
+        if error is None:
+            self.sent += 1
+        else:
+            self.failed += 1
+        window.release()
+        if self.progress:
+            self.progress(self.sent, self.failed)
@@ -0,0 +1,151 @@
+# Rendered PDF cache for Invoice Generator Premium
+# Keeps recently rendered invoice PDFs on disk so unchanged invoices aren't rendered again
+#
+# Entries are named after a hash of everything that goes into the PDF (see
+# invoice_render.render_key), so a changed invoice, company setting, logo or
+# template simply misses. The cache is shared by the GUI, the command line
+# tools and batch workers: entries are written to a temporary file and
+# renamed into place, and reading one bumps its mtime, which is what the
+# least-recently-used eviction goes by.
+
+import os
+import threading
+from mac_compatibility import get_config_path
+
+DEFAULT_MAX_MB = 256
+
+def default_cache_dir():
+    """pdf_cache next to config.json"""
+    return os.path.join(os.path.dirname(get_config_path()), "pdf_cache")
+
+class RenderCache:
+    """Size-bounded, content-addressed store of PDF bytes
+
+    Once the entries add up to more than max_bytes, the least recently used
+    ones are removed until the cache is back under 90% of the limit.
+    Can be pickled, e.g. to hand it to batch worker processes.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # Estimated bytes on disk; scanned on first put()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, directory=None):
+        """Cache sized by the render_cache_mb setting; None when the setting is 0 (disabled)"""
+        try:
+            megabytes = float(config.get("render_cache_mb", DEFAULT_MAX_MB))
+        except (TypeError, ValueError):
+            megabytes = DEFAULT_MAX_MB
+        if megabytes <= 0:
+            return None
+        return cls(directory, max_bytes=int(megabytes * 1024 * 1024))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def path_for(self, key):
+        # Two-character shards keep directories small
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+
+    # ---------------------------- Entries ----------------------------
+    def get(self, key):
+        """The cached PDF bytes for key, or None on a miss"""
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+        except OSError:  # Missing, or evicted by another process meanwhile
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store PDF bytes under key; a failed write only costs the cache entry"""
+        path = self.path_for(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Failed to cache rendered PDF: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        """Remove every cached PDF"""
+        with self._lock:
+            for path, _, _ in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+    def stats(self):
+        """Hits and misses in this process, plus the files and bytes on disk"""
+        entries = self._entries()
+        return {"hits": self.hits, "misses": self.misses,
+                "files": len(entries), "bytes": sum(size for _, _, size in entries)}
+
+    # ---------------------------- Eviction ----------------------------
+    def _entries(self):
+        """(path, mtime, size) of every cached PDF"""
+        entries = []
+        try:
+            shards = [entry.path for entry in os.scandir(self.directory) if entry.is_dir()]
+        except OSError:
+            return entries
+        for shard in shards:
+            try:
+                shard_entries = [entry for entry in os.scandir(shard) if entry.name.endswith(".pdf")]
+            except OSError:
+                continue
+            for entry in shard_entries:
+                try:
+                    stat = entry.stat()
+                except OSError:  # Evicted meanwhile
+                    continue
+                entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self):
+        # Re-scan rather than trust the estimate: other processes share the directory
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:  # Already gone, or open elsewhere on Windows
+                pass
+        self._size = total
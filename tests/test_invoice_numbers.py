@@ -0,0 +1,63 @@
+import threading
+import pytest
+from invoice_numbers import InvoiceNumberAllocator, check_number_format
+from invoice_store import InvoiceStore
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "invoices.db")
+
+def test_first_numbers(db_path):
+    with InvoiceNumberAllocator(db_path) as numbers:
+        assert [numbers.next_number() for _ in range(3)] == ["INV-00001", "INV-00002", "INV-00003"]
+
+def test_no_duplicates_across_connections(db_path):
+    issued = []
+    lock = threading.Lock()
+
+    def allocate(numbers):
+        for _ in range(200):
+            number = numbers.next_number()
+            with lock:
+                issued.append(number)
+
+    with InvoiceNumberAllocator(db_path, block_size=7) as first, \
+            InvoiceNumberAllocator(db_path, block_size=3) as second:
+        threads = [threading.Thread(target=allocate, args=(numbers,)) for numbers in (first, second, first)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(issued) == 600
+    assert len(set(issued)) == 600
+
+def test_released_numbers_are_issued_again(db_path):
+    with InvoiceNumberAllocator(db_path) as numbers:
+        first, second, third = (numbers.next_number() for _ in range(3))
+        numbers.release([second])
+        assert numbers.next_number() == second
+        assert numbers.next_number() == "INV-00004"
+
+def test_unused_reservations_return_on_close(db_path):
+    with InvoiceNumberAllocator(db_path, block_size=10) as numbers:
+        assert numbers.next_number() == "INV-00001"
+    with InvoiceNumberAllocator(db_path) as numbers:
+        assert numbers.next_number() == "INV-00002"
+
+def test_confirmed_numbers_are_not_released(db_path):
+    with InvoiceNumberAllocator(db_path) as numbers:
+        number = numbers.next_number()
+        numbers.confirm([number])
+        numbers.release([number])
+        assert numbers.next_number() == "INV-00002"
+
+def test_hand_typed_numbers_are_skipped(db_path):
+    with InvoiceStore(db_path) as store:
+        for number in ("INV-00002", "INV-00003", "INV-00005"):
+            store.save_invoice({"invoice_number": number, "customer": "Acme", "date": "2026-01-01", "items": []})
+    with InvoiceNumberAllocator(db_path, block_size=2) as numbers:
+        assert [numbers.next_number() for _ in range(3)] == ["INV-00001", "INV-00004", "INV-00006"]
+
+def test_number_format_must_contain_number():
+    with pytest.raises(ValueError):
+        check_number_format("{prefix}{year}")
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from invoice_totals import (round_half_up, to_cents, price_to_cents, line_total, compute_totals,
+                            batch_totals, format_money)
+
+def test_round_half_up_rounds_halves_away_from_zero():
+    assert round_half_up([0.5, 1.5, 2.5, -0.5, -1.5, -2.5]).tolist() == [1, 2, 3, -1, -2, -3]
+    assert round_half_up([0.49, -0.49, 0.51, -0.51]).tolist() == [0, 0, 1, -1]
+
+def test_fractional_cents_round_half_up():
+    # 2.675 is 2.67499999... in binary floating point
+    assert to_cents([2.675, 1.005, 0.125, -2.675, -0.125]).tolist() == [268, 101, 13, -268, -13]
+    assert price_to_cents("2.675") == 268
+    assert price_to_cents(-1.005) == -101
+    # The price is rounded to the cent before it is multiplied
+    assert line_total(3, 0.335) == 102
+    # Half a cent on a line rounds away from zero
+    assert line_total(0.5, 0.05) == 3
+    assert line_total(-0.5, 0.05) == -3
+
+def test_negative_lines():
+    totals = compute_totals([1, 2, -1], [10.00, -2.505, 0.125], tax_rate=10)
+    assert totals["line_totals"].tolist() == [1000, -502, -13]
+    assert totals["subtotal"] == 485
+    assert totals["tax"] == 49  # 48.5 rounds up
+    assert totals["total"] == 534
+    refund = compute_totals([1], [-0.05], tax_rate=10)
+    assert refund["tax"] == -1  # -0.5 rounds away from zero
+    assert format_money(refund["total"]) == "-0.06"
+
+def test_batch_totals_match_compute_totals():
+    rng = np.random.default_rng(5)
+    invoices = {}
+    numbers, quantities, prices, rates = [], [], [], []
+    for n in range(50):
+        rate = float(rng.choice([0, 7.5, 19, 20]))
+        lines = [(float(rng.integers(-3, 10)), round(float(rng.uniform(-50, 500)), 3))
+                 for _ in range(int(rng.integers(1, 8)))]
+        invoices[f"INV-{n:03d}"] = (lines, rate)
+        for quantity, price in lines:
+            numbers.append(f"INV-{n:03d}")
+            quantities.append(quantity)
+            prices.append(price)
+            rates.append(rate)
+    # Lines of different invoices interleaved
+    order = rng.permutation(len(numbers))
+    frame = batch_totals([numbers[i] for i in order], [quantities[i] for i in order],
+                         [prices[i] for i in order], [rates[i] for i in order])
+
+    assert sorted(frame.index) == sorted(invoices)
+    for number, (lines, rate) in invoices.items():
+        expected = compute_totals([q for q, _ in lines], [p for _, p in lines], rate)
+        row = frame.loc[number]
+        assert (row["subtotal"], row["tax"], row["total"]) == (expected["subtotal"], expected["tax"], expected["total"])
+
+def test_batch_totals_rejects_lines_without_invoice_number():
+    with pytest.raises(ValueError):
+        batch_totals(["A", None], [1, 1], [1.0, 2.0], [0, 0])
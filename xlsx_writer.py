@@ -0,0 +1,196 @@
+# Streaming XLSX writer for Invoice Generator Premium
+# Writes a single-sheet workbook row by row, straight into the zip file
+#
+# openpyxl builds a Python object per cell and styles are set cell by cell,
+# which dominates large exports. This writer keeps nothing per row: styles are
+# a small fixed table chosen per column or per row, and each row is written as
+# XML text as soon as it is produced. Strings are stored inline, so no shared
+# string table has to be held in memory either.
+
+import re
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+# Cell styles (indexes into cellXfs below)
+STYLE_DEFAULT = 0
+STYLE_HEADER = 1  # Bold white on dark blue, centered, thin border
+STYLE_MONEY = 2  # #,##0.00
+STYLE_BOLD = 3
+STYLE_BOLD_MONEY = 4
+
+_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name={name} sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# numFmtId 4 is the built-in "#,##0.00"
+_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="3">
+<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>
+<font><b/><sz val="11"/><color rgb="FFFFFFFF"/><name val="Calibri"/><family val="2"/></font>
+<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font>
+</fonts>
+<fills count="3">
+<fill><patternFill patternType="none"/></fill>
+<fill><patternFill patternType="gray125"/></fill>
+<fill><patternFill patternType="solid"><fgColor rgb="FF2C3E50"/><bgColor rgb="FF2C3E50"/></patternFill></fill>
+</fills>
+<borders count="2">
+<border><left/><right/><top/><bottom/><diagonal/></border>
+<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>
+</borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="5">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="2" borderId="1" xfId="0" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="2" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+<xf numFmtId="4" fontId="2" fillId="0" borderId="0" xfId="0" applyFont="1" applyNumberFormat="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+_SHEET_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+"""
+
+# Characters XML 1.0 does not allow, even escaped
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+def column_letter(index):
+    """Spreadsheet column name for a 0-based column index (0 -> A, 26 -> AA)"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def inline_string(value):
+    """The XML for a string cell's content, escaped once so it can be reused"""
+    text = escape(_ILLEGAL_XML.sub("", value))
+    if text != text.strip():
+        return f'<is><t xml:space="preserve">{text}</t></is>'
+    return f"<is><t>{text}</t></is>"
+
+class XlsxWriter:
+    """Writes one worksheet to an .xlsx file, a row at a time
+
+    widths are the column widths in characters; they go before the rows in
+    the sheet XML, so they must be known up front. Use as a context manager,
+    or call close() to finish the file.
+    """
+
+    def __init__(self, path, sheet_name="Sheet1", widths=(), compresslevel=1):
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self._sheet_name = sheet_name
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._letters = []
+        self._pending = []
+        self.row_count = 0
+        self._sheet.write(_SHEET_START.encode("utf-8"))
+        if widths:
+            cols = "".join(f'<col min="{i}" max="{i}" width="{width:g}" customWidth="1"/>'
+                           for i, width in enumerate(widths, start=1))
+            self._sheet.write(f"<cols>{cols}</cols>".encode("utf-8"))
+        self._sheet.write(b"<sheetData>")
+
+    def _letter(self, index):
+        while len(self._letters) <= index:
+            self._letters.append(column_letter(len(self._letters)))
+        return self._letters[index]
+
+    def append(self, values, styles=None):
+        """Write one row; None and "" leave the cell empty
+
+        styles is one style for the whole row, or a sequence with one per column.
+        """
+        self.row_count += 1
+        row = self.row_count
+        if styles is None or isinstance(styles, int):
+            styles = [styles or STYLE_DEFAULT] * len(values)
+        cells = []
+        for index, (value, style) in enumerate(zip(values, styles)):
+            if value is None or value == "":
+                continue
+            ref = f"{self._letter(index)}{row}"
+            style_attr = f' s="{style}"' if style else ""
+            if isinstance(value, str):
+                cells.append(f'<c r="{ref}"{style_attr} t="inlineStr">{inline_string(value)}</c>')
+            else:
+                cells.append(f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>')
+        self._pending.append(f'<row r="{row}">{"".join(cells)}</row>')
+        if len(self._pending) >= 1000:
+            self._flush()
+
+    def append_columns(self, columns, styles=()):
+        """Write many rows at once from parallel column lists
+
+        A column is either a list of numbers or a list of XML fragments made by
+        inline_string(), so repeated strings are escaped only once. Cheaper per
+        row than append().
+        """
+        cells = []
+        for index, column in enumerate(columns):
+            style = styles[index] if index < len(styles) else STYLE_DEFAULT
+            style_attr = f' s="{style}"' if style else ""
+            ref = f"{self._letter(index)}{{row}}"
+            if len(column) and isinstance(column[0], str):
+                cells.append(f'<c r="{ref}"{style_attr} t="inlineStr">{{{index}}}</c>')
+            else:
+                cells.append(f'<c r="{ref}"{style_attr}><v>{{{index}!r}}</v></c>')
+        row_template = '<row r="{row}">' + "".join(cells) + "</row>"
+        first = self.row_count + 1
+        pending = self._pending
+        for row, values in enumerate(zip(*columns), start=first):
+            pending.append(row_template.format(*values, row=row))
+            self.row_count = row
+            if len(pending) >= 1000:
+                self._flush()
+
+    def _flush(self):
+        self._sheet.write("".join(self._pending).encode("utf-8"))
+        self._pending.clear()
+
+    def close(self):
+        if self._zip is None:
+            return
+        try:
+            self._flush()
+            self._sheet.write(b"</sheetData></worksheet>")
+            self._sheet.close()
+            self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+            self._zip.writestr("_rels/.rels", _ROOT_RELS)
+            self._zip.writestr("xl/workbook.xml", _WORKBOOK.format(name=quoteattr(self._sheet_name)))
+            self._zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+            self._zip.writestr("xl/styles.xml", _STYLES)
+        finally:
+            self._zip.close()
+            self._zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()